@@ -0,0 +1,183 @@
+#mock_1eska.py
+
+"""
+Локальная заглушка раздела 1eska.ru для parser1eska.py: список статей
+с пагинацией ?PAGEN_1=N и страницы статей с искусственной задержкой.
+
+usage:
+    python benchmarks/mock_1eska.py --port 8766 --pages 5 --per-page 10 --latency 150
+    cd /tmp/run && python "…/Парсер 1eska/parser1eska.py" \\
+        --base-url http://127.0.0.1:8766/projects/publications/upravlenie-nashey-firmoy-unf/
+
+Как и Bitrix, номер страницы за последней отдаёт последнюю страницу — на этом
+срабатывает остановка «те же статьи, что на предыдущей странице».
+--fail-every N: каждая N-я статья на первый запрос отвечает 500 (проверка --retries и --retry-failed).
+--throttle-every N: каждая N-я статья на первый запрос отвечает 429 с Retry-After: 1.
+--stall-every N: каждая N-я статья на первый запрос молчит --stall-ms (проверка --read-timeout и --hedge-after).
+Статьи отдаются с ETag; на совпавший If-None-Match — 304 (проверка --refresh).
+/sitemap.xml — индекс из двух sitemap-файлов со всеми статьями (проверка --sitemap).
+GET /stats — число запросов и максимум одновременных (проверка --concurrency).
+"""
+from __future__ import annotations
+import argparse, hashlib, json, threading, time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from run_benchmarks import synthetic_1eska_article
+
+SECTION = "/projects/publications/upravlenie-nashey-firmoy-unf/"
+
+
+class MockSite:
+    def __init__(self, pages: int, per_page: int, latency: float, paragraphs: int = 60, fail_every: int = 0,
+                 throttle_every: int = 0, stall_every: int = 0, stall: float = 5.0):
+        self.pages, self.per_page, self.latency = pages, per_page, latency
+        self.faults = {"fail": fail_every, "throttle": throttle_every, "stall": stall_every}
+        self.stall = stall
+        self._hit: set[tuple[str, int]] = set()
+        self._template = synthetic_1eska_article(paragraphs)
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.host = "127.0.0.1"
+        self.not_modified = 0
+        self.active = 0
+        self.max_active = 0
+
+    def listing(self, page: int) -> str:
+        page = min(max(page, 1), self.pages)
+        first = (page - 1) * self.per_page
+        items = "".join(
+            f'<div class="item shadow"><div class="inner-item"><div class="title">'
+            f'<a href="{SECTION}statya-{n}/">Статья {n}</a></div></div></div>'
+            for n in range(first, first + self.per_page))
+        return f"<!DOCTYPE html><html><head><meta charset='utf-8'></head><body>{items}</body></html>"
+
+    def sitemap(self, part: int = 0) -> str:
+        ns = 'xmlns="http://www.sitemaps.org/schemas/sitemap/0.9"'
+        if not part:
+            items = "".join(f"<sitemap><loc>http://{self.host}/sitemap-iblock-{i}.xml</loc></sitemap>" for i in (1, 2))
+            return f'<?xml version="1.0" encoding="UTF-8"?><sitemapindex {ns}>{items}</sitemapindex>'
+        total = self.pages * self.per_page
+        half = total // 2
+        numbers = range(0, half) if part == 1 else range(half, total)
+        urls = [f"http://{self.host}{SECTION}"] + [f"http://{self.host}{SECTION}statya-{n}/" for n in numbers]
+        if part == 1:
+            urls.append(f"http://{self.host}/about/")     # чужой раздел отфильтровывается
+        items = "".join(f"<url><loc>{u}</loc></url>" for u in urls)
+        return f'<?xml version="1.0" encoding="UTF-8"?><urlset {ns}>{items}</urlset>'
+
+    def article(self, n: int) -> str:
+        return (self._template
+                .replace("Как настроить учёт в 1С:УНФ", f"Статья {n}: как настроить учёт в 1С:УНФ")
+                .replace("#Тег0", f"#Тег{n % 5}"))
+
+    def first_fault(self, kind: str, n: int) -> bool:
+        """Сбой kind у каждой N-й статьи — только на первый её запрос."""
+        every = self.faults[kind]
+        with self._lock:
+            if not every or n % every or (kind, n) in self._hit:
+                return False
+            self._hit.add((kind, n))
+            return True
+
+    def handler(self):
+        site = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"          # keep-alive, как у живого сайта
+
+            def do_GET(self):
+                url = urllib.parse.urlsplit(self.path)
+                if url.path == "/stats":
+                    self._send(200, json.dumps({"requests": site.requests, "max_active": site.max_active,
+                                                "not_modified": site.not_modified}), "application/json")
+                    return
+                with site._lock:
+                    site.requests += 1
+                    site.active += 1
+                    site.max_active = max(site.max_active, site.active)
+                try:
+                    time.sleep(site.latency)
+                    if url.path == SECTION:
+                        page = int(urllib.parse.parse_qs(url.query).get("PAGEN_1", ["1"])[0])
+                        self._send(200, site.listing(page))
+                    elif url.path == "/sitemap.xml" or url.path.startswith("/sitemap-iblock-"):
+                        part = int(url.path[len("/sitemap-iblock-"):-4]) if "iblock" in url.path else 0
+                        self._send(200, site.sitemap(part), "application/xml")
+                    elif url.path.startswith(SECTION + "statya-"):
+                        n = int(url.path.rstrip("/").rsplit("-", 1)[1])
+                        if site.first_fault("fail", n):
+                            self._send(500, "internal error")
+                            return
+                        if site.first_fault("throttle", n):
+                            self._send(429, "too many requests", retry_after="1")
+                            return
+                        if site.first_fault("stall", n):
+                            time.sleep(site.stall)
+                        text = site.article(n)
+                        etag = '"' + hashlib.md5(text.encode("utf-8")).hexdigest() + '"'
+                        if self.headers.get("If-None-Match") == etag:
+                            with site._lock:
+                                site.not_modified += 1
+                            self._send(304, "", etag=etag)
+                        else:
+                            self._send(200, text, etag=etag)
+                    else:
+                        self._send(404, "not found")
+                finally:
+                    with site._lock:
+                        site.active -= 1
+
+            def _send(self, status: int, text: str, ctype: str = "text/html; charset=utf-8", etag: str = "",
+                      retry_after: str = ""):
+                body = text.encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", ctype)
+                if etag:
+                    self.send_header("ETag", etag)
+                if retry_after:
+                    self.send_header("Retry-After", retry_after)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, fmt, *args):
+                pass
+
+        return Handler
+
+
+def serve(port: int, pages: int, per_page: int, latency_ms: float, fail_every: int = 0,
+          throttle_every: int = 0, stall_every: int = 0, stall_ms: float = 5000) -> ThreadingHTTPServer:
+    site = MockSite(pages, per_page, latency_ms / 1000, fail_every=fail_every,
+                    throttle_every=throttle_every, stall_every=stall_every, stall=stall_ms / 1000)
+    httpd = ThreadingHTTPServer(("127.0.0.1", port), site.handler())
+    httpd.daemon_threads = True
+    httpd.site = site
+    site.host = f"127.0.0.1:{httpd.server_address[1]}"
+    return httpd
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description="Заглушка 1eska.ru для parser1eska.py")
+    p.add_argument("--port", type=int, default=8766)
+    p.add_argument("--pages", type=int, default=5)
+    p.add_argument("--per-page", type=int, default=10)
+    p.add_argument("--latency", type=float, default=150, help="задержка ответа, мс")
+    p.add_argument("--fail-every", type=int, default=0, help="каждая N-я статья сначала отвечает 500")
+    p.add_argument("--throttle-every", type=int, default=0, help="каждая N-я статья сначала отвечает 429")
+    p.add_argument("--stall-every", type=int, default=0, help="каждая N-я статья сначала молчит --stall-ms")
+    p.add_argument("--stall-ms", type=float, default=5000)
+    args = p.parse_args()
+    httpd = serve(args.port, args.pages, args.per_page, args.latency, args.fail_every,
+                  args.throttle_every, args.stall_every, args.stall_ms)
+    print(f"🧪 http://127.0.0.1:{httpd.server_address[1]}{SECTION} "
+          f"({args.pages} стр. × {args.per_page} статей, задержка {args.latency:.0f} мс)")
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+#mock_its.py
+
+"""
+Локальная заглушка its.1c.ru для скриптов «Парсер ИТС»: оболочка книги,
+которая JS-ом заполняет #w_metadata_toc и подгружает документ во фрейм
+w_metadata_doc_frame (loading="true" и hidden, пока фрейм не загрузился).
+
+usage:
+    python benchmarks/mock_its.py --port 8767 --docs 40 --latency 300
+    python "…/Парсер ИТС/parse_ITS_metod.py" --base-url http://127.0.0.1:8767 --no-login \\
+        --fast --workers 4 --rate 10       # код базы: unfdoc
+
+Оглавление — «Глава N. …» (--chapters штук); документ N ссылается на --fanout
+следующих, на первую главу и на себя же с #якорем, так что обход в ширину
+доходит до всех --docs документов и проверяет дедупликацию очереди.
+Ссылки относительные (/db/<book>/content/N/hdoc), как на живом сайте.
+Как и живая оболочка, страница тянет стили, картинки, шрифт и счётчик, а JS,
+который строит оглавление и фрейм, лежит во внешнем /static/shell.js —
+перехват (--block-*, its_routes.py) не должен его задеть.
+Документ фрейма отдаётся и прямым GET (--direct, its_direct.py); с --js-every N
+текст каждого N-го документа дорисовывает JS — такие уходят в браузер.
+GET /stats — запросы по видам (root, shell, doc, static, counter), максимум
+одновременных загрузок документов и их темп (документов в секунду от первого
+до последнего).
+"""
+from __future__ import annotations
+import argparse, html, json, re, threading, time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+# статика оболочки: путь → (тип, размер в байтах)
+STATIC = {
+    "/static/its.css": ("text/css", 60_000),
+    "/static/logo.png": ("image/png", 120_000),
+    "/static/figure.png": ("image/png", 200_000),
+    "/static/pt-sans.woff2": ("font/woff2", 80_000),
+}
+SHELL_JS = """window.addEventListener('DOMContentLoaded', function () {
+  var b = document.body;
+  setTimeout(function () {
+    document.getElementById('w_metadata_toc').innerHTML = b.dataset.toc;
+    var f = document.querySelector('iframe[name="w_metadata_doc_frame"]');
+    f.addEventListener('load', function () { f.removeAttribute('loading'); f.hidden = false; });
+    f.src = b.dataset.src;
+  }, +b.dataset.delay);
+});"""
+
+
+class MockIts:
+    def __init__(self, book: str = "unfdoc", docs: int = 40, chapters: int = 4, fanout: int = 3,
+                 latency: float = 0.3, shell_delay: float = 0.05, js_every: int = 0):
+        self.book, self.docs, self.chapters, self.fanout = book, docs, chapters, fanout
+        self.js_every = js_every
+        self.latency, self.shell_delay = latency, shell_delay
+        self._lock = threading.Lock()
+        self.requests: dict[str, int] = {}
+        self.active = 0
+        self.max_active = 0
+        self.first = self.last = 0.0
+
+    def doc_url(self, n: int) -> str:
+        return f"/db/{self.book}/content/{n}/hdoc"
+
+    def src_url(self, n: int) -> str:
+        return f"/db/content/{self.book}/src/{n}.htm"
+
+    def title(self, n: int) -> str:
+        return f"Глава {n}. Раздел {n}" if n <= self.chapters else f"Документ {n}"
+
+    def children(self, n: int) -> list[int]:
+        first = self.chapters + (n - 1) * self.fanout + 1
+        return [c for c in range(first, first + self.fanout) if c <= self.docs]
+
+    def shell(self, n: int) -> str:
+        toc = "".join(f'<li><a href="{self.doc_url(i)}">{self.title(i)}</a></li>'
+                      for i in range(1, self.chapters + 1))
+        return f"""<!DOCTYPE html><html><head><meta charset="utf-8"><title>ИТС</title>
+<link rel="stylesheet" href="/static/its.css">
+<link rel="preload" href="/static/pt-sans.woff2" as="font" type="font/woff2" crossorigin>
+<script src="/static/shell.js"></script></head>
+<body data-src="{self.src_url(n)}" data-delay="{int(self.shell_delay * 1000)}" data-toc="{html.escape(toc)}">
+<img src="/static/logo.png" alt="">
+<ul id="w_metadata_toc"></ul>
+<iframe name="w_metadata_doc_frame" loading="true" hidden></iframe>
+<script src="/counters/hit.js"></script>
+</body></html>"""
+
+    def document(self, n: int) -> str:
+        links = [(self.doc_url(c), self.title(c)) for c in self.children(n)]
+        links += [(self.doc_url(1), self.title(1)), (f"{self.doc_url(n)}#sec2", "2. Подробности")]
+        refs = "".join(f'<p>См. <a href="{u}">{t}</a>.</p>' for u, t in links)
+        body = "".join(f"<h2>{i}. Подробности</h2><p>Текст {n}.{i}: при проведении документа "
+                       f"<b>Реализация</b> формируются проводки.</p>" for i in (1, 2))
+        inner = (f'<h1>{self.title(n)}</h1><span class="date">01.02.2024</span>{body}'
+                 f'<img src="/static/figure.png?doc={n}" alt="">{refs}')
+        if self.js_every and n % self.js_every == 0:
+            inner = f"<script>document.currentScript.parentNode.innerHTML = {json.dumps(inner)};</script>"
+        return (f'<!DOCTYPE html><html><head><meta charset="utf-8"><link rel="stylesheet" href="/static/its.css">'
+                f'</head><body><div class="doc-content">{inner}</div></body></html>')
+
+    def handler(self):
+        site = self
+        doc_re = re.compile(rf"^/db/{re.escape(site.book)}/content/(\d+)/hdoc$")
+        src_re = re.compile(rf"^/db/content/{re.escape(site.book)}/src/(\d+)\.htm$")
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                path = urllib.parse.urlsplit(self.path).path.rstrip("/") or "/"
+                if path == "/stats":
+                    with site._lock:
+                        span = site.last - site.first
+                        docs = site.requests.get("doc", 0)
+                        stats = {"requests": site.requests, "max_active": site.max_active,
+                                 "docs_per_s": round((docs - 1) / span, 2) if docs > 1 and span else None}
+                    self._send(200, json.dumps(stats), "application/json")
+                    return
+                if path in STATIC:
+                    self._count("static")
+                    ctype, size = STATIC[path]
+                    self._send(200, "", ctype, body=b"\0" * size)
+                elif path == "/static/shell.js":
+                    self._count("static")
+                    self._send(200, SHELL_JS, "application/javascript")
+                elif path == "/counters/hit.js":
+                    self._count("counter")
+                    self._send(200, "/* счётчик */", "application/javascript")
+                elif path == "/":
+                    self._count("root")
+                    self._send(200, "<!DOCTYPE html><html><body>ИТС (заглушка)</body></html>")
+                elif path == f"/db/{site.book}" or (m := doc_re.match(path)):
+                    self._count("shell")
+                    self._send(200, site.shell(1 if path == f"/db/{site.book}" else int(m.group(1))))
+                elif (m := src_re.match(path)) and 1 <= int(m.group(1)) <= site.docs:
+                    self._count("doc")
+                    with site._lock:
+                        site.active += 1
+                        site.max_active = max(site.max_active, site.active)
+                    try:
+                        time.sleep(site.latency)
+                        self._send(200, site.document(int(m.group(1))))
+                    finally:
+                        with site._lock:
+                            site.active -= 1
+                else:
+                    self._send(404, "not found")
+
+            def _count(self, kind: str):
+                with site._lock:
+                    site.requests[kind] = site.requests.get(kind, 0) + 1
+                    if kind == "doc":
+                        site.last = time.monotonic()
+                        site.first = site.first or site.last
+
+            def _send(self, status: int, text: str, ctype: str = "text/html; charset=utf-8", body: bytes = b""):
+                body = body or text.encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", ctype)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, fmt, *args):
+                pass
+
+        return Handler
+
+
+def serve(port: int, book: str = "unfdoc", docs: int = 40, chapters: int = 4, fanout: int = 3,
+          latency_ms: float = 300, shell_ms: float = 50, js_every: int = 0) -> ThreadingHTTPServer:
+    site = MockIts(book, docs, chapters, fanout, latency_ms / 1000, shell_ms / 1000, js_every)
+    httpd = ThreadingHTTPServer(("127.0.0.1", port), site.handler())
+    httpd.daemon_threads = True
+    httpd.site = site
+    return httpd
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description="Заглушка its.1c.ru для скриптов «Парсер ИТС»")
+    p.add_argument("--port", type=int, default=8767)
+    p.add_argument("--book", default="unfdoc")
+    p.add_argument("--docs", type=int, default=40)
+    p.add_argument("--chapters", type=int, default=4)
+    p.add_argument("--fanout", type=int, default=3)
+    p.add_argument("--latency", type=float, default=300, help="задержка ответа документа, мс")
+    p.add_argument("--shell-ms", type=float, default=50, help="через сколько мс JS оболочки подставит фрейм")
+    p.add_argument("--js-every", type=int, default=0, help="текст каждого N-го документа рисует JS (0 — ни одного)")
+    args = p.parse_args()
+    httpd = serve(args.port, args.book, args.docs, args.chapters, args.fanout, args.latency, args.shell_ms,
+                  args.js_every)
+    print(f"🧪 http://127.0.0.1:{httpd.server_address[1]}/db/{args.book} "
+          f"({args.docs} документов, задержка {args.latency:.0f} мс)")
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,295 @@
+#run_benchmarks.py
+
+"""
+Бенчмарк по стадиям всех парсеров репозитория.
+
+• Локальный парсер — на HTML из «Локальный парсер/Примеры результата»:
+  read_html, parse_tree, extract_main (быстрый путь правил и readability),
+  прежний проход BeautifulSoup, правила сайтов, to_markdown, slug, yaml, запись.
+  Заодно проверяется, что тело .md совпадает с эталоном из той же папки.
+• Парсер 1eska — parse_article (BeautifulSoup) против eska_extract.extract
+  (один проход по lxml-дереву) и markdownify на синтетической статье; заодно
+  проверяется, что оба разбора дают одно и то же.
+• Парсер ИТС — get_text-варианты и split_sections на синтетическом iframe.
+
+usage:
+    python benchmarks/run_benchmarks.py [--repeat 7] [--json out.json]
+                                        [--compare baseline.json] [--threshold 0.15]
+
+Код возврата: 1 — вывод разошёлся с эталоном, 2 — регрессия относительно --compare.
+"""
+from __future__ import annotations
+import argparse, contextlib, datetime as dt, io, json, pathlib, platform, statistics, subprocess, sys, tempfile, time
+
+ROOT = pathlib.Path(__file__).resolve().parent.parent
+LOCAL_DIR = ROOT / "Локальный парсер"
+ESKA_DIR = ROOT / "Парсер 1eska"
+ITS_DIR = ROOT / "Парсер ИТС"
+SAMPLES_DIR = LOCAL_DIR / "Примеры результата"
+for d in (LOCAL_DIR, ESKA_DIR, ITS_DIR):
+    sys.path.insert(0, str(d))
+
+import yaml
+from bs4 import BeautifulSoup
+from markdownify import markdownify
+
+import convert_html_to_md as conv
+import parser1eska
+import eska_extract
+import its_extract
+
+# стадии быстрее этого порога не считаем регрессией — там один шум
+NOISE_FLOOR_MS = 1.0
+
+
+# ---------- timing ---------------------------------------------------
+def measure(fn, setup=None, repeat: int = 7) -> list[float]:
+    """Время fn(*setup()) в мс; setup не входит в замер (свежие данные на каждый прогон)."""
+    times = []
+    for _ in range(repeat):
+        args = setup() if setup else ()
+        t0 = time.perf_counter()
+        fn(*args)
+        times.append((time.perf_counter() - t0) * 1000)
+    return times
+
+
+class Results:
+    def __init__(self):
+        self.stages: dict[str, list[list[float]]] = {}
+
+    def add(self, stage: str, times: list[float]) -> None:
+        """Несколько входов одной стадии складываются по прогонам."""
+        self.stages.setdefault(stage, []).append(times)
+
+    def summary(self) -> dict[str, dict]:
+        out = {}
+        for stage, per_input in self.stages.items():
+            totals = [sum(run) for run in zip(*per_input)]
+            out[stage] = {
+                "median_ms": round(statistics.median(totals), 3),
+                "min_ms": round(min(totals), 3),
+                "inputs": len(per_input),
+                "runs": len(totals),
+            }
+        return out
+
+
+# ---------- synthetic pages -----------------------------------------
+def synthetic_1eska_article(paragraphs: int = 60) -> str:
+    """Страница статьи 1eska.ru в той же разметке, что разбирает parser1eska.py."""
+    nav = "".join(f'<li><a href="/menu/{i}/">Пункт меню {i}</a></li>' for i in range(150))
+    body = []
+    for i in range(paragraphs):
+        if i % 10 == 0:
+            body.append(f"<h2>Раздел {i // 10 + 1}. Настройка учёта в УНФ</h2>")
+        body.append(
+            f"<p>Абзац {i}: в программе <strong>1С:УНФ</strong> документ "
+            f'<a href="/projects/publications/upravlenie-nashey-firmoy-unf/doc-{i}/">«Заказ покупателя»</a> '
+            "формирует движения по регистрам, а <em>настройки параметров учёта</em> "
+            "определяют, какие реквизиты будут доступны пользователю.</p>")
+        if i % 7 == 0:
+            body.append(f'<p><img src="/upload/img-{i}.png" alt="Рисунок {i}"></p>'
+                        "<ul><li>Первый шаг</li><li>Второй шаг</li><li>Третий шаг</li></ul>")
+    tags = "".join(f'<div class="publication-tags__item">#Тег{i}</div>' for i in range(3))
+    return f"""<!DOCTYPE html><html lang="ru"><head>
+<meta charset="utf-8"><title>Статья | 1eska</title>
+<meta itemprop="headline" content="Как настроить учёт в 1С:УНФ">
+<meta itemprop="datePublished" datetime="2024-05-17">
+<meta itemprop="image" content="https://1eska.ru/upload/cover.png">
+<meta property="og:title" content="Как настроить учёт в 1С:УНФ">
+</head><body>
+<header><ul class="menu">{nav}</ul></header>
+<div class="period-wrapper"><span class="date">17.05.2024</span>
+  <span class="section_name"><a href="/projects/publications/">Публикации</a></span></div>
+<div class="publication__author-bold-text">Иван Петров</div>
+<div class="publication__position">Консультант 1С</div>
+<div class="detailimage"><img src="/upload/cover.png"></div>
+<div class="detail blog"><div class="content">{"".join(body)}</div></div>
+<div class="publication-tags">{tags}</div>
+<footer><ul>{nav}</ul></footer>
+</body></html>"""
+
+
+def synthetic_its_iframe(sections: int = 40) -> str:
+    """Содержимое w_metadata_doc_frame: шапка доступа, h2/h3, «жирные» абзацы, таблицы."""
+    body = []
+    for i in range(sections):
+        body.append(f"<h2>{i + 1}. Раздел документации</h2>" if i % 4 == 0
+                    else f"<h3>{i + 1}.1. Подраздел</h3>")
+        body.append('<p class="bold">Назначение</p>')
+        for j in range(5):
+            body.append(f"<p>Текст {i}.{j}: при проведении документа <b>Реализация</b> "
+                        "формируются проводки, см. также "
+                        f'<a href="/db/unfdoc/content/{i}{j}/hdoc">связанный раздел</a>.</p>')
+        body.append("<table><tr><td>Счёт</td><td>Сумма</td></tr>"
+                    "<tr><td>62.01</td><td>1 000,00</td></tr></table>")
+    return f"""<html><head><title>Документация</title></head><body>
+<div class="header">Общий профиль Доступ ограничен Продлить Доступ до 14.10.2025 </div>
+<div class="doc-content"><h1>Глава 1. Документация</h1>{"".join(body)}</div>
+</body></html>"""
+
+
+def split_front_matter(md_text: str) -> tuple[str, str]:
+    _, front, body = md_text.split("---\n", 2)
+    return front, body
+
+
+# ---------- suites ---------------------------------------------------
+def bench_convert(res: Results, repeat: int, tmp: pathlib.Path) -> dict[str, bool]:
+    checks = {}
+    for src in sorted(SAMPLES_DIR.glob("*.html")):
+        text, encoding = conv.read_html(src)
+        fresh_tree = lambda: (conv.parse_tree(text),)
+        probe = conv.parse_tree(text)
+        page_url = conv.extract_saved_url(text) or conv.canonical_url(probe)
+        host = conv.page_host(page_url)
+        rules = conv.match_site_rules(host)
+        title, main_html = conv.extract_main(conv.parse_tree(text), rules)
+
+        res.add("convert.read_html", measure(lambda: conv.read_html(src), repeat=repeat))
+        res.add("convert.parse_tree", measure(lambda: conv.parse_tree(text), repeat=repeat))
+        res.add("convert.extract_main.rules", measure(
+            lambda tree: conv.extract_main(tree, rules), fresh_tree, repeat))
+        res.add("convert.extract_main.readability", measure(
+            lambda tree: conv.extract_main(tree), fresh_tree, repeat))
+        res.add("convert.bs4_html_parser (прежний проход)", measure(
+            lambda: BeautifulSoup(text, "html.parser"), repeat=repeat))
+
+        def site_rules(tree):
+            front = {"url": None, "question": title}
+            for rule in reversed(conv.match_site_rules(host)):
+                for fn in rule.enrich:
+                    fn(tree, None, front)
+            front["url"] = front["url"] or conv.canonical_url(tree)
+        res.add("convert.site_rules", measure(site_rules, lambda: (probe,), repeat))
+
+        md_body = conv.to_markdown(main_html)
+        res.add("convert.to_markdown", measure(lambda: conv.to_markdown(main_html), repeat=repeat))
+        res.add("convert.slug", measure(lambda: conv.md_filename(title), repeat=repeat))
+        front = {"category": "skills", "section_1c": "Универсальные механизмы",
+                 "source_file": src.name, "encoding": encoding, "url": page_url,
+                 "question": title, "imported": "2025-01-01T00:00:00+00:00", "date": "2025-01-01"}
+        res.add("convert.yaml_dump", measure(
+            lambda: yaml.safe_dump(front, allow_unicode=True, sort_keys=False), repeat=repeat))
+        out_file = tmp / "write.md"
+        payload = f"---\n{yaml.safe_dump(front, allow_unicode=True)}---\n\n# {title}\n\n{md_body}"
+        res.add("convert.write", measure(
+            lambda: out_file.write_text(payload, encoding="utf-8"), repeat=repeat))
+        with contextlib.redirect_stdout(io.StringIO()):      # «✓ saved» на каждый прогон не нужен
+            res.add("convert.end_to_end", measure(
+                lambda: conv.convert_file(src, tmp / "e2e", "skills", "Универсальные механизмы"),
+                repeat=repeat))
+            # вывод не должен разойтись с эталонным .md из «Примеры результата»
+            out_path, _ = conv.convert_file(src, tmp / "check")
+        expected = SAMPLES_DIR / out_path.name
+        ok = expected.exists() and (
+            split_front_matter(out_path.read_text(encoding="utf-8"))[1]
+            == split_front_matter(expected.read_text(encoding="utf-8"))[1])
+        checks[f"convert:{out_path.name}"] = ok
+    return checks
+
+
+def bench_1eska(res: Results, repeat: int) -> dict[str, bool]:
+    html = synthetic_1eska_article()
+    url = "https://1eska.ru/projects/publications/upravlenie-nashey-firmoy-unf/synthetic/"
+    content = BeautifulSoup(html, "html.parser").select_one("div.detail.blog .content")
+    body_html = content.decode_contents()
+    res.add("1eska.bs4_html_parser", measure(lambda: BeautifulSoup(html, "html.parser"), repeat=repeat))
+    res.add("1eska.markdownify", measure(lambda: markdownify(body_html), repeat=repeat))
+    res.add("1eska.parse_article", measure(lambda: parser1eska.parse_article(html, url), repeat=repeat))
+    res.add("1eska.extract_fields (без markdownify)", measure(
+        lambda: eska_extract.extract_fields(html), repeat=repeat))
+    res.add("1eska.extract", measure(lambda: eska_extract.extract(html, url), repeat=repeat))
+    compiled = eska_extract.extract(html, url).as_dict()
+    compiled.pop("title_fallback")
+    compiled.pop("extra")
+    return {"1eska:extract == parse_article": compiled == parser1eska.parse_article(html, url)}
+
+
+def bench_its(res: Results, repeat: int) -> None:
+    html = synthetic_its_iframe()
+    res.add("its.plain_text", measure(lambda: its_extract.plain_text(html), repeat=repeat))
+    res.add("its.doc_text", measure(lambda: its_extract.doc_text(html), repeat=repeat))
+    res.add("its.split_sections", measure(lambda: its_extract.split_sections(html), repeat=repeat))
+    res.add("its.split_into_sections", measure(
+        lambda: its_extract.split_into_sections(html), repeat=repeat))
+
+
+# ---------- report ---------------------------------------------------
+def git_revision() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def compare(current: dict, baseline: dict, threshold: float) -> list[str]:
+    """Печатает сравнение и возвращает стадии, замедлившиеся больше threshold."""
+    regressions = []
+    print(f"\n{'стадия':45} {'было, мс':>10} {'стало, мс':>10} {'Δ':>8}")
+    for stage, cur in current.items():
+        old = baseline.get(stage)
+        if not old:
+            print(f"{stage:45} {'—':>10} {cur['median_ms']:10.2f}")
+            continue
+        delta = cur["median_ms"] / old["median_ms"] - 1 if old["median_ms"] else 0.0
+        mark = ""
+        if delta > threshold and cur["median_ms"] >= NOISE_FLOOR_MS:
+            regressions.append(stage)
+            mark = "  ⚠️"
+        print(f"{stage:45} {old['median_ms']:10.2f} {cur['median_ms']:10.2f} {delta:+8.1%}{mark}")
+    return regressions
+
+
+def main() -> int:
+    p = argparse.ArgumentParser()
+    p.add_argument("--repeat", type=int, default=7)
+    p.add_argument("--json", dest="json_out", type=pathlib.Path,
+                   help="куда записать результаты (для сравнения коммитов)")
+    p.add_argument("--compare", type=pathlib.Path, help="JSON прошлого прогона")
+    p.add_argument("--threshold", type=float, default=0.15,
+                   help="допустимое замедление медианы, доля (по умолчанию 0.15)")
+    args = p.parse_args()
+
+    res = Results()
+    with tempfile.TemporaryDirectory() as tmp:
+        checks = bench_convert(res, args.repeat, pathlib.Path(tmp))
+    checks.update(bench_1eska(res, args.repeat))
+    bench_its(res, args.repeat)
+    summary = res.summary()
+
+    print(f"{'стадия':45} {'медиана, мс':>12} {'мин, мс':>10}")
+    for stage, r in summary.items():
+        print(f"{stage:45} {r['median_ms']:12.2f} {r['min_ms']:10.2f}")
+    for name, ok in checks.items():
+        print(("✓ " if ok else "✗ не совпадает с эталоном: ") + name)
+
+    report = {
+        "meta": {
+            "revision": git_revision(),
+            "timestamp": dt.datetime.now(dt.timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "repeat": args.repeat,
+        },
+        "stages": summary,
+        "checks": checks,
+    }
+    if args.json_out:
+        args.json_out.write_text(json.dumps(report, ensure_ascii=False, indent=1), encoding="utf-8")
+        print(f"💾 {args.json_out}")
+
+    if not all(checks.values()):
+        return 1
+    if args.compare:
+        baseline = json.loads(args.compare.read_text(encoding="utf-8"))
+        if (regressions := compare(summary, baseline.get("stages", {}), args.threshold)):
+            print(f"⚠️ регрессии: {', '.join(regressions)}")
+            return 2
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
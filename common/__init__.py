@@ -0,0 +1,2 @@
+# Общий код для скриптов из «Локальный парсер», «Парсер 1eska» и «Парсер ИТС».
+# Скрипты добавляют корень репозитория в sys.path и импортируют отсюда.
@@ -0,0 +1,132 @@
+# crawl_state.py
+"""
+Состояние обхода на диске (crawl_state.sqlite рядом с результатом), чтобы
+упавший или остановленный краулер продолжал с того же места.
+
+    state = CrawlState(out_dir / CrawlState.FILE_NAME)
+    state.begin(start_url, resume=args.resume)   # без resume — чистый лист
+    state.add_articles(urls)                     # фронтир: найдены, не обработаны
+    state.article_failed(url, "HTTPError: 500")  # ошибки — сразу, с текстом
+    state.page_done(page_url, page, urls, done)  # страница и её статьи — одной транзакцией
+    state.finish()
+
+Статья получает статус done только вместе со страницей, то есть после
+sink.flush(): упавший посреди страницы прогон перекачает её недописанные
+статьи, но не потеряет их. Статусы: pending, done, failed.
+"""
+from __future__ import annotations
+import json, pathlib, sqlite3, time
+
+
+def _now() -> str:
+    return time.strftime("%Y-%m-%dT%H:%M:%S")
+
+
+class CrawlState:
+    FILE_NAME = "crawl_state.sqlite"
+
+    def __init__(self, path: pathlib.Path):
+        self.path = pathlib.Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(self.path)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        with self._db:
+            self._db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+            self._db.execute("CREATE TABLE IF NOT EXISTS pages (url TEXT PRIMARY KEY, page INTEGER, "
+                             "status TEXT NOT NULL, articles TEXT, error TEXT, updated TEXT)")
+            self._db.execute("CREATE TABLE IF NOT EXISTS articles (url TEXT PRIMARY KEY, status TEXT NOT NULL, "
+                             "error TEXT, attempts INTEGER NOT NULL DEFAULT 0, updated TEXT)")
+
+    # ---------- прогон -------------------------------------------------
+    def _meta(self, key: str) -> str | None:
+        row = self._db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, key: str, value: str) -> None:
+        self._db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    def begin(self, start_url: str, resume: bool = False) -> bool:
+        """
+        Начало прогона. resume=True продолжает прежний (если он был и с тем же
+        start_url, иначе ValueError); иначе состояние очищается. Возвращает,
+        продолжается ли прерванный прогон.
+        """
+        previous = self._meta("start_url")
+        if resume and previous is not None:
+            if previous != start_url:
+                raise ValueError(f"сохранённый обход начинался с {previous}, а не с {start_url}")
+            with self._db:
+                self._set_meta("completed", "0")
+            return True
+        with self._db:
+            for table in ("meta", "pages", "articles"):
+                self._db.execute(f"DELETE FROM {table}")
+            self._set_meta("start_url", start_url)
+            self._set_meta("started", _now())
+            self._set_meta("completed", "0")
+        return False
+
+    def finish(self) -> None:
+        with self._db:
+            self._set_meta("completed", "1")
+            self._set_meta("finished", _now())
+
+    # ---------- страницы ----------------------------------------------
+    def last_page(self) -> tuple[int, list[str]] | None:
+        """Номер и статьи последней полностью обработанной страницы."""
+        row = self._db.execute("SELECT page, articles FROM pages WHERE status = 'done' "
+                               "ORDER BY page DESC LIMIT 1").fetchone()
+        return (row[0], json.loads(row[1])) if row else None
+
+    def pages(self, status: str = "done") -> set[str]:
+        return {r[0] for r in self._db.execute("SELECT url FROM pages WHERE status = ?", (status,))}
+
+    def page_done(self, url: str, page: int, articles: list[str], done: list[str]) -> None:
+        with self._db:
+            self._db.execute("INSERT OR REPLACE INTO pages (url, page, status, articles, error, updated) "
+                             "VALUES (?, ?, 'done', ?, NULL, ?)",
+                             (url, page, json.dumps(articles, ensure_ascii=False), _now()))
+            self._mark_done(done)
+
+    def page_failed(self, url: str, page: int, error: str) -> None:
+        with self._db:
+            self._db.execute("INSERT OR REPLACE INTO pages (url, page, status, articles, error, updated) "
+                             "VALUES (?, ?, 'failed', NULL, ?, ?)", (url, page, error, _now()))
+
+    # ---------- статьи ------------------------------------------------
+    def articles(self, status: str) -> list[str]:
+        return [r[0] for r in self._db.execute(
+            "SELECT url FROM articles WHERE status = ? ORDER BY rowid", (status,))]
+
+    def add_articles(self, urls: list[str]) -> None:
+        with self._db:
+            self._db.executemany("INSERT OR IGNORE INTO articles (url, status, updated) VALUES (?, 'pending', ?)",
+                                 [(u, _now()) for u in urls])
+
+    def _mark_done(self, urls: list[str]) -> None:
+        self._db.executemany("INSERT INTO articles (url, status, updated) VALUES (?, 'done', ?) "
+                             "ON CONFLICT(url) DO UPDATE SET status = 'done', error = NULL, "
+                             "updated = excluded.updated", [(u, _now()) for u in urls])
+
+    def articles_done(self, urls: list[str]) -> None:
+        with self._db:
+            self._mark_done(urls)
+
+    def article_failed(self, url: str, error: str) -> None:
+        with self._db:
+            self._db.execute("INSERT INTO articles (url, status, error, attempts, updated) "
+                             "VALUES (?, 'failed', ?, 1, ?) ON CONFLICT(url) DO UPDATE SET "
+                             "status = 'failed', error = excluded.error, attempts = attempts + 1, "
+                             "updated = excluded.updated", (url, error, _now()))
+
+    def failures(self) -> list[tuple[str, str, int]]:
+        """(url, ошибка, неудачных попыток) — для отчёта в конце прогона."""
+        return list(self._db.execute("SELECT url, error, attempts FROM articles "
+                                     "WHERE status = 'failed' ORDER BY rowid"))
+
+    def counts(self) -> dict[str, int]:
+        return dict(self._db.execute("SELECT status, COUNT(*) FROM articles GROUP BY status"))
+
+    def close(self) -> None:
+        self._db.close()
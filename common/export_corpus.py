@@ -0,0 +1,57 @@
+#export_corpus.py
+
+"""
+Перекладывает корпус между форматами приёмников (см. sinks.py).
+
+usage:
+    python common/export_corpus.py data/md        data/shards --to jsonl [--shard-mb 64]
+    python common/export_corpus.py data/shards    data/db     --to sqlite
+    python common/export_corpus.py data/db        data/md     --to md
+    python common/export_corpus.py data/shards    data/packed --to jsonl     # уплотнение шардов
+
+Формат источника определяется по содержимому папки. При выгрузке в .md
+front-matter пишется в YAML-формате convert_html_to_md.py.
+"""
+from __future__ import annotations
+import argparse, pathlib, sys, time
+
+if __package__ in (None, ""):
+    sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+from common.sinks import SINKS, detect_sink, open_sink
+
+
+def export(src: pathlib.Path, dst: pathlib.Path, to: str,
+           shard_mb: float = 64, source_kind: str | None = None) -> int:
+    kind = source_kind or detect_sink(src)
+    if src.resolve() == dst.resolve():
+        raise ValueError("источник и назначение совпадают")
+    reader = open_sink(kind, src)
+    writer = open_sink(to, dst, shard_mb)
+    count = 0
+    try:
+        for name, front, body in reader:
+            writer.write(name, front, body)
+            count += 1
+    finally:
+        writer.close()
+        reader.close()
+    return count
+
+
+def main(argv: list[str] | None = None) -> int:
+    p = argparse.ArgumentParser(description="Экспорт корпуса между .md, JSONL-шардами и SQLite")
+    p.add_argument("src", type=pathlib.Path)
+    p.add_argument("dst", type=pathlib.Path)
+    p.add_argument("--to", choices=sorted(SINKS), required=True)
+    p.add_argument("--from", dest="source_kind", choices=sorted(SINKS),
+                   help="формат источника (по умолчанию определяется сам)")
+    p.add_argument("--shard-mb", type=float, default=64)
+    args = p.parse_args(argv)
+    started = time.perf_counter()
+    count = export(args.src, args.dst, args.to, args.shard_mb, args.source_kind)
+    print(f"🏁 {args.src} → {args.dst} ({args.to}): {count} документов за {time.perf_counter() - started:.1f} с")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,321 @@
+# fetch.py
+"""
+HTTP для краулеров: одна requests.Session с пулом соединений и вежливость к хосту.
+
+    session = make_session(pool_size=4, headers={...})
+    limiter = HostLimiter(max_concurrent=4, min_delay=0.2)
+    with limiter.slot(url):
+        r = session.get(url)
+
+HostLimiter держит не больше max_concurrent запросов к одному хосту
+одновременно и разносит их старты минимум на min_delay секунд.
+
+Fetcher — GET поверх того и другого с ограниченным временем на запрос:
+
+    fetcher = Fetcher(session, limiter, timeout=(5, 30), retries=3, hedge_after=None)
+    r = fetcher.get(url, kind="article")
+    fetcher.latency.summary()
+
+- таймауты соединения и чтения на каждую попытку;
+- повтор при обрыве, таймауте, 429 и 5xx с экспоненциальной паузой и
+  случайным разбросом (full jitter); Retry-After у 429/503 соблюдается и
+  сдвигает старты всех запросов к хосту (HostLimiter.defer), а если сервер
+  просит ждать дольше max_backoff — ответ отдаётся как есть, без повторов;
+- предохранитель на хост: после breaker_threshold неудач подряд запросы к
+  хосту сразу падают с CircuitOpen, через breaker_cooldown пропускается
+  одна пробная попытка — удалась, и хост снова открыт;
+- hedge_after (секунды): если ответа нет так долго, параллельно уходит
+  второй такой же запрос, берётся первый ответ;
+- гистограммы задержек по (хост, вид запроса) и самые медленные URL.
+
+Худший случай на один URL ограничен: (retries + 1) × (connect + read) плюс
+паузы, каждая не длиннее max_backoff.
+"""
+from __future__ import annotations
+import contextlib, email.utils, heapq, random, threading, time
+import urllib.parse
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from common import metrics
+from common.metrics import LatencyHistogram
+
+
+def make_session(pool_size: int = 4, headers: dict | None = None) -> requests.Session:
+    """Session, в пуле которой хватает keep-alive соединений на все потоки."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    if headers:
+        session.headers.update(headers)
+    return session
+
+
+class _HostState:
+    __slots__ = ("sem", "spare", "lock", "next_start")
+
+    def __init__(self, max_concurrent: int):
+        self.sem = threading.BoundedSemaphore(max_concurrent)
+        # дубли медленных запросов идут сверх лимита, но их немного: иначе дубль
+        # ждал бы места, которое держат те самые медленные запросы
+        self.spare = threading.BoundedSemaphore(max(1, max_concurrent // 2))
+        self.lock = threading.Lock()
+        self.next_start = 0.0
+
+
+class HostLimiter:
+    def __init__(self, max_concurrent: int = 4, min_delay: float = 0.0):
+        self.max_concurrent = max(1, max_concurrent)
+        self.min_delay = max(0.0, min_delay)
+        self._hosts: dict[str, _HostState] = {}
+        self._lock = threading.Lock()
+
+    def _state(self, host: str) -> _HostState:
+        with self._lock:
+            if host not in self._hosts:
+                self._hosts[host] = _HostState(self.max_concurrent)
+            return self._hosts[host]
+
+    @contextlib.contextmanager
+    def slot(self, url: str, hedge: bool = False):
+        state = self._state(urllib.parse.urlsplit(url).netloc.lower())
+        with (state.spare if hedge else state.sem):
+            # время старта резервируется под замком, ждём уже без него
+            with state.lock:
+                now = time.monotonic()
+                start = max(now, state.next_start)
+                state.next_start = start + self.min_delay
+            if start > now:
+                time.sleep(start - now)
+            yield
+
+    def defer(self, url: str, seconds: float) -> None:
+        """Сервер попросил подождать (Retry-After): следующие старты к хосту — не раньше чем через seconds."""
+        state = self._state(urllib.parse.urlsplit(url).netloc.lower())
+        with state.lock:
+            state.next_start = max(state.next_start, time.monotonic() + seconds)
+
+
+# ---------- задержки ----------------------------------------------
+class LatencyStats:
+    """Задержки попыток по (хост, вид) и полное время (с повторами) самых медленных URL."""
+
+    def __init__(self, slowest: int = 10):
+        self._lock = threading.Lock()
+        self.histograms: dict[tuple[str, str], LatencyHistogram] = {}
+        self._slowest: list[tuple[float, str]] = []
+        self._keep = slowest
+        self.counters = {"requests": 0, "retries": 0, "hedged": 0, "hedge_won": 0,
+                         "timeouts": 0, "circuit_open": 0}
+
+    def add(self, url: str, kind: str, ms: float) -> None:
+        key = (urllib.parse.urlsplit(url).netloc.lower(), kind)
+        with self._lock:
+            hist = self.histograms.get(key)
+            if hist is None:
+                hist = self.histograms[key] = LatencyHistogram()
+            hist.add(ms)
+
+    def add_url(self, url: str, ms: float) -> None:
+        with self._lock:
+            item = (ms, url)
+            if len(self._slowest) < self._keep:
+                heapq.heappush(self._slowest, item)
+            elif item > self._slowest[0]:
+                heapq.heapreplace(self._slowest, item)
+
+    def count(self, name: str, n: int = 1) -> None:
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+        # повторы и прочее — и в общие метрики краулера (retries_total, http_timeouts_total, …)
+        metrics.count(name if name == "retries" else f"http_{name}", n)
+
+    def summary(self) -> dict:
+        with self._lock:
+            return {
+                "counters": dict(self.counters),
+                "latency": {f"{host} {kind}": h.as_dict() for (host, kind), h in sorted(self.histograms.items())},
+                "slowest": [{"url": u, "ms": round(ms, 1)} for ms, u in sorted(self._slowest, reverse=True)],
+            }
+
+    def log_lines(self) -> list[str]:
+        s = self.summary()
+        lines = [", ".join(f"{k} {v}" for k, v in s["counters"].items())]
+        for key, h in s["latency"].items():
+            lines.append(f"{key}: {h['count']} req, p50 ~{h['p50_ms']:g} ms, p90 ~{h['p90_ms']:g} ms, "
+                         f"p99 ~{h['p99_ms']:g} ms, max {h['max_ms']:g} ms")
+        if s["slowest"]:
+            lines.append("slowest: " + ", ".join(f"{x['url']} {x['ms']:g} ms" for x in s["slowest"][:3]))
+        return lines
+
+
+# ---------- предохранитель ----------------------------------------
+class CircuitOpen(requests.RequestException):
+    """Хост недавно падал раз за разом — запрос не отправлялся."""
+
+
+class _Breaker:
+    __slots__ = ("failures", "open_until", "probing")
+
+    def __init__(self):
+        self.failures = 0
+        self.open_until = 0.0
+        self.probing = False
+
+
+# ---------- загрузка ----------------------------------------------
+RETRY_STATUS = {429, 500, 502, 503, 504}
+_RETRY_ERRORS = (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError)
+
+
+def retry_after(response: requests.Response) -> float | None:
+    """Retry-After в секундах: число или HTTP-дата; None — заголовка нет или он кривой."""
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, when.timestamp() - time.time())
+
+
+class Fetcher:
+    def __init__(self, session: requests.Session, limiter: HostLimiter | None = None,
+                 timeout: tuple[float, float] = (5.0, 30.0), retries: int = 3,
+                 backoff: float = 0.5, max_backoff: float = 30.0,
+                 breaker_threshold: int = 5, breaker_cooldown: float = 30.0,
+                 hedge_after: float | None = None, hedge_workers: int = 8,
+                 stop: threading.Event | None = None):
+        self.session = session
+        self.limiter = limiter or HostLimiter(max_concurrent=1 << 16)
+        self.timeout = timeout
+        self.retries = max(0, retries)
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.breaker_threshold = breaker_threshold      # 0 — предохранитель выключен
+        self.breaker_cooldown = breaker_cooldown
+        self.hedge_after = hedge_after
+        self.stop = stop or threading.Event()
+        self.latency = LatencyStats()
+        self._breakers: dict[str, _Breaker] = {}
+        self._lock = threading.Lock()
+        # основная попытка и её дубль идут в своём пуле, вызывающий поток ждёт первого
+        self._hedge_pool = (ThreadPoolExecutor(max_workers=max(2, hedge_workers), thread_name_prefix="hedge")
+                            if hedge_after else None)
+
+    def close(self) -> None:
+        if self._hedge_pool is not None:
+            self._hedge_pool.shutdown(wait=False, cancel_futures=True)
+
+    # ----- предохранитель
+    def _admit(self, host: str) -> None:
+        if not self.breaker_threshold:
+            return
+        with self._lock:
+            b = self._breakers.setdefault(host, _Breaker())
+            if b.failures < self.breaker_threshold:
+                return
+            if time.monotonic() >= b.open_until and not b.probing:
+                b.probing = True                 # полуоткрыт: одна пробная попытка
+                return
+        self.latency.count("circuit_open")
+        raise CircuitOpen(f"circuit open for {host} after {b.failures} failures in a row")
+
+    def _outcome(self, host: str, ok: bool | None) -> None:
+        """ok=None — попытка сорвалась не по вине хоста: не в счёт, только снять пробу."""
+        if not self.breaker_threshold:
+            return
+        with self._lock:
+            b = self._breakers.setdefault(host, _Breaker())
+            b.probing = False
+            if ok:
+                b.failures = 0
+            elif ok is not None:
+                b.failures += 1
+                if b.failures >= self.breaker_threshold:
+                    b.open_until = time.monotonic() + self.breaker_cooldown
+
+    # ----- одна попытка
+    def _attempt(self, url: str, headers: dict | None, kind: str, hedge: bool = False) -> requests.Response:
+        with self.limiter.slot(url, hedge):
+            t0 = time.perf_counter()
+            try:
+                return self.session.get(url, headers=headers, timeout=self.timeout)
+            finally:
+                self.latency.add(url, kind, (time.perf_counter() - t0) * 1000)
+
+    def _hedged(self, url: str, headers: dict | None, kind: str) -> requests.Response:
+        first = self._hedge_pool.submit(self._attempt, url, headers, kind)
+        done, _ = wait([first], timeout=self.hedge_after)
+        if done:
+            return first.result()
+        self.latency.count("hedged")
+        second = self._hedge_pool.submit(self._attempt, url, headers, kind, True)
+        pending = {first, second}
+        while True:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in done:
+                # упавшая попытка не в счёт, пока вторая ещё идёт; проигравшая
+                # доработает в фоне (отменить идущий запрос requests не умеет)
+                if fut.exception() is None or not pending:
+                    if fut is second:
+                        self.latency.count("hedge_won")
+                    return fut.result()
+
+    def _pause(self, attempt: int, response: requests.Response | None) -> float | None:
+        """Сколько ждать перед следующей попыткой; None — повторять бессмысленно."""
+        delay = random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+        if response is not None and response.status_code in (429, 503):
+            asked = retry_after(response)
+            if asked is not None:
+                if asked > self.max_backoff:
+                    return None
+                delay = max(delay, asked)
+        return delay
+
+    def get(self, url: str, headers: dict | None = None, kind: str = "get") -> requests.Response:
+        """
+        GET с таймаутами и повторами. Возвращает последний ответ (в том числе
+        4xx/5xx — raise_for_status остаётся за вызывающим); исключение — если
+        ни одна попытка не получила ответа или хост закрыт предохранителем.
+        """
+        host = urllib.parse.urlsplit(url).netloc.lower()
+        t0 = time.perf_counter()
+        self.latency.count("requests")
+        try:
+            for attempt in range(self.retries + 1):
+                self._admit(host)
+                response = error = None
+                try:
+                    response = (self._hedged if self._hedge_pool else self._attempt)(url, headers, kind)
+                except _RETRY_ERRORS as e:
+                    error = e
+                    if isinstance(e, requests.Timeout):
+                        self.latency.count("timeouts")
+                except BaseException:
+                    self._outcome(host, None)
+                    raise
+                failed = error is not None or response.status_code in RETRY_STATUS
+                self._outcome(host, not failed)
+                if not failed:
+                    return response
+                delay = self._pause(attempt, response) if attempt < self.retries else None
+                if delay is None or self.stop.is_set():
+                    break
+                if response is not None and response.status_code in (429, 503) and retry_after(response):
+                    self.limiter.defer(url, delay)
+                self.latency.count("retries")
+                if self.stop.wait(delay):
+                    break
+            if error is not None:
+                raise error
+            return response
+        finally:
+            self.latency.add_url(url, (time.perf_counter() - t0) * 1000)
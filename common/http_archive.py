@@ -0,0 +1,134 @@
+# http_archive.py
+"""
+Архив сырых HTTP-ответов и воспроизведение из него вместо живого сайта.
+
+    archive = HttpArchive("raw_1eska")
+    archive.record(session)     # каждый GET-ответ сессии попадает в архив
+    archive.replay(session)     # сессия отвечает из архива, в сеть не ходит
+
+Тела лежат один раз на содержимое: objects/ab/<sha256>.gz (gzip); в
+responses.sqlite — URL запроса, статус, заголовки, sha256 и время. Повторный
+запрос того же URL с тем же ответом новой строки не добавляет; если ответ
+изменился, побеждает последний. Редиректы хранятся как есть (3xx + Location),
+поэтому при воспроизведении requests проходит ту же цепочку.
+
+При воспроизведении условные заголовки (If-None-Match и т. п.) игнорируются —
+всегда отдаётся сохранённый ответ; URL, которого нет в архиве, получает 504.
+"""
+from __future__ import annotations
+import gzip, hashlib, json, os, pathlib, sqlite3, threading, time
+
+import requests
+from requests.adapters import BaseAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+# тело хранится уже раскодированным — заголовки транспорта к нему не относятся
+_DROP_HEADERS = {"content-encoding", "transfer-encoding", "content-length", "connection", "keep-alive"}
+
+
+class HttpArchive:
+    DB_NAME = "responses.sqlite"
+
+    def __init__(self, root: pathlib.Path):
+        self.root = pathlib.Path(root)
+        self.objects = self.root / "objects"
+        self.objects.mkdir(parents=True, exist_ok=True)
+        # пишут потоки пула загрузки — одно соединение под замком
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.root / self.DB_NAME, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        with self._db:
+            self._db.execute("CREATE TABLE IF NOT EXISTS responses (url TEXT NOT NULL, status INTEGER NOT NULL, "
+                             "headers TEXT NOT NULL, sha256 TEXT NOT NULL, fetched TEXT NOT NULL)")
+            self._db.execute("CREATE INDEX IF NOT EXISTS responses_url ON responses (url)")
+
+    def _object(self, sha: str) -> pathlib.Path:
+        return self.objects / sha[:2] / f"{sha}.gz"
+
+    # ---------- запись ------------------------------------------------
+    def store(self, url: str, status: int, headers: dict, body: bytes) -> str:
+        sha = hashlib.sha256(body).hexdigest()
+        path = self._object(sha)
+        if not path.exists():
+            path.parent.mkdir(exist_ok=True)
+            tmp = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+            tmp.write_bytes(gzip.compress(body, compresslevel=6))
+            os.replace(tmp, path)
+        headers = {k: v for k, v in headers.items() if k.lower() not in _DROP_HEADERS}
+        with self._lock, self._db:
+            last = self._db.execute("SELECT status, sha256 FROM responses WHERE url = ? "
+                                    "ORDER BY rowid DESC LIMIT 1", (url,)).fetchone()
+            if last != (status, sha):
+                self._db.execute("INSERT INTO responses (url, status, headers, sha256, fetched) "
+                                 "VALUES (?, ?, ?, ?, ?)",
+                                 (url, status, json.dumps(headers, ensure_ascii=False), sha,
+                                  time.strftime("%Y-%m-%dT%H:%M:%S")))
+        return sha
+
+    def _hook(self, response: requests.Response, *args, **kwargs):
+        # 304 без тела затёр бы сохранённую страницу
+        if response.request.method == "GET" and response.status_code != 304:
+            self.store(response.request.url, response.status_code, dict(response.headers), response.content)
+        return response
+
+    def record(self, session: requests.Session) -> None:
+        session.hooks["response"].append(self._hook)
+
+    # ---------- чтение ------------------------------------------------
+    def lookup(self, url: str) -> tuple[int, dict, bytes] | None:
+        with self._lock:
+            row = self._db.execute("SELECT status, headers, sha256 FROM responses WHERE url = ? "
+                                   "ORDER BY rowid DESC LIMIT 1", (url,)).fetchone()
+        if row is None:
+            return None
+        status, headers, sha = row
+        return status, json.loads(headers), gzip.decompress(self._object(sha).read_bytes())
+
+    def __iter__(self):
+        """(url, status, headers, body) — последняя версия каждого URL."""
+        with self._lock:
+            urls = [r[0] for r in self._db.execute("SELECT url FROM responses GROUP BY url ORDER BY MIN(rowid)")]
+        for url in urls:
+            yield (url, *self.lookup(url))
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(DISTINCT url) FROM responses").fetchone()[0]
+
+    def replay(self, session: requests.Session) -> None:
+        adapter = ReplayAdapter(self)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+
+    def close(self) -> None:
+        self._db.close()
+
+
+class ReplayAdapter(BaseAdapter):
+    """Транспорт requests, который отвечает из HttpArchive."""
+
+    def __init__(self, archive: HttpArchive):
+        super().__init__()
+        self.archive = archive
+
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        found = self.archive.lookup(request.url) if request.method == "GET" else None
+        if found is None:
+            status, headers, body = 504, {"Content-Type": "text/plain; charset=utf-8"}, b"not in archive"
+        else:
+            status, headers, body = found
+        r = requests.Response()
+        r.status_code = status
+        r.reason = "Replayed" if found else "Not In Archive"
+        r.headers = CaseInsensitiveDict(headers)
+        r.encoding = get_encoding_from_headers(r.headers)
+        r._content = body
+        r._content_consumed = True
+        r.url = request.url
+        r.request = request
+        r.connection = self
+        return r
+
+    def close(self) -> None:
+        pass
@@ -0,0 +1,343 @@
+# metrics.py
+"""
+Сводные метрики обхода для всех краулеров: счётчики, байты и задержки стадий.
+
+    from common import metrics
+    metrics.add_cli_arguments(parser)       # --metrics FILE.prom --metrics-interval SEC --metrics-summary FILE.json
+    metrics.start("parser1eska", args.metrics, args.metrics_summary, args.metrics_interval)
+    with metrics.stage("fetch"):
+        ...
+    metrics.count("pages")
+    metrics.add_bytes(len(raw))
+    metrics.failure(exc)                    # failures_total{reason="http_503"}
+    metrics.skip("known")                   # skipped_total{reason="known"}
+    metrics.finish()                        # последний .prom, JSON-сводка, строка в консоль
+
+В отличие от profiling (подробный отчёт по документам, включается флагом)
+метрики собираются всегда и дёшево: счётчик — словарь под замком, задержка —
+корзина гистограммы. С --metrics файл в текстовом формате Prometheus
+переписывается каждые --metrics-interval секунд (node_exporter textfile
+collector его подхватит), с --metrics-summary в конце пишется JSON.
+
+log_bulk — для списков URL и фрагментов текста: не чаще раза в every секунд
+на ключ, с обрезкой списка; пропущенные вызовы досчитываются в следующий.
+"""
+from __future__ import annotations
+import bisect, datetime as dt, json, os, pathlib, re, sys, threading, time
+
+PREFIX = "crawler"
+DEFAULT_INTERVAL = 15.0
+# границы корзин, мс: 1-2-5 по декадам до 100 с
+BUCKETS_MS = [m * 10 ** e for e in range(0, 5) for m in (1, 2, 5)] + [100_000]
+
+
+class LatencyHistogram:
+    __slots__ = ("counts", "total", "max")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS_MS) + 1)
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, ms: float) -> None:
+        self.counts[bisect.bisect_left(BUCKETS_MS, ms)] += 1
+        self.total += ms
+        self.max = max(self.max, ms)
+
+    @property
+    def count(self) -> int:
+        return sum(self.counts)
+
+    def percentile(self, q: float) -> float:
+        """q-й процентиль (мс): линейно внутри корзины, не больше максимума."""
+        rank, seen = q / 100 * self.count, 0
+        for i, c in enumerate(self.counts):
+            if c and seen + c >= rank:
+                lo = BUCKETS_MS[i - 1] if i else 0.0
+                hi = min(BUCKETS_MS[i], self.max) if i < len(BUCKETS_MS) else self.max
+                return round(lo + (hi - lo) * max(0.0, rank - seen) / c, 1)
+            seen += c
+        return 0.0
+
+    def as_dict(self) -> dict:
+        n = self.count
+        return {
+            "count": n,
+            "mean_ms": round(self.total / n, 1) if n else 0.0,
+            "p50_ms": self.percentile(50), "p90_ms": self.percentile(90), "p99_ms": self.percentile(99),
+            "max_ms": round(self.max, 1),
+            "buckets": {f"le_{b}": c for b, c in zip(BUCKETS_MS + ["inf"], self.counts) if c},
+        }
+
+
+def _labels(labels: dict) -> tuple:
+    return tuple(sorted((k, str(v)) for k, v in labels.items() if v is not None))
+
+
+def _prom_labels(labels: tuple, extra: tuple = ()) -> str:
+    items = [*labels, *extra]
+    if not items:
+        return ""
+    esc = lambda v: v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return "{" + ",".join(f'{k}="{esc(v)}"' for k, v in items) + "}"
+
+
+def reason(error: BaseException | str) -> str:
+    """Причина сбоя для метки: http_503, timeout, connection_error, circuit_open, …"""
+    if isinstance(error, str):
+        return error
+    status = getattr(getattr(error, "response", None), "status_code", None)
+    if status is not None:
+        return f"http_{status}"
+    name = type(error).__name__
+    if name.endswith("Timeout") or name == "TimeoutError":
+        return "timeout"
+    return re.sub(r"(?<!^)(?=[A-Z])", "_", name).lower()
+
+
+class Metrics:
+    def __init__(self, job: str = ""):
+        self.job = job
+        self.started = time.time()
+        self._t0 = time.perf_counter()
+        self._lock = threading.Lock()
+        self.counters: dict[tuple[str, tuple], float] = {}
+        self.latency: dict[tuple[str, tuple], LatencyHistogram] = {}
+
+    # --- запись -------------------------------------------------------
+    def count(self, name: str, n: float = 1, **labels) -> None:
+        key = (name, _labels(labels))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + n
+
+    def observe(self, stage: str, seconds: float, **labels) -> None:
+        key = (stage, _labels(labels))
+        with self._lock:
+            hist = self.latency.get(key)
+            if hist is None:
+                hist = self.latency[key] = LatencyHistogram()
+            hist.add(seconds * 1000)
+
+    def total(self, name: str) -> float:
+        with self._lock:
+            return sum(v for (n, _), v in self.counters.items() if n == name)
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self._t0
+
+    # --- вывод --------------------------------------------------------
+    def prometheus(self) -> str:
+        job = (("job", self.job),) if self.job else ()
+        elapsed = self.elapsed()
+        with self._lock:
+            counters = sorted(self.counters.items())
+            latency = sorted((k, list(h.counts), h.total) for k, h in self.latency.items())
+        lines = [f"# HELP {PREFIX}_start_time_seconds Unix time the crawl started.",
+                 f"# TYPE {PREFIX}_start_time_seconds gauge",
+                 f"{PREFIX}_start_time_seconds{_prom_labels(job)} {self.started:.3f}",
+                 f"# TYPE {PREFIX}_elapsed_seconds gauge",
+                 f"{PREFIX}_elapsed_seconds{_prom_labels(job)} {elapsed:.3f}"]
+        pages = sum(v for (n, _), v in counters if n == "pages")
+        lines += [f"# TYPE {PREFIX}_pages_per_second gauge",
+                  f"{PREFIX}_pages_per_second{_prom_labels(job)} {pages / elapsed if elapsed else 0:.3f}"]
+        typed = set()
+        for (name, labels), value in counters:
+            metric = f"{PREFIX}_{name}_total"
+            if metric not in typed:
+                typed.add(metric)
+                lines.append(f"# TYPE {metric} counter")
+            lines.append(f"{metric}{_prom_labels(job, labels)} {value:g}")
+        if latency:
+            metric = f"{PREFIX}_latency_seconds"
+            lines.append(f"# TYPE {metric} histogram")
+        for (stage, labels), counts, total in latency:
+            base = (*job, ("stage", stage), *labels)
+            cumulative = 0
+            for bound, c in zip(BUCKETS_MS, counts):
+                cumulative += c
+                lines.append(f'{metric}_bucket{_prom_labels(base, (("le", f"{bound / 1000:g}"),))} {cumulative}')
+            cumulative += counts[-1]
+            lines.append(f'{metric}_bucket{_prom_labels(base, (("le", "+Inf"),))} {cumulative}')
+            lines.append(f"{metric}_sum{_prom_labels(base)} {total / 1000:.6f}")
+            lines.append(f"{metric}_count{_prom_labels(base)} {cumulative}")
+        return "\n".join(lines) + "\n"
+
+    def summary(self) -> dict:
+        elapsed = self.elapsed()
+        counters: dict[str, dict] = {}
+        with self._lock:
+            for (name, labels), value in sorted(self.counters.items()):
+                entry = counters.setdefault(name, {"total": 0})
+                entry["total"] += value
+                if labels:
+                    entry.setdefault("by", {})[",".join(f"{k}={v}" for k, v in labels)] = value
+            latency = {(stage + (f"[{','.join(f'{k}={v}' for k, v in labels)}]" if labels else "")): h.as_dict()
+                       for (stage, labels), h in sorted(self.latency.items())}
+        pages = counters.get("pages", {}).get("total", 0)
+        return {
+            "meta": {
+                "job": self.job,
+                "argv": sys.argv,
+                "started": dt.datetime.fromtimestamp(self.started, dt.timezone.utc).isoformat(timespec="seconds"),
+                "elapsed_s": round(elapsed, 3),
+                "pages_per_s": round(pages / elapsed, 3) if elapsed else 0.0,
+                "bytes_per_s": round(counters.get("bytes", {}).get("total", 0) / elapsed, 1) if elapsed else 0.0,
+            },
+            "counters": counters,
+            "latency": latency,
+        }
+
+
+def _write_atomic(path: pathlib.Path, text: str) -> None:
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    tmp.write_text(text, encoding="utf-8")
+    os.replace(tmp, path)
+
+
+# ---------- модульный API --------------------------------------------
+_current = Metrics()
+_prom_path: pathlib.Path | None = None
+_summary_path: pathlib.Path | None = None
+_writer: tuple[threading.Thread, threading.Event] | None = None
+_finished = False
+
+
+def count(name: str, n: float = 1, **labels) -> None:
+    _current.count(name, n, **labels)
+
+def add_bytes(n: int, **labels) -> None:
+    _current.count("bytes", n, **labels)
+
+def observe(stage: str, seconds: float, **labels) -> None:
+    _current.observe(stage, seconds, **labels)
+
+def failure(error: BaseException | str, **labels) -> None:
+    _current.count("failures", reason=reason(error), **labels)
+
+def skip(why: str, **labels) -> None:
+    _current.count("skipped", reason=why, **labels)
+
+
+class _Stage:
+    __slots__ = ("name", "labels", "t0")
+
+    def __init__(self, name: str, labels: dict):
+        self.name, self.labels = name, labels
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        _current.observe(self.name, time.perf_counter() - self.t0, **self.labels)
+        return False
+
+
+def stage(name: str, **labels) -> _Stage:
+    return _Stage(name, labels)
+
+
+def timed(fn, *args, **kwargs):
+    """(результат, секунды) — для задач процессного пула: время меряет воркер, в метрики пишет родитель."""
+    t0 = time.perf_counter()
+    value = fn(*args, **kwargs)
+    return value, time.perf_counter() - t0
+
+
+def current() -> Metrics:
+    return _current
+
+
+def add_cli_arguments(parser) -> None:
+    parser.add_argument("--metrics", metavar="FILE.prom", default=None,
+                        help="метрики в текстовом формате Prometheus, файл переписывается на ходу")
+    parser.add_argument("--metrics-interval", type=float, default=DEFAULT_INTERVAL, metavar="SEC",
+                        help=f"как часто переписывать --metrics (по умолчанию {DEFAULT_INTERVAL:g} с)")
+    parser.add_argument("--metrics-summary", metavar="FILE.json", default=None,
+                        help="JSON-сводка метрик в конце прогона")
+
+
+def start(job: str, prom: str | os.PathLike | None = None, summary: str | os.PathLike | None = None,
+          interval: float = DEFAULT_INTERVAL) -> None:
+    """Обнуляет метрики и, если задан prom, запускает поток, который переписывает файл."""
+    global _current, _prom_path, _summary_path, _writer, _finished
+    _current = Metrics(job)
+    _prom_path = pathlib.Path(prom) if prom else None
+    _summary_path = pathlib.Path(summary) if summary else None
+    _finished = False
+    if _prom_path is not None:
+        stop = threading.Event()
+
+        def loop():
+            while not stop.wait(max(1.0, interval)):
+                _write_atomic(_prom_path, _current.prometheus())
+
+        _write_atomic(_prom_path, _current.prometheus())
+        thread = threading.Thread(target=loop, name="metrics", daemon=True)
+        thread.start()
+        _writer = (thread, stop)
+
+
+def finish() -> dict:
+    """Последний .prom, JSON-сводка и строка в консоль; повторные вызовы ничего не пишут."""
+    global _writer, _finished
+    report = _current.summary()
+    if _finished:
+        return report
+    _finished = True
+    if _writer is not None:
+        thread, stop = _writer
+        stop.set()
+        thread.join()
+        _writer = None
+    if _prom_path is not None:
+        _write_atomic(_prom_path, _current.prometheus())
+    if _summary_path is not None:
+        _write_atomic(_summary_path, json.dumps(report, ensure_ascii=False, indent=1))
+    print_summary(report)
+    return report
+
+
+def print_summary(report: dict) -> None:
+    meta, counters = report["meta"], report["counters"]
+    total = lambda name: counters.get(name, {}).get("total", 0)
+    line = (f"📈 {total('pages'):g} стр. за {meta['elapsed_s']:.1f} с ({meta['pages_per_s']:.2f}/с), "
+            f"{total('bytes') / 1e6:.1f} МБ, повторов {total('retries'):g}, "
+            f"пропущено {total('skipped'):g}, сбоев {total('failures'):g}")
+    by = counters.get("failures", {}).get("by")
+    if by:
+        line += " (" + ", ".join(f"{k.split('reason=')[-1].split(',')[0]}: {v:g}" for k, v in by.items()) + ")"
+    print(line, file=sys.stderr)
+    for name, h in report["latency"].items():
+        print(f"   {name:24} p50 {h['p50_ms']:8.1f} мс  p90 {h['p90_ms']:8.1f} мс  "
+              f"p99 {h['p99_ms']:8.1f} мс  ×{h['count']}", file=sys.stderr)
+
+
+# ---------- объёмные сообщения в лог ----------------------------------
+_bulk_lock = threading.Lock()
+_bulk: dict[str, list] = {}          # ключ → [время последнего вывода, пропущено]
+
+
+def log_bulk(log, key: str, message: str, items=(), every: float = 30.0, head: int = 5) -> bool:
+    """
+    log(message + первые head элементов items) не чаще раза в every секунд на
+    key; остальные вызовы только считаются. Форматирование — лишь при выводе.
+    Возвращает, был ли вывод.
+    """
+    now = time.monotonic()
+    with _bulk_lock:
+        state = _bulk.setdefault(key, [float("-inf"), 0])
+        if now - state[0] < every:
+            state[1] += 1
+            return False
+        suppressed, state[0], state[1] = state[1], now, 0
+    items = list(items)
+    text = message
+    if items:
+        text += ": " + ", ".join(map(str, items[:head]))
+        if len(items) > head:
+            text += f" … +{len(items) - head}"
+    if suppressed:
+        text += f" (ещё {suppressed} таких сообщений пропущено)"
+    log(text)
+    return True
@@ -0,0 +1,326 @@
+# profiling.py
+"""
+Инструментирование по стадиям для всех парсеров.
+
+    from common import profiling
+    profiling.add_cli_arguments(parser)         # --profile [REPORT.json] --profile-dump FILE
+    profiling.start(args.profile, args.profile_dump)
+    with profiling.document(url):
+        with profiling.stage("fetch"):
+            ...
+        profiling.add_bytes(bytes_in=len(raw))
+    profiling.finish()                          # JSON-отчёт + сводка в консоль
+
+Без --profile (и без переменной окружения PARSER_PROFILE) все вызовы уходят
+в «пустой» профилировщик: одна функция и общий пустой контекст на стадию.
+
+В отчёте: время по стадиям (сумма, среднее, p95, максимум), время и байты
+по каждому документу, пиковый RSS и самые медленные документы.
+--profile-dump дополнительно пишет cProfile (.prof) или, если установлен
+pyinstrument и имя кончается на .html, его HTML-отчёт — только главный процесс.
+"""
+from __future__ import annotations
+import atexit, datetime as dt, heapq, json, os, pathlib, sys, threading, time
+
+try:
+    import resource
+except ImportError:                  # Windows
+    resource = None
+
+ENV_REPORT = "PARSER_PROFILE"         # путь к JSON-отчёту (или 1 — имя по умолчанию)
+ENV_DUMP = "PARSER_PROFILE_DUMP"
+DEFAULT_REPORT = "profile_report.json"
+SLOWEST = 20
+
+
+class _NullContext:
+    __slots__ = ()
+    def __enter__(self):
+        return self
+    def __exit__(self, *exc):
+        return False
+
+_NULL = _NullContext()
+
+
+class NullProfiler:
+    enabled = False
+    def stage(self, name: str):
+        return _NULL
+    def document(self, doc_id: str):
+        return _NULL
+    def add_bytes(self, bytes_in: int = 0, bytes_out: int = 0) -> None:
+        pass
+    def record(self, name: str, seconds: float) -> None:
+        pass
+
+
+class _Stage:
+    __slots__ = ("prof", "name", "t0")
+    def __init__(self, prof: "Profiler", name: str):
+        self.prof, self.name = prof, name
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+    def __exit__(self, *exc):
+        self.prof._add_stage(self.name, time.perf_counter() - self.t0)
+        return False
+
+
+class _Document:
+    __slots__ = ("prof", "record", "t0")
+    def __init__(self, prof: "Profiler", doc_id: str):
+        self.prof = prof
+        self.record = {"doc": str(doc_id), "total_ms": 0.0, "stages": {},
+                       "bytes_in": 0, "bytes_out": 0}
+    def __enter__(self):
+        self.prof._local.doc = self.record
+        self.t0 = time.perf_counter()
+        return self
+    def __exit__(self, exc_type, *exc):
+        self.record["total_ms"] = round((time.perf_counter() - self.t0) * 1000, 3)
+        if exc_type is not None:
+            self.record["error"] = exc_type.__name__
+        self.prof._local.doc = None
+        self.prof._add_document(self.record)
+        return False
+
+
+class Profiler:
+    enabled = True
+
+    def __init__(self, buffer: bool = False):
+        self.pid = os.getpid()
+        self.started = time.perf_counter()
+        self.stages: dict[str, list[float]] = {}
+        self.documents = 0
+        self.errors = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.slowest: list[tuple[float, int, dict]] = []     # min-heap по total_ms
+        # записи для передачи родителю копятся только в воркере процессного пула
+        self.buffer = buffer
+        self.pending: list[dict] = []
+        self._seq = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    # --- запись -------------------------------------------------------
+    def stage(self, name: str):
+        return _Stage(self, name)
+
+    def document(self, doc_id: str):
+        return _Document(self, doc_id)
+
+    def add_bytes(self, bytes_in: int = 0, bytes_out: int = 0) -> None:
+        with self._lock:
+            self.bytes_in += bytes_in
+            self.bytes_out += bytes_out
+        if (doc := getattr(self._local, "doc", None)) is not None:
+            doc["bytes_in"] += bytes_in
+            doc["bytes_out"] += bytes_out
+
+    def record(self, name: str, seconds: float) -> None:
+        """Стадия, замеренная в другом потоке (например, загрузка в пуле), — в текущий документ."""
+        self._add_stage(name, seconds)
+
+    def _add_stage(self, name: str, seconds: float) -> None:
+        with self._lock:
+            self.stages.setdefault(name, []).append(seconds)
+        if (doc := getattr(self._local, "doc", None)) is not None:
+            doc["stages"][name] = round(doc["stages"].get(name, 0.0) + seconds * 1000, 3)
+
+    def _add_document(self, record: dict) -> None:
+        with self._lock:
+            self.documents += 1
+            self.errors += "error" in record
+            self._seq += 1
+            item = (record["total_ms"], self._seq, record)
+            if len(self.slowest) < SLOWEST:
+                heapq.heappush(self.slowest, item)
+            else:
+                heapq.heappushpop(self.slowest, item)
+            if self.buffer:
+                self.pending.append(record)
+
+    # --- обмен с воркерами процессного пула ----------------------------
+    def take_pending(self) -> list[dict]:
+        with self._lock:
+            records, self.pending = self.pending, []
+        return records
+
+    def absorb(self, records: list[dict]) -> None:
+        """Документы, посчитанные в другом процессе (см. run_document)."""
+        for record in records:
+            for name, ms in record["stages"].items():
+                with self._lock:
+                    self.stages.setdefault(name, []).append(ms / 1000)
+            with self._lock:
+                self.bytes_in += record["bytes_in"]
+                self.bytes_out += record["bytes_out"]
+            self._add_document(record)
+
+    # --- отчёт ---------------------------------------------------------
+    def report(self) -> dict:
+        stages = {}
+        for name, values in sorted(self.stages.items(), key=lambda kv: -sum(kv[1])):
+            ordered = sorted(values)
+            stages[name] = {
+                "count": len(values),
+                "total_s": round(sum(values), 3),
+                "mean_ms": round(sum(values) / len(values) * 1000, 3),
+                "p95_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000, 3),
+                "max_ms": round(ordered[-1] * 1000, 3),
+            }
+        return {
+            "meta": {
+                "argv": sys.argv,
+                "finished": dt.datetime.now(dt.timezone.utc).isoformat(timespec="seconds"),
+                "elapsed_s": round(time.perf_counter() - self.started, 3),
+                "documents": self.documents,
+                "errors": self.errors,
+            },
+            "stages": stages,
+            "bytes": {"in": self.bytes_in, "out": self.bytes_out},
+            "peak_rss_mb": peak_rss_mb(),
+            "slowest": [rec for _, _, rec in sorted(self.slowest, reverse=True)],
+        }
+
+
+def peak_rss_mb() -> dict[str, float] | None:
+    if resource is None:
+        return None
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024      # ru_maxrss: байты на macOS, КБ на Linux
+    return {
+        "self": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale, 1),
+        "children": round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / scale, 1),
+    }
+
+
+# ---------- модульный API --------------------------------------------
+_current: Profiler | NullProfiler = NullProfiler()
+_report_path: pathlib.Path | None = None
+_dump = None                 # (path, профилировщик cProfile/pyinstrument)
+
+
+def enabled() -> bool:
+    return _current.enabled
+
+def stage(name: str):
+    return _current.stage(name)
+
+def document(doc_id: str):
+    return _current.document(doc_id)
+
+def add_bytes(bytes_in: int = 0, bytes_out: int = 0) -> None:
+    _current.add_bytes(bytes_in, bytes_out)
+
+def record(name: str, seconds: float) -> None:
+    _current.record(name, seconds)
+
+
+def add_cli_arguments(parser) -> None:
+    parser.add_argument("--profile", nargs="?", const=DEFAULT_REPORT, default=None, metavar="REPORT.json",
+                        help=f"замерять стадии и записать JSON-отчёт (или {ENV_REPORT}=путь)")
+    parser.add_argument("--profile-dump", default=None, metavar="FILE",
+                        help="дополнительно cProfile (.prof) или pyinstrument (.html)")
+
+
+def start(report: str | None = None, dump: str | None = None) -> bool:
+    """Включает профилирование, если задан отчёт (аргументом или через окружение)."""
+    global _current, _report_path, _dump
+    report = report or os.getenv(ENV_REPORT)
+    dump = dump or os.getenv(ENV_DUMP)
+    if not report and not dump:
+        return False
+    _report_path = pathlib.Path(DEFAULT_REPORT if report in (None, "1") else report)
+    _current = Profiler()
+    if dump:
+        _dump = (pathlib.Path(dump), _start_dump(dump))
+    atexit.register(finish)
+    return True
+
+
+def _start_dump(dump: str):
+    if dump.endswith(".html"):
+        try:
+            from pyinstrument import Profiler as PyInstrument
+            prof = PyInstrument()
+            prof.start()
+            return prof
+        except ImportError:
+            print("⚠️ pyinstrument не установлен — пишу cProfile", file=sys.stderr)
+    import cProfile
+    prof = cProfile.Profile()
+    prof.enable()
+    return prof
+
+
+def finish() -> dict | None:
+    """Пишет отчёт и печатает сводку; повторные вызовы ничего не делают."""
+    global _dump, _report_path
+    if not _current.enabled or _report_path is None:
+        return None
+    if _dump:
+        path, prof = _dump
+        _dump = None
+        if hasattr(prof, "disable"):
+            prof.disable()
+            prof.dump_stats(path)
+        else:
+            prof.stop()
+            path.write_text(prof.output_html(), encoding="utf-8")
+        print(f"🔬 профиль: {path}")
+    report = _current.report()
+    _report_path.write_text(json.dumps(report, ensure_ascii=False, indent=1), encoding="utf-8")
+    print_summary(report)
+    print(f"📊 отчёт профилирования: {_report_path}")
+    _report_path = None
+    return report
+
+
+def print_summary(report: dict, top: int = 5) -> None:
+    meta = report["meta"]
+    print(f"📊 {meta['documents']} документов за {meta['elapsed_s']:.1f} с, "
+          f"ошибок {meta['errors']}, байт in/out: {report['bytes']['in']}/{report['bytes']['out']}, "
+          f"пиковый RSS: {report['peak_rss_mb']}")
+    for name, s in list(report["stages"].items())[:top]:
+        print(f"   {name:24} {s['total_s']:8.2f} с  среднее {s['mean_ms']:8.1f} мс  p95 {s['p95_ms']:8.1f} мс")
+    for rec in report["slowest"][:top]:
+        print(f"   🐢 {rec['total_ms']:8.1f} мс  {rec['doc']}")
+
+
+# ---------- процессный пул -------------------------------------------
+def run_document(doc_id: str, fn, *args, **kwargs):
+    """
+    Выполняет fn в воркере как один документ и возвращает (результат, записи).
+    Родитель передаёт записи в absorb(). Профилировщик воркера создаётся
+    заново (после fork в нём лежала бы копия данных родителя).
+    """
+    global _current
+    if not _current.enabled or getattr(_current, "pid", None) != os.getpid():
+        _current = Profiler(buffer=True)
+    with _current.document(doc_id):
+        result = fn(*args, **kwargs)
+    return result, _current.take_pending()
+
+
+def absorb(records: list[dict]) -> None:
+    if _current.enabled:
+        _current.absorb(records)
+
+
+def submit(pool, doc_id: str, fn, *args):
+    """pool.submit(fn, *args), при включённом профилировании — через run_document."""
+    if _current.enabled:
+        return pool.submit(run_document, str(doc_id), fn, *args)
+    return pool.submit(fn, *args)
+
+
+def result(fut):
+    """fut.result() для задачи из submit(); записи воркера уходят в отчёт."""
+    if _current.enabled:
+        value, records = fut.result()
+        _current.absorb(records)
+        return value
+    return fut.result()
@@ -0,0 +1,286 @@
+# sinks.py
+"""
+Куда складывать готовые документы: по умолчанию — .md на страницу, как раньше;
+для больших корпусов — сжатые JSONL-шарды или одна SQLite-база.
+
+    sink = open_sink("jsonl", out_dir)       # "md" | "jsonl" | "sqlite"
+    if name not in sink:
+        sink.write(name, front, body, text)  # text — готовый .md (нужен только "md")
+    sink.close()
+
+Документ — имя (как у .md-файла), front-matter (dict) и тело после front-matter.
+Все приёмники пишут атомарно: .md и шарды — через временный файл и os.replace,
+SQLite — транзакциями по пачке записей. Запись буферизуется: шард уходит на диск,
+когда набралось shard_mb мегабайт несжатого JSON, SQLite — каждые batch записей,
+остаток — в flush()/close().
+"""
+from __future__ import annotations
+import gzip, itertools, json, os, pathlib, re, sqlite3, time
+import yaml
+
+
+def render_markdown(front: dict, body: str) -> str:
+    """.md из front-matter и тела — формат convert_html_to_md.py."""
+    fm = yaml.safe_dump(front, allow_unicode=True, sort_keys=False).strip()
+    return f"---\n{fm}\n---\n\n{body}"
+
+
+def _atomic_write(path: pathlib.Path, data: bytes) -> None:
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+
+
+# ---------- .md на документ (по умолчанию) ----------------------------
+class MarkdownDirSink:
+    kind = "md"
+
+    def __init__(self, out_dir: pathlib.Path):
+        self.out_dir = pathlib.Path(out_dir)
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+
+    def __contains__(self, name: str) -> bool:
+        return (self.out_dir / name).exists()
+
+    def write(self, name: str, front: dict, body: str, text: str | None = None) -> None:
+        text = render_markdown(front, body) if text is None else text
+        _atomic_write(self.out_dir / name, text.encode("utf-8"))
+
+    def delete(self, name: str) -> None:
+        (self.out_dir / name).unlink(missing_ok=True)
+
+    def __iter__(self):
+        for path in sorted(self.out_dir.glob("*.md")):
+            front, body = parse_markdown(path.read_text(encoding="utf-8"))
+            yield path.name, front, body
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+_SIMPLE_LINE = re.compile(r"^([\w-]+):\s?(.*)$")
+
+
+class _FrontLoader(yaml.SafeLoader):
+    """safe_load без дат: «date: 2024-03-05» остаётся строкой, как в файле (и пишется в JSON/SQLite)."""
+
+
+_FrontLoader.yaml_implicit_resolvers = {
+    first: [(tag, regexp) for tag, regexp in resolvers if tag != "tag:yaml.org,2002:timestamp"]
+    for first, resolvers in yaml.SafeLoader.yaml_implicit_resolvers.items()
+}
+
+
+def parse_markdown(text: str) -> tuple[dict, str]:
+    """
+    Обратная операция для экспорта: front-matter и тело.
+    Скрипты ИТС пишут значения без кавычек, такой front-matter не всегда
+    валидный YAML — тогда разбираем построчно «ключ: значение».
+    """
+    if not text.startswith("---\n"):
+        return {}, text
+    end = text.find("\n---\n", 3)
+    if end < 0:
+        return {}, text
+    raw, body = text[4:end], text[end + 5:].lstrip("\n")
+    try:
+        front = yaml.load(raw, Loader=_FrontLoader)
+        if isinstance(front, dict):
+            return front, body
+    except yaml.YAMLError:
+        pass
+    front = {}
+    for line in raw.splitlines():
+        if m := _SIMPLE_LINE.match(line):
+            front[m.group(1)] = m.group(2)
+    return front, body
+
+
+# ---------- JSONL-шарды ---------------------------------------------
+class JsonlShardSink:
+    """
+    Папка part-*.jsonl.gz: строка — {"name", "front", "body"} или
+    {"name", "deleted": true}. Шард пишется целиком и один раз, поэтому он
+    либо полный, либо отсутствует. Повторная запись того же имени добавляет
+    новую строку; при чтении побеждает последняя (export_corpus.py уплотняет).
+    """
+    kind = "jsonl"
+    PATTERN = "part-*.jsonl.gz"
+
+    def __init__(self, out_dir: pathlib.Path, shard_mb: float = 64):
+        self.out_dir = pathlib.Path(out_dir)
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        self.shard_bytes = int(shard_mb * 1024 * 1024)
+        self._buf: list[bytes] = []
+        self._buf_size = 0
+        self._prefix = f"part-{time.strftime('%Y%m%d%H%M%S')}-{os.getpid()}"
+        self._seq = itertools.count(1)
+        self._names: set[str] | None = None      # строится при первом «in»
+
+    def _shards(self) -> list[pathlib.Path]:
+        return sorted(self.out_dir.glob(self.PATTERN))
+
+    def _records(self):
+        for shard in self._shards():
+            with gzip.open(shard, "rt", encoding="utf-8") as f:
+                for line in f:
+                    yield json.loads(line)
+
+    def __contains__(self, name: str) -> bool:
+        if self._names is None:
+            self._names = set()
+            for rec in self._records():
+                (self._names.discard if rec.get("deleted") else self._names.add)(rec["name"])
+        return name in self._names
+
+    def _append(self, rec: dict) -> None:
+        line = (json.dumps(rec, ensure_ascii=False) + "\n").encode("utf-8")
+        self._buf.append(line)
+        self._buf_size += len(line)
+        if self._names is not None:
+            (self._names.discard if rec.get("deleted") else self._names.add)(rec["name"])
+        if self._buf_size >= self.shard_bytes:
+            self.flush()
+
+    def write(self, name: str, front: dict, body: str, text: str | None = None) -> None:
+        self._append({"name": name, "front": front, "body": body})
+
+    def delete(self, name: str) -> None:
+        self._append({"name": name, "deleted": True})
+
+    def __iter__(self):
+        self.flush()
+        latest: dict[str, dict] = {}
+        for rec in self._records():
+            latest.pop(rec["name"], None)            # порядок — по последней записи
+            latest[rec["name"]] = rec
+        for name, rec in latest.items():
+            if not rec.get("deleted"):
+                yield name, rec["front"], rec["body"]
+
+    def flush(self) -> None:
+        if not self._buf:
+            return
+        path = self.out_dir / f"{self._prefix}-{next(self._seq):05d}.jsonl.gz"
+        _atomic_write(path, gzip.compress(b"".join(self._buf), compresslevel=6))
+        self._buf, self._buf_size = [], 0
+
+    def close(self) -> None:
+        self.flush()
+
+
+# ---------- SQLite ---------------------------------------------------
+def _quote(column: str) -> str:
+    return '"' + column.replace('"', '""') + '"'
+
+class SqliteSink:
+    """
+    corpus.sqlite, таблица documents: name (ключ), по колонке на каждое поле
+    front-matter (добавляются по мере появления), front (JSON целиком), body.
+    """
+    kind = "sqlite"
+    FILE_NAME = "corpus.sqlite"
+    _RESERVED = {"name", "front", "body"}      # поле с таким именем есть только в front
+
+    def __init__(self, out_dir: pathlib.Path, batch: int = 500):
+        self.out_dir = pathlib.Path(out_dir)
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        self.path = self.out_dir / self.FILE_NAME
+        self.batch = batch
+        # пишут и из потоков краулера (its_pool) — по очереди, под замком вызывающего
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS documents "
+                         "(name TEXT PRIMARY KEY, front TEXT NOT NULL, body TEXT NOT NULL)")
+        # имена колонок SQLite не различают регистр
+        self._columns = {row[1].lower() for row in self._db.execute("PRAGMA table_info(documents)")}
+        self._pending: dict[str, tuple[dict, str] | None] = {}   # None — удаление
+
+    def __contains__(self, name: str) -> bool:
+        if name in self._pending:
+            return self._pending[name] is not None
+        return self._db.execute("SELECT 1 FROM documents WHERE name = ?", (name,)).fetchone() is not None
+
+    def write(self, name: str, front: dict, body: str, text: str | None = None) -> None:
+        self._pending[name] = (front, body)
+        if len(self._pending) >= self.batch:
+            self.flush()
+
+    def delete(self, name: str) -> None:
+        self._pending[name] = None
+        if len(self._pending) >= self.batch:
+            self.flush()
+
+    def __iter__(self):
+        self.flush()
+        for name, front, body in self._db.execute("SELECT name, front, body FROM documents ORDER BY rowid"):
+            yield name, json.loads(front), body
+
+    @staticmethod
+    def _column_value(value):
+        if value is None or isinstance(value, (str, int, float)):
+            return value
+        return json.dumps(value, ensure_ascii=False)
+
+    def flush(self) -> None:
+        if not self._pending:
+            return
+        with self._db:                                   # одна транзакция на пачку
+            for name, doc in self._pending.items():
+                if doc is None:
+                    self._db.execute("DELETE FROM documents WHERE name = ?", (name,))
+                    continue
+                front, body = doc
+                # URL и url — одна колонка: в ней первое из полей, в front — все
+                by_column: dict[str, str] = {}
+                for k in front:
+                    if k.lower() not in self._RESERVED:
+                        by_column.setdefault(k.lower(), k)
+                fields = list(by_column.values())
+                for key in fields:
+                    if key.lower() not in self._columns:
+                        self._db.execute(f"ALTER TABLE documents ADD COLUMN {_quote(key)}")
+                        self._columns.add(key.lower())
+                cols = ["name", "front", "body", *fields]
+                values = [name, json.dumps(front, ensure_ascii=False), body,
+                          *(self._column_value(front[k]) for k in fields)]
+                # REPLACE обнуляет колонки, которых нет у новой версии документа
+                self._db.execute(
+                    f'INSERT OR REPLACE INTO documents ({", ".join(map(_quote, cols))}) '
+                    f'VALUES ({", ".join("?" * len(cols))})', values)
+        self._pending.clear()
+
+    def close(self) -> None:
+        self.flush()
+        self._db.close()
+
+
+SINKS = {"md": MarkdownDirSink, "jsonl": JsonlShardSink, "sqlite": SqliteSink}
+
+
+def open_sink(kind: str, out_dir: pathlib.Path, shard_mb: float = 64):
+    if kind == "jsonl":
+        return JsonlShardSink(out_dir, shard_mb)
+    if kind not in SINKS:
+        raise ValueError(f"неизвестный приёмник {kind!r}: {', '.join(SINKS)}")
+    return SINKS[kind](out_dir)
+
+
+def detect_sink(path: pathlib.Path) -> str:
+    """Формат существующего корпуса по содержимому папки."""
+    path = pathlib.Path(path)
+    if (path / SqliteSink.FILE_NAME).exists():
+        return "sqlite"
+    if any(path.glob(JsonlShardSink.PATTERN)):
+        return "jsonl"
+    return "md"
+
+
+def add_cli_arguments(parser) -> None:
+    parser.add_argument("--sink", choices=sorted(SINKS), default="md",
+                        help="куда писать: .md на документ (по умолчанию), JSONL-шарды или SQLite")
+    parser.add_argument("--shard-mb", type=float, default=64,
+                        help="размер JSONL-шарда до сжатия, МБ (--sink jsonl)")
@@ -0,0 +1,94 @@
+# url_index.py
+"""
+Индекс «URL статьи → документ в корпусе» рядом с результатом (url_index.json).
+
+Имя файла зависит от заголовка, поэтому без индекса краулер узнаёт, что
+статья уже сохранена, только скачав и разобрав её. С индексом известные URL
+отсекаются до запроса, а с валидаторами (ETag / Last-Modified) изменённые
+статьи можно перепроверять условным GET — ответ 304 стоит одного заголовка.
+
+    index = UrlIndex(out_dir, sink)
+    if index.known(url): ...                    # есть в индексе и в приёмнике
+    r = session.get(url, headers=index.validators(url))
+    index.record(url, name, r)
+    sink.flush(); index.save()                  # сначала документы, потом индекс
+
+Если файла индекса ещё нет, он собирается из front-matter «url» уже
+сохранённых документов — первый же повторный прогон ничего не перекачивает.
+"""
+from __future__ import annotations
+import json, os, pathlib, time
+
+
+class UrlIndex:
+    FILE_NAME = "url_index.json"
+    VERSION = 1
+
+    def __init__(self, out_dir: pathlib.Path, sink=None, url_key=lambda u: u):
+        self.path = pathlib.Path(out_dir) / self.FILE_NAME
+        self.sink = sink
+        self.url_key = url_key                  # нормализация URL краулера
+        self._dirty = False
+        self.entries: dict[str, dict] = {}
+        if self.path.exists():
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+            if data.get("version") == self.VERSION:
+                self.entries = data.get("urls", {})
+        elif sink is not None:
+            self._bootstrap()
+
+    def _bootstrap(self) -> None:
+        for name, front, _ in self.sink:
+            url = front.get("url") if isinstance(front, dict) else None
+            if url:
+                self.entries[self.url_key(url)] = {"output": name}
+        self._dirty = bool(self.entries)
+
+    def get(self, url: str) -> dict | None:
+        return self.entries.get(self.url_key(url))
+
+    def known(self, url: str) -> str | None:
+        """Имя документа, если URL уже сохранён и документ никуда не делся."""
+        entry = self.get(url)
+        if not entry:
+            return None
+        if self.sink is not None and entry["output"] not in self.sink:
+            return None
+        return entry["output"]
+
+    def validators(self, url: str) -> dict:
+        """Заголовки условного GET для известного URL (пусто — обычный GET)."""
+        entry = self.get(url) or {}
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def record(self, url: str, output: str, response=None) -> None:
+        entry = {"output": output, "checked": time.strftime("%Y-%m-%dT%H:%M:%S")}
+        if response is not None:
+            if response.headers.get("ETag"):
+                entry["etag"] = response.headers["ETag"]
+            if response.headers.get("Last-Modified"):
+                entry["last_modified"] = response.headers["Last-Modified"]
+        self.entries[self.url_key(url)] = entry
+        self._dirty = True
+
+    def touch(self, url: str) -> None:
+        """Ответ 304: документ актуален, обновляем только время проверки."""
+        entry = self.get(url)
+        if entry is not None:
+            entry["checked"] = time.strftime("%Y-%m-%dT%H:%M:%S")
+            self._dirty = True
+
+    def save(self) -> None:
+        if not self._dirty:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        data = {"version": self.VERSION, "urls": self.entries}
+        tmp = self.path.with_name(f".{self.path.name}.{os.getpid()}.tmp")
+        tmp.write_text(json.dumps(data, ensure_ascii=False, indent=1), encoding="utf-8")
+        os.replace(tmp, self.path)
+        self._dirty = False
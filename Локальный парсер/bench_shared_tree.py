@@ -0,0 +1,66 @@
+#bench_shared_tree.py
+
+"""
+Сравнение старого конвейера (readability по строке + BeautifulSoup html.parser)
+с общим lxml-деревом из convert_html_to_md.parse_tree на файлах из «Примеры результата».
+
+usage:
+    python bench_shared_tree.py [--repeat 5] [files.html ...]
+"""
+from __future__ import annotations
+import argparse, pathlib, time
+
+from bs4 import BeautifulSoup
+from readability import Document
+
+import convert_html_to_md as conv
+
+SAMPLES_DIR = pathlib.Path(__file__).resolve().parent / "Примеры результата"
+
+
+def legacy_pipeline(raw_html: str):
+    """Три разбора страницы, как было до общего дерева."""
+    doc = Document(raw_html)
+    title = doc.short_title()
+    main_html = doc.summary()
+    soup = BeautifulSoup(raw_html, "html.parser")
+    canonical = soup.find("link", rel="canonical")
+    url = canonical["href"] if canonical and canonical.get("href") else None
+    return title, main_html, url
+
+
+def shared_tree_pipeline(raw_html: str):
+    tree = conv.parse_tree(raw_html)
+    title, main_html = conv.extract_main(tree)
+    return title, main_html, conv.canonical_url(tree)
+
+
+def best_of(fn, arg, repeat: int) -> tuple[float, object]:
+    times, result = [], None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn(arg)
+        times.append(time.perf_counter() - t0)
+    return min(times), result
+
+
+def main() -> None:
+    p = argparse.ArgumentParser()
+    p.add_argument("files", nargs="*", type=pathlib.Path)
+    p.add_argument("--repeat", type=int, default=5)
+    args = p.parse_args()
+
+    files = args.files or sorted(SAMPLES_DIR.glob("*.html"))
+    for f in files:
+        raw_html, _ = conv.read_html(f)
+        t_old, old = best_of(legacy_pipeline, raw_html, args.repeat)
+        t_new, new = best_of(shared_tree_pipeline, raw_html, args.repeat)
+        same = "✓" if old == new else "✗ РАЗЛИЧАЕТСЯ"
+        print(f"{f.name[:60]:60}  old {t_old*1000:7.1f} ms  new {t_new*1000:7.1f} ms  "
+              f"×{t_old / t_new:4.2f}  {same}")
+        if old != new:
+            print(f"   title: {old[0] == new[0]}  summary: {old[1] == new[1]}  url: {old[2]!r} → {new[2]!r}")
+
+
+if __name__ == "__main__":
+    main()
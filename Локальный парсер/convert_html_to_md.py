@@ -3,45 +3,163 @@
 """
 usage:
     python html2md.py --in page.html --out out_dir/ [--category faq]
+    python html2md.py --in-dir data/Компетенции [--glob "**/*.html"] [--workers 8]
+    python html2md.py --in-dir data/Компетенции --watch [--settle 0.3]
 """
 from __future__ import annotations
-import argparse, hashlib, re, yaml, pathlib, datetime as dt
+import argparse, codecs, copy, functools, hashlib, json, re, yaml, pathlib, datetime as dt
 import urllib.parse
-from bs4 import BeautifulSoup
+from dataclasses import dataclass, field
+import lxml.html
+from lxml.cssselect import CSSSelector
 from readability import Document  # pip install readability-lxml
+from readability.htmls import shorten_title
 import html2text
 from datetime import datetime, timezone
+from concurrent.futures import ProcessPoolExecutor, as_completed
 import sys
 import os
+import signal
+import time
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+from common import profiling      # --profile: замеры по стадиям
+from common import sinks          # --sink: .md / JSONL-шарды / SQLite
 
 """
 Как запустить конвертацию
 
 OUT_DIR="data/Компетенции/Универсальные механизмы/md"
 
-for f in "data/Компетенции/Универсальные механизмы"/*.html; do
-  python convert_html_to_md.py \
-      --in "$f" \
-      --out "$OUT_DIR" \
-      --category skills \
-      --section "Универсальные механизмы"
-done
+python convert_html_to_md.py \
+    --in-dir "data/Компетенции/Универсальные механизмы" \
+    --out "$OUT_DIR" \
+    --category skills \
+    --section "Универсальные механизмы"
 """
 
-# ---------- helpers -------------------------------------------------
-def read_html(path: pathlib.Path) -> str:
+# Версия конвертера: поднимайте при любом изменении, влияющем на .md,
+# — все записи манифеста со старой версией будут сконвертированы заново.
+CONVERTER_VERSION = "4"
+
+# ---------- encoding detection ----------------------------------------
+PRESCAN_BYTES = 4096            # где искать <meta charset> и заголовки сохранения
+
+_BOMS = (
+    (codecs.BOM_UTF8, "utf-8-sig"),
+    (codecs.BOM_UTF32_LE, "utf-32"), (codecs.BOM_UTF32_BE, "utf-32"),
+    (codecs.BOM_UTF16_LE, "utf-16"), (codecs.BOM_UTF16_BE, "utf-16"),
+)
+# <meta charset="..."> и <meta http-equiv="Content-Type" content="...; charset=...">,
+# заодно <?xml ... encoding="..."?>
+_DECLARED_RE = re.compile(
+    rb"""<meta[^>]*?charset\s*=\s*["']?\s*([-\w.:]+)"""
+    rb"""|<\?xml[^>]*?encoding\s*=\s*["']([-\w.:]+)""",
+    re.IGNORECASE)
+# заголовок, который браузер пишет в начало сохранённой страницы
+# («Saved by Blink»/MHTML): Content-Type: text/html; charset="windows-1251".
+# Комментарий <!-- saved from url=... --> кодировки не содержит.
+_SAVED_HEADER_RE = re.compile(
+    rb"""^Content-Type:\s*text/html[^\r\n]*?charset\s*=\s*["']?([-\w.:]+)""",
+    re.IGNORECASE | re.MULTILINE)
+# метки, которые браузеры трактуют иначе, чем Python (WHATWG Encoding)
+_LABEL_ALIASES = {
+    "iso-8859-1": "cp1252", "latin1": "cp1252", "us-ascii": "cp1252", "ascii": "cp1252",
+    "x-cp1251": "cp1251", "utf-16": "utf-8", "utf-16le": "utf-8", "utf-16be": "utf-8",
+}
+# частые строчные буквы русского текста — по ним выбираем однобайтовую кодировку
+_CYRILLIC_FREQUENT = set("оеаинтсрвлкмдпуяы")
+_SINGLE_BYTE_CANDIDATES = ("cp1251", "koi8_r", "cp866")
+
+
+def _normalize_label(label: bytes) -> str | None:
+    name = label.decode("ascii", "ignore").strip().lower()
+    name = _LABEL_ALIASES.get(name, name)
     try:
-        return path.read_text(encoding="utf-8")
+        return codecs.lookup(name).name
+    except LookupError:
+        return None
+
+def _guess_encoding(data: bytes) -> str:
+    """Статистика по первым 64 КБ: валидный UTF-8, иначе лучшая по частоте кириллицы."""
+    sample = data[:65536]
+    try:
+        codecs.getincrementaldecoder("utf-8")().decode(sample, final=False)
+        return "utf-8"
     except UnicodeDecodeError:
-        return path.read_text(encoding="cp1251", errors="ignore")
+        pass
+    def score(enc: str) -> int:
+        text = sample.decode(enc, errors="replace")
+        return sum(ch in _CYRILLIC_FREQUENT for ch in text)
+    return max(_SINGLE_BYTE_CANDIDATES, key=score)
+
+def _encoding_candidates(data: bytes):
+    """Кандидаты по убыванию надёжности; вычисляются лениво."""
+    for bom, enc in _BOMS:
+        if data.startswith(bom):
+            yield enc
+            break
+    head = data[:PRESCAN_BYTES]
+    if (m := _DECLARED_RE.search(head)) and (enc := _normalize_label(m.group(1) or m.group(2))):
+        yield enc
+    if (m := _SAVED_HEADER_RE.search(head)) and (enc := _normalize_label(m.group(1))):
+        yield enc
+    yield _guess_encoding(data)
+
+def decode_html(data: bytes) -> tuple[str, str]:
+    """
+    Определяет кодировку по байтам (BOM → <meta charset>/http-equiv → заголовок
+    сохранения браузера → статистика) и декодирует ровно один раз.
+    Объявленная кодировка, с которой байты не декодируются, пропускается.
+    Возвращает (текст, имя кодировки).
+    """
+    for enc in _encoding_candidates(data):
+        try:
+            text = data.decode(enc)
+            break
+        except UnicodeDecodeError:
+            continue
+    else:
+        # битые байты не выбрасываем молча, а заменяем на U+FFFD
+        enc = _guess_encoding(data)
+        text = data.decode(enc, errors="replace")
+    enc = codecs.lookup(enc).name
+    enc = {"utf-8-sig": "utf-8"}.get(enc, enc)
+    # как read_text(): универсальные переводы строк
+    return text.replace("\r\n", "\n").replace("\r", "\n"), enc
+
+
+# ---------- helpers -------------------------------------------------
+def read_html(path: pathlib.Path) -> tuple[str, str]:
+    """Текст страницы и выбранная кодировка."""
+    return decode_html(path.read_bytes())
+
+# тот же парсер, что readability строит для строкового входа, — результат совпадает
+_UTF8_PARSER = lxml.html.HTMLParser(encoding="utf-8")
+
+def parse_tree(html: str) -> lxml.html.HtmlElement:
+    """
+    Единственный разбор страницы. Дерево переиспользуют readability,
+    правила сайтов и поиск canonical/og — повторно HTML не парсится.
+    """
+    return lxml.html.document_fromstring(html.encode("utf-8", "replace"), parser=_UTF8_PARSER)
 
-def extract_main(html: str) -> tuple[str, str]:
-    doc = Document(html)
-    title = doc.short_title()
-    main_html = doc.summary()        # статья без хедеров/меню
+def extract_main(tree: lxml.html.HtmlElement, rules: list[SiteRule] = ()) -> tuple[str, str]:
+    # быстрый путь: контейнер статьи известен по правилу сайта — без скоринга readability
+    with profiling.stage("extract.rules"):
+        main_html = extract_by_rule(tree, rules)
+    if main_html is not None:
+        return shorten_title(tree), main_html
+    # readability работает с копией дерева (Cleaner делает deepcopy),
+    # из оригинала удаляются только hidden/display:none элементы
+    with profiling.stage("extract.readability"):
+        doc = Document(tree)
+        title = doc.short_title()
+        main_html = doc.summary()        # статья без хедеров/меню
     return title, main_html
 
 def to_markdown(html: str) -> str:
+    # на вход — только фрагмент статьи из readability, а не вся страница
     h = html2text.HTML2Text()
     h.body_width = 0                # не ломаем строки
     h.ignore_links = False
@@ -51,6 +169,20 @@ def to_markdown(html: str) -> str:
 def sha1(text: str) -> str:
     return hashlib.sha1(text.encode()).hexdigest()[:10]
 
+def md_filename(title: str) -> str:
+    # Формируем человекочитаемый slug из заголовка:
+    # 1. Удаляем все символы кроме букв/цифр/пробелов/‑.
+    # 2. Пробелы → «-».
+    # 3. Транслитерируем кириллицу, чтобы не было проблем на разных ОС.
+    try:
+        from unidecode import unidecode            # pip install unidecode
+        translit = unidecode(title)
+    except Exception:
+        translit = title
+
+    slug = re.sub(r"[^\w\- ]+", "", translit).strip().replace(" ", "-").lower()
+    return f"{slug}.md" if slug else f"{sha1(title)}.md"
+
 def extract_saved_url(html: str) -> str | None:
     """
     Ищет в исходном HTML комментарий браузера вида
@@ -60,124 +192,614 @@ def extract_saved_url(html: str) -> str | None:
     m = re.search(r"<!--\s*saved from url=\(\d+\)\s*(https?://[^ >]+)\s*-->", html, re.IGNORECASE)
     return m.group(1) if m else None
 
-# ---------- CLI ------------------------------------------------------
 
+def meta_property(tree, prop: str) -> str | None:
+    """content у <meta property="..."> (og:*, article:*) либо None."""
+    tag = tree.find(f'.//meta[@property="{prop}"]')
+    return tag.get("content") if tag is not None else None
+
+def canonical_url(tree) -> str | None:
+    """href у <link rel="canonical">, если он есть."""
+    for link in tree.iterfind(".//link[@rel]"):
+        if "canonical" in link.get("rel", "").split() and link.get("href"):
+            return link.get("href")
+    return None
+
+
+def page_host(page_url: str | None) -> str:
+    """Хост страницы для правил сайтов; "" — адреса нет."""
+    return (urllib.parse.urlparse(page_url).hostname or "") if page_url else ""
+
+
+# ---------- site‑specific rules --------------------------------------
+@dataclass(frozen=True)
+class SiteRule:
+    """
+    Правило домена (и его поддоменов).
+    enrich  — callables (tree, url, meta) -> None, дополняют front-matter;
+    content — CSS-селекторы контейнера статьи по приоритету: если один из них
+              найден, статья вырезается напрямую и readability не запускается;
+    drop    — служебные блоки внутри контейнера (баннеры, «поделиться» и т.п.);
+    min_text — контейнер с меньшим количеством текста считается промахом.
+    """
+    enrich: tuple = ()
+    content: tuple[str, ...] = ()
+    drop: tuple[str, ...] = ()
+    min_text: int = 200
+
+# всегда вырезаются из контейнера быстрого пути
+_ALWAYS_DROP = ("script", "style", "noscript", "iframe", "form", "button")
 
-# ---------- site‑specific enrichment rules ---------------------------
-# Each entry maps a domain suffix to one or more callables (soup, url, meta) -> None
-def _infostart_ru(soup, url, meta):
+@functools.lru_cache(maxsize=None)
+def _css(selector: str) -> CSSSelector:
+    # компилируется только для правил, которые реально сработали
+    return CSSSelector(selector)
+
+def _infostart_ru(tree, url, meta):
     # example: save article id if present
     m = re.search(r"/articles/(\\d+)", url or "")
     if m:
         meta["article_id"] = m.group(1)
 
-def _its_1c_ru(soup, url, meta):
+def _its_1c_ru(tree, url, meta):
     # put page <title> into question field if empty
     if not meta.get("question"):
-        if (tag := soup.find("title")):
-            meta["question"] = tag.text.strip()
+        if (title := tree.findtext(".//title")):
+            meta["question"] = title.strip()
 
-def _buhexpert8_ru(soup, url, meta):
+def _buhexpert8_ru(tree, url, meta):
     # extract URL from og:url if not found
-    if not url and (tag := soup.find("meta", property="og:url")):
-        meta["url"] = tag["content"]
+    if not url and (og_url := meta_property(tree, "og:url")):
+        meta["url"] = og_url
     # extract published date from article:published_time
-    if (tag := soup.find("meta", property="article:published_time")) and tag.get("content"):
-        dt_str = tag["content"]
+    if (dt_str := meta_property(tree, "article:published_time")):
         meta["date"] = dt_str.split("T")[0]
     # extract section name from article:section
-    if (tag := soup.find("meta", property="article:section")) and tag.get("content"):
-        meta["section_1c"] = tag["content"]
+    if (section := meta_property(tree, "article:section")):
+        meta["section_1c"] = section
 
-SITE_RULES: dict[str, list[callable]] = {
-    "infostart.ru": [_infostart_ru],
-    "its.1c.ru": [_its_1c_ru],
-    "buhexpert8.ru": [_buhexpert8_ru],
+# ключ — домен; правило действует и на поддомены (www.infostart.ru → infostart.ru)
+SITE_RULES: dict[str, SiteRule] = {
+    "infostart.ru": SiteRule(
+        enrich=(_infostart_ru,),
+        content=('[itemprop="articleBody"]', "div.detail-text"),
+        drop=(".padding-top-10.padding-bottom-10",),    # рекламный блок «ТОП-5 инструментов…»
+    ),
+    "its.1c.ru": SiteRule(
+        enrich=(_its_1c_ru,),
+        content=("div.doc-content", "#content"),
+    ),
+    "buhexpert8.ru": SiteRule(
+        enrich=(_buhexpert8_ru,),
+        content=("div.entry-content",),
+    ),
 }
+
+def match_site_rules(host: str) -> list[SiteRule]:
+    """
+    Правила для хоста, от самого конкретного домена к общему.
+    Поиск по суффиксам из меток хоста — несколько обращений к dict,
+    без перебора всего SITE_RULES.
+    """
+    labels = host.lower().rstrip(".").split(".")
+    return [SITE_RULES[domain] for i in range(len(labels) - 1)
+            if (domain := ".".join(labels[i:])) in SITE_RULES]
+
+def extract_by_rule(tree, rules: list[SiteRule]) -> str | None:
+    """HTML статьи по селекторам правил либо None, если ни один не сработал."""
+    for rule in rules:
+        for selector in rule.content:
+            found = _css(selector)(tree)
+            if not found:
+                continue
+            node = copy.deepcopy(found[0])        # общее дерево не трогаем
+            for junk in (*_ALWAYS_DROP, *rule.drop):
+                for el in _css(junk)(node):
+                    el.drop_tree()
+            if len(node.text_content().strip()) < rule.min_text:
+                continue
+            return lxml.html.tostring(node, encoding="unicode", method="html")
+    return None
 # ---------------------------------------------------------------------
 
-p = argparse.ArgumentParser()
-p.add_argument("--in", dest="src", required=True)
-p.add_argument("--out", dest="out_dir", required=False)
-p.add_argument("--category", default="misc")
-p.add_argument("--section", default="")
-args = p.parse_args()
+
+# ---------- manifest -------------------------------------------------
+def file_digest(path: pathlib.Path) -> str:
+    return hashlib.sha256(path.read_bytes()).hexdigest()
+
+
+class Manifest:
+    """
+    Манифест папки результата: исходник → sha256 + версия конвертера + имя .md.
+
+    Проверяется до чтения и разбора HTML: неизменённый файл стоит один stat,
+    а если mtime сменился (копирование/синхронизация) — ещё один хеш.
+    Ключ — путь исходника относительно папки результата, поэтому дерево
+    data/ можно переносить между машинами целиком.
+    """
+    FILE_NAME = ".convert_manifest.json"
+
+    def __init__(self, out_dir: pathlib.Path, sink=None):
+        self.out_dir = out_dir
+        self.sink = sink                        # не .md — наличие результата спрашиваем у приёмника
+        self.path = out_dir / self.FILE_NAME
+        self.dirty = False
+        try:
+            self.entries: dict[str, dict] = json.loads(self.path.read_text(encoding="utf-8"))
+        except (FileNotFoundError, ValueError):
+            self.entries = {}
+
+    def key(self, src_path: pathlib.Path) -> str:
+        try:
+            rel = os.path.relpath(src_path.resolve(), self.out_dir.resolve())
+        except ValueError:                      # другой диск (Windows)
+            rel = str(src_path.resolve())
+        return pathlib.Path(rel).as_posix()
+
+    def is_fresh(self, src_path: pathlib.Path) -> bool:
+        entry = self.entries.get(self.key(src_path))
+        if not entry or entry.get("version") != CONVERTER_VERSION:
+            return False
+        if self.sink is not None:
+            if entry["output"] not in self.sink:
+                return False
+        elif not (self.out_dir / entry["output"]).exists():
+            return False
+        st = src_path.stat()
+        if st.st_size != entry.get("size"):
+            return False
+        if st.st_mtime_ns == entry.get("mtime_ns"):
+            return True
+        if file_digest(src_path) != entry.get("sha256"):
+            return False
+        entry["mtime_ns"] = st.st_mtime_ns       # содержимое то же, обновляем mtime
+        self.dirty = True
+        return True
+
+    def record(self, src_path: pathlib.Path, out_path: pathlib.Path, source: dict) -> None:
+        """source — {"sha256", "size", "mtime_ns"} исходника, как его прочитал convert_file."""
+        self.entries[self.key(src_path)] = {
+            **source,
+            "version": CONVERTER_VERSION,
+            "output": out_path.name,
+        }
+        self.dirty = True
+
+    def forget(self, src_path: pathlib.Path) -> dict | None:
+        """Убирает запись об исходнике; возвращает её (для удаления .md)."""
+        entry = self.entries.pop(self.key(src_path), None)
+        if entry:
+            self.dirty = True
+        return entry
+
+    def save(self) -> None:
+        if not self.dirty:
+            return
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        tmp.write_text(json.dumps(self.entries, ensure_ascii=False, indent=1), encoding="utf-8")
+        os.replace(tmp, self.path)              # атомарно: манифест не бывает «полузаписан»
+        self.dirty = False
+
 
 DEPARTMENT = os.getenv("DEPARTMENT")
 
-base_dir = pathlib.Path("data")
+BASE_DIR = pathlib.Path("data")
 if DEPARTMENT:
-    base_dir = base_dir / DEPARTMENT
+    BASE_DIR = BASE_DIR / DEPARTMENT
+
 
-if args.out_dir:
-    out_dir = pathlib.Path(args.out_dir)
-else:
-    src_path = pathlib.Path(args.src).resolve()
+def resolve_out_dir(src_path: pathlib.Path, out_dir: str | None) -> pathlib.Path:
+    """Папка для .md: явный --out либо <base_dir>/<родитель исходника>/md."""
+    if out_dir:
+        return pathlib.Path(out_dir)
+    src_path = src_path.resolve()
     try:
-        parent_relative = src_path.parent.relative_to(base_dir)
+        parent_relative = src_path.parent.relative_to(BASE_DIR)
     except ValueError:
         parent_relative = src_path.parent.name
-    out_dir = base_dir / parent_relative / "md"
-
-out_dir.mkdir(parents=True, exist_ok=True)
-print(f"Сохраняем результат в {out_dir}")
-
-src_path   = pathlib.Path(args.src)
-
-raw_html   = read_html(src_path)
-saved_url  = extract_saved_url(raw_html)
-title, main_html = extract_main(raw_html)
-soup = BeautifulSoup(raw_html, "html.parser")
-md_body    = to_markdown(main_html)
-
-
-# Формируем человекочитаемый slug из заголовка:
-# 1. Удаляем все символы кроме букв/цифр/пробелов/‑.
-# 2. Пробелы → «-».
-# 3. Транслитерируем кириллицу, чтобы не было проблем на разных ОС.
-try:
-    from unidecode import unidecode            # pip install unidecode
-    translit = unidecode(title)
-except Exception:
-    translit = title
-
-slug = re.sub(r"[^\w\- ]+", "", translit).strip().replace(" ", "-").lower()
-fname = f"{slug}.md" if slug else f"{sha1(title)}.md"
-
-# ----- prepare front‑matter ------------------------------------------
-imported_ts = dt.datetime.utcnow().replace(tzinfo=timezone.utc).isoformat(timespec="seconds")
-front = {
-    "category"    : args.category,
-    "section_1c"  : args.section,
-    "source_file" : src_path.name,
-    "url"         : saved_url,
-    "question"    : title,
-    "imported"    : imported_ts,
-    "date"        : imported_ts[:10],   # YYYY‑MM‑DD
-}
+    return BASE_DIR / parent_relative / "md"
+
+
+@dataclass
+class Converted:
+    """Результат convert_html: front-matter, заголовок и тело без записи на диск."""
+    title: str
+    front: dict
+    body: str                 # Markdown статьи, без front-matter и заголовка
+    filename: str             # имя .md по заголовку
+
+    @property
+    def content(self) -> str:
+        """Всё после front-matter: заголовок и тело."""
+        return f"# {self.title}\n\n{self.body}"
+
+    def text(self) -> str:
+        """Полный текст .md — ровно то, что пишет convert_file."""
+        return sinks.render_markdown(self.front, self.content)
+
+
+def convert_html(data: bytes | str, source_file: str = "", category: str = "misc",
+                 section: str = "", url: str | None = None) -> Converted:
+    """
+    Конвертация страницы в памяти: байты (кодировка определяется как у файлов)
+    или уже декодированный текст. url — адрес страницы, если он известен
+    вызывающему, а в HTML нет комментария «saved from url».
+    """
+    if isinstance(data, str):
+        raw_html, encoding = data.replace("\r\n", "\n").replace("\r", "\n"), "utf-8"
+    else:
+        with profiling.stage("decode"):
+            raw_html, encoding = decode_html(data)
+    with profiling.stage("parse"):
+        saved_url  = extract_saved_url(raw_html) or url
+        tree       = parse_tree(raw_html)
+    page_url   = saved_url or canonical_url(tree)
+    host       = page_host(page_url)
+    rules      = match_site_rules(host) if host else []
+    title, main_html = extract_main(tree, rules)
+    with profiling.stage("markdown"):
+        md_body = to_markdown(main_html)
+
+    # ----- prepare front‑matter ------------------------------------------
+    imported_ts = dt.datetime.utcnow().replace(tzinfo=timezone.utc).isoformat(timespec="seconds")
+    front = {
+        "category"    : category,
+        "section_1c"  : section,
+        "source_file" : source_file,
+        "encoding"    : encoding,
+        "url"         : saved_url,
+        "question"    : title,
+        "imported"    : imported_ts,
+        "date"        : imported_ts[:10],   # YYYY‑MM‑DD
+    }
+
+    # apply site‑specific rules if any (общие домены раньше, конкретные — последними)
+    for rule in reversed(rules):
+        for fn in rule.enrich:
+            try:
+                fn(tree, saved_url, front)
+            except Exception:
+                pass
+
+    # Fallback: use <link rel="canonical"> if URL still unset
+    if not front.get("url"):
+        front["url"] = canonical_url(tree)
+
+    return Converted(title, front, md_body, md_filename(title))
+
+
+def convert_source(src_path: pathlib.Path, category: str = "misc",
+                   section: str = "") -> tuple[Converted, dict]:
+    """
+    Читает и конвертирует HTML-файл, ничего не записывая (так работают воркеры пула).
+    Возвращает результат и состояние исходника для Manifest.record().
+    """
+    st         = src_path.stat()               # до чтения: правка во время конвертации не потеряется
+    with profiling.stage("read"):
+        data   = src_path.read_bytes()
+    profiling.add_bytes(bytes_in=len(data))
+    conv       = convert_html(data, src_path.name, category, section)
+    source = {"sha256": hashlib.sha256(data).hexdigest(),
+              "size": st.st_size, "mtime_ns": st.st_mtime_ns}
+    return conv, source
+
+
+def save_converted(sink, out_dir: pathlib.Path, conv: Converted) -> pathlib.Path:
+    """Отдаёт документ приёмнику (по умолчанию — .md в out_dir)."""
+    text = conv.text()
+    with profiling.stage("write"):
+        sink.write(conv.filename, conv.front, conv.content, text)
+    if profiling.enabled():
+        profiling.add_bytes(bytes_out=len(text.encode("utf-8")))
+    out_path = out_dir / conv.filename
+    print("✓ saved", out_path if sink.kind == "md" else f"{out_path.name} → {sink.kind}:{out_dir}")
+    return out_path
+
+
+def convert_file(src_path: pathlib.Path, out_dir: pathlib.Path,
+                 category: str = "misc", section: str = "", sink=None) -> tuple[pathlib.Path, dict]:
+    """
+    Конвертирует один HTML-файл в Markdown с YAML front-matter.
+    Возвращает путь к .md и состояние исходника для Manifest.record().
+    """
+    sink = sink or sinks.MarkdownDirSink(out_dir)
+    conv, source = convert_source(src_path, category, section)
+    return save_converted(sink, out_dir, conv), source
+
+
+# ---------- batch mode -----------------------------------------------
+def iter_sources(in_dir: pathlib.Path, pattern: str) -> list[pathlib.Path]:
+    """Рекурсивно собирает HTML-файлы в in_dir (pattern — glob, например "**/*.html")."""
+    return sorted(p for p in in_dir.glob(pattern) if p.is_file())
+
+
+class Targets:
+    """Папки результата: манифест и приёмник на каждую, пишет только главный процесс."""
+
+    def __init__(self, sink_kind: str = "md", shard_mb: float = 64):
+        self.sink_kind = sink_kind
+        self.shard_mb = shard_mb
+        self.manifests: dict[pathlib.Path, Manifest] = {}
+        self.sinks: dict[pathlib.Path, object] = {}
+
+    def manifest(self, dst: pathlib.Path) -> Manifest:
+        if dst not in self.manifests:
+            sink = self.sink(dst) if self.sink_kind != "md" else None
+            self.manifests[dst] = Manifest(dst, sink)
+        return self.manifests[dst]
+
+    def sink(self, dst: pathlib.Path):
+        if dst not in self.sinks:
+            self.sinks[dst] = sinks.open_sink(self.sink_kind, dst, self.shard_mb)
+        return self.sinks[dst]
+
+    def save(self, dst: pathlib.Path, src: pathlib.Path, conv: Converted, source: dict) -> pathlib.Path:
+        out_path = save_converted(self.sink(dst), dst, conv)
+        self.manifest(dst).record(src, out_path, source)
+        return out_path
+
+    def flush(self) -> None:
+        # сначала данные, потом манифест: манифест не ссылается на то, чего нет на диске
+        for sink in self.sinks.values():
+            sink.flush()
+        for m in self.manifests.values():
+            m.save()
+
+    def close(self) -> None:
+        self.flush()
+        for sink in self.sinks.values():
+            sink.close()
+
+
+def convert_many(sources: list[pathlib.Path], out_dir: str | None,
+                 category: str, section: str, workers: int,
+                 force: bool = False, sink_kind: str = "md",
+                 shard_mb: float = 64) -> dict[str, int]:
+    """
+    Раскидывает файлы по пулу процессов: импорты и инициализация парсеров
+    оплачиваются один раз на воркер, а не на каждый файл.
+    Актуальность проверяется по манифестам в главном процессе ещё до отправки
+    в пул; воркеры только конвертируют, приёмники и манифесты пишет главный процесс.
+    Печатает итоговую сводку и возвращает счётчики по статусам.
+    """
+    stats = {"saved": 0, "skipped": 0, "failed": 0}
+    started = time.perf_counter()
+    targets = Targets(sink_kind, shard_mb)
+
+    jobs: list[tuple[pathlib.Path, pathlib.Path]] = []
+    for src in sources:
+        dst = resolve_out_dir(src, out_dir)
+        if not force and targets.manifest(dst).is_fresh(src):
+            stats["skipped"] += 1
+            continue
+        jobs.append((src, dst))
+    if stats["skipped"]:
+        print(f"↩️ актуальны по манифесту, пропускаем: {stats['skipped']}")
+
+    def _account(src, dst, fut_or_fn):
+        try:
+            conv, source = fut_or_fn()
+            targets.save(dst, src, conv, source)
+            stats["saved"] += 1
+        except Exception as e:
+            stats["failed"] += 1
+            print(f"❌ {src}: {e}", file=sys.stderr)
+
+    try:
+        if workers <= 1 or len(jobs) <= 1:
+            for src, dst in jobs:
+                with profiling.document(src):
+                    _account(src, dst, lambda: convert_source(src, category, section))
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                futures = {
+                    profiling.submit(pool, src, convert_source, src, category, section): (src, dst)
+                    for src, dst in jobs
+                }
+                for fut in as_completed(futures):
+                    _account(*futures[fut], functools.partial(profiling.result, fut))
+    finally:
+        # сохраняем и при Ctrl-C: уже готовые файлы не будут пересобираться
+        targets.close()
+
+    elapsed = time.perf_counter() - started
+    total = len(sources)
+    rate = total / elapsed if elapsed > 0 else 0.0
+    print(f"🏁 Обработано {total} файлов за {elapsed:.1f} с ({rate:.1f} файлов/с): "
+          f"сохранено {stats['saved']}, пропущено {stats['skipped']}, ошибок {stats['failed']}")
+    return stats
+
+
+# ---------- watch mode -----------------------------------------------
+_WARMUP_HTML = ("<html><head><title>Прогрев воркера</title></head><body>"
+                "<article><p>Прогрев воркера: readability, html2text и unidecode "
+                "загружают свои таблицы один раз, до первого настоящего файла.</p></article>"
+                "</body></html>")
+
+def _init_watch_worker() -> None:
+    """
+    Инициализатор воркера для --watch: Ctrl-C ловит только главный процесс
+    (он и дожидается задач), а разовые затраты платятся при старте пула.
+    """
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    try:
+        from unidecode import unidecode
+        unidecode("прогрев")
+        _, main_html = extract_main(parse_tree(_WARMUP_HTML))
+        to_markdown(main_html)
+    except Exception:
+        pass
+
+
+def watch(in_dir: pathlib.Path, pattern: str, out_dir: str | None,
+          category: str, section: str, workers: int,
+          settle: float = 0.3, poll_interval: float = 0.5,
+          force_polling: bool = False, sink_kind: str = "md",
+          shard_mb: float = 64) -> dict[str, int]:
+    """
+    Демон: следит за in_dir и конвертирует новые/изменённые файлы тёплым пулом,
+    при удалении исходника удаляет его .md. SIGINT/SIGTERM — мягкая остановка:
+    новые события больше не принимаются, задачи в работе дожидаются.
+    Буфер приёмника и манифесты сбрасываются, когда пул простаивает.
+    """
+    from watcher import Debouncer, open_watcher
+
+    name_pattern = pattern.rsplit("/", 1)[-1]
+    targets = Targets(sink_kind, shard_mb)
+    stats = {"saved": 0, "deleted": 0, "failed": 0}
+    stopping = False
+
+    def request_stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+
+    old_handlers = {sig: signal.signal(sig, request_stop) for sig in (signal.SIGINT, signal.SIGTERM)}
+    watcher = open_watcher(in_dir, name_pattern, poll_interval, force_polling)
+    debouncer = Debouncer(settle)
+    pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_watch_worker)
+    in_flight: dict = {}                 # future → (src, dst, first_seen)
+    busy: set[pathlib.Path] = set()
+
+    def submit(src: pathlib.Path, first_seen: float) -> None:
+        if src in busy:                  # изменился во время конвертации — повторим позже
+            debouncer.touch(src, time.monotonic())
+            return
+        dst = resolve_out_dir(src, out_dir)
+        if targets.manifest(dst).is_fresh(src):
+            return
+        fut = profiling.submit(pool, src, convert_source, src, category, section)
+        in_flight[fut] = (src, dst, first_seen)
+        busy.add(src)
+
+    def reap(block: bool = False) -> None:
+        for fut in [f for f in in_flight if block or f.done()]:
+            src, dst, first_seen = in_flight.pop(fut)
+            busy.discard(src)
+            try:
+                targets.save(dst, src, *profiling.result(fut))
+            except Exception as e:
+                stats["failed"] += 1
+                print(f"❌ {src}: {e}", file=sys.stderr)
+                continue
+            stats["saved"] += 1
+            print(f"   ⏱ {time.monotonic() - first_seen:.2f} с от события до .md")
+
+    def remove_output(src: pathlib.Path) -> None:
+        dst = resolve_out_dir(src, out_dir)
+        manifest = targets.manifest(dst)
+        entry = manifest.forget(src)
+        if not entry:
+            return
+        # тот же .md мог получиться и из другого исходника с тем же заголовком
+        if not any(e.get("output") == entry["output"] for e in manifest.entries.values()):
+            targets.sink(dst).delete(entry["output"])
+            stats["deleted"] += 1
+            print(f"🗑 удалён {dst / entry['output']}")
+        targets.flush()
+
+    try:
+        started = time.monotonic()
+        for src in iter_sources(in_dir, pattern):      # догоняем то, что изменилось без нас
+            submit(src, started)
+        print(f"👀 Слежу за {in_dir} ({type(watcher).__name__}, воркеров: {workers}); "
+              f"в очереди при старте: {len(in_flight)}. Ctrl-C — остановка")
+        while not stopping:
+            now = time.monotonic()
+            timeout = debouncer.timeout(now)
+            idle = 0.05 if in_flight else 1.0          # 1 с — верхняя граница реакции на сигнал
+            timeout = idle if timeout is None else min(timeout, idle)
+            for kind, path in watcher.read(timeout):
+                if kind == "deleted":
+                    debouncer.discard(path)
+                    remove_output(path)
+                else:
+                    debouncer.touch(path, time.monotonic())
+            for src, first_seen in debouncer.due(time.monotonic()):
+                submit(src, first_seen)
+            reap()
+            if not in_flight:
+                targets.flush()
+    finally:
+        print(f"⏹ Останавливаемся: дожидаемся задач в работе ({len(in_flight)})…")
+        reap(block=True)
+        pool.shutdown(wait=True)
+        watcher.close()
+        targets.close()
+        for sig, handler in old_handlers.items():
+            signal.signal(sig, handler)
+        if len(debouncer):
+            print(f"   не дождались стабилизации: {len(debouncer)} файлов — подхватятся при следующем запуске")
+        print(f"🏁 Сохранено {stats['saved']}, удалено {stats['deleted']}, ошибок {stats['failed']}")
+    return stats
+
+
+# ---------- CLI ------------------------------------------------------
+def main(argv: list[str] | None = None) -> int:
+    p = argparse.ArgumentParser()
+    src_group = p.add_mutually_exclusive_group()
+    src_group.add_argument("--in", dest="src")
+    src_group.add_argument("--in-dir", dest="in_dir",
+                           help="папка с HTML (по умолчанию data/<DEPARTMENT>), обходится рекурсивно")
+    p.add_argument("--glob", dest="pattern", default="**/*.html",
+                   help='шаблон файлов внутри --in-dir (по умолчанию "**/*.html")')
+    p.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                   help="число процессов для пакетного режима")
+    p.add_argument("--out", dest="out_dir", required=False)
+    p.add_argument("--category", default="misc")
+    p.add_argument("--section", default="")
+    p.add_argument("--force", action="store_true",
+                   help="конвертировать заново, не глядя в манифест")
+    p.add_argument("--watch", action="store_true",
+                   help="режим демона: следить за --in-dir и конвертировать изменения")
+    p.add_argument("--settle", type=float, default=0.3,
+                   help="сколько секунд файл должен не меняться перед конвертацией (--watch)")
+    p.add_argument("--poll-interval", type=float, default=0.5,
+                   help="период опроса, если inotify недоступен (--watch)")
+    p.add_argument("--polling", action="store_true",
+                   help="не использовать inotify, только опрос (--watch)")
+    sinks.add_cli_arguments(p)
+    profiling.add_cli_arguments(p)
+    args = p.parse_args(argv)
+    if args.watch and args.src:
+        p.error("--watch следит за папкой: используйте --in-dir")
+    profiling.start(args.profile, args.profile_dump)
+    try:
+        return _run(args)
+    finally:
+        profiling.finish()
+
+
+def _run(args: argparse.Namespace) -> int:
+    if args.src:
+        src_path = pathlib.Path(args.src)
+        out_dir = resolve_out_dir(src_path, args.out_dir)
+        print(f"Сохраняем результат в {out_dir}")
+        targets = Targets(args.sink, args.shard_mb)
+        try:
+            if not args.force and targets.manifest(out_dir).is_fresh(src_path):
+                print(f"↩️ {src_path.name} актуален, пропускаем")
+                return 0
+            with profiling.document(src_path):
+                targets.save(out_dir, src_path, *convert_source(src_path, args.category, args.section))
+        finally:
+            targets.close()
+        return 0
+
+    in_dir = pathlib.Path(args.in_dir) if args.in_dir else BASE_DIR
+    if args.watch:
+        watch(in_dir, args.pattern, args.out_dir, args.category, args.section,
+              max(1, args.workers), settle=args.settle,
+              poll_interval=args.poll_interval, force_polling=args.polling,
+              sink_kind=args.sink, shard_mb=args.shard_mb)
+        return 0
+    sources = iter_sources(in_dir, args.pattern)
+    print(f"📂 {in_dir}: найдено {len(sources)} файлов, воркеров: {args.workers}")
+    stats = convert_many(sources, args.out_dir, args.category, args.section,
+                         args.workers, force=args.force,
+                         sink_kind=args.sink, shard_mb=args.shard_mb)
+    return 1 if stats["failed"] else 0
+
 
-# apply site‑specific rules if any
-if saved_url:
-    host = urllib.parse.urlparse(saved_url).hostname or ""
-    for domain, funcs in SITE_RULES.items():
-        if host.endswith(domain):
-            for fn in funcs:
-                try:
-                    fn(soup, saved_url, front)
-                except Exception:
-                    pass
-
-# Fallback: use <link rel="canonical"> if URL still unset
-if not front.get("url"):
-    if (canonical_tag := soup.find("link", rel="canonical")) and canonical_tag.get("href"):
-        front["url"] = canonical_tag["href"]
-
-fm = yaml.safe_dump(front, allow_unicode=True, sort_keys=False).strip()
-
-out_path = out_dir / fname
-# ↪️ Skip conversion if output .md exists and is up‑to‑date
-if out_path.exists() and out_path.stat().st_mtime >= src_path.stat().st_mtime:
-    print(f"↩️ {out_path.name} актуален, пропускаем")
-    sys.exit(0)
-out_path.write_text(f"---\n{fm}\n---\n\n# {title}\n\n{md_body}", encoding="utf-8")
-print("✓ saved", out_path)
\ No newline at end of file
+if __name__ == "__main__":
+    sys.exit(main())
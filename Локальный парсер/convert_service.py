@@ -0,0 +1,324 @@
+#convert_service.py
+
+"""
+Постоянно работающий конвертер: тот же convert_html, но без запуска Python
+и импорта readability/lxml на каждую страницу.
+
+usage:
+    # JSON-lines: запрос на строку в stdin, ответ на строку в stdout
+    python convert_service.py --stdio [--workers 4]
+    # локальный HTTP
+    python convert_service.py --http 127.0.0.1:8765 [--workers 4]
+
+Запрос:  {"id": 1, "html": "<html>…</html>"}  или  {"id": 1, "path": "page.html"}
+         необязательно: "category", "section", "url", "source_file"
+Ответ:   {"id": 1, "ok": true, "filename": "….md", "title": "…",
+          "front_matter": {...}, "markdown": "---\\n…\\n---\\n\\n# …"}
+         при ошибке: {"id": 1, "ok": false, "error": "…"}
+
+В режиме --stdio ответы идут по мере готовности (сопоставляйте по id).
+HTTP:
+    POST /convert   JSON-объект → объект, JSON-массив → массив в том же порядке;
+                    тело text/html — сырые байты страницы (кодировка определяется
+                    как у файлов), параметры category/section/url/source_file — в query
+    GET  /health    {"status": "ok", ...}
+    GET  /metrics   счётчики и задержки
+"""
+from __future__ import annotations
+import argparse, collections, json, os, pathlib, queue, signal, sys, threading, time
+import urllib.parse
+from concurrent.futures import Future, ProcessPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import convert_html_to_md as conv
+
+
+# ---------- worker side ----------------------------------------------
+def convert_request(item: dict, defaults: dict) -> dict:
+    """Один запрос → ответ; исключения превращаются в {"ok": false}."""
+    try:
+        if item.get("path"):
+            src = pathlib.Path(item["path"])
+            data, name = src.read_bytes(), src.name
+        elif item.get("html") is not None:
+            data, name = item["html"], ""
+        else:
+            raise ValueError('нужно поле "html" или "path"')
+        result = conv.convert_html(
+            data,
+            source_file=item.get("source_file") or name,
+            category=item.get("category") or defaults["category"],
+            section=item.get("section") or defaults["section"],
+            url=item.get("url"),
+        )
+        return {"id": item.get("id"), "ok": True, "filename": result.filename,
+                "title": result.title, "front_matter": result.front,
+                "markdown": result.text()}
+    except Exception as e:
+        return {"id": item.get("id"), "ok": False, "error": f"{type(e).__name__}: {e}"}
+
+
+def convert_batch(items: list[dict], defaults: dict) -> list[dict]:
+    # одна задача пула на пачку: pickling и пересылка оплачиваются раз на пачку
+    return [convert_request(item, defaults) for item in items]
+
+
+# ---------- batching -------------------------------------------------
+class Batcher:
+    """
+    Собирает запросы в пачки (до batch_size штук или batch_wait секунд
+    с первого запроса) и отдаёт их пулу. В работе не больше max_batches
+    пачек — остальное ждёт в очереди, а не копится в пуле.
+    """
+
+    def __init__(self, pool: ProcessPoolExecutor, defaults: dict, metrics: "Metrics",
+                 batch_size: int = 16, batch_wait: float = 0.005, max_batches: int = 8):
+        self.pool = pool
+        self.defaults = defaults
+        self.metrics = metrics
+        self.batch_size = max(1, batch_size)
+        self.batch_wait = batch_wait
+        self._slots = threading.BoundedSemaphore(max(1, max_batches))
+        self._q: queue.Queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, item: dict) -> Future:
+        fut: Future = Future()
+        self.metrics.received()
+        self._q.put((item, fut, time.perf_counter()))
+        return fut
+
+    def _run(self) -> None:
+        stop = False
+        while not stop:
+            first = self._q.get()
+            if first is None:
+                break
+            batch = [first]
+            deadline = time.monotonic() + self.batch_wait
+            while len(batch) < self.batch_size:
+                wait = deadline - time.monotonic()
+                try:
+                    nxt = self._q.get(timeout=wait) if wait > 0 else self._q.get_nowait()
+                except queue.Empty:
+                    break
+                if nxt is None:
+                    stop = True
+                    break
+                batch.append(nxt)
+            self._slots.acquire()
+            try:
+                fut = self.pool.submit(convert_batch, [item for item, _, _ in batch], self.defaults)
+            except Exception as e:               # пул уже закрыт
+                self._slots.release()
+                self._resolve(batch, None, e)
+                continue
+            self.metrics.batch()
+            fut.add_done_callback(lambda f, b=batch: self._done(b, f))
+
+    def _done(self, batch, fut: Future) -> None:
+        self._slots.release()
+        try:
+            self._resolve(batch, fut.result(), None)
+        except Exception as e:                   # упал сам воркер
+            self._resolve(batch, None, e)
+
+    def _resolve(self, batch, results, error) -> None:
+        if results is None:
+            results = [{"id": item.get("id"), "ok": False, "error": f"{type(error).__name__}: {error}"}
+                       for item, _, _ in batch]
+        now = time.perf_counter()
+        for (_, fut, t0), res in zip(batch, results):
+            self.metrics.done(res["ok"], now - t0)
+            fut.set_result(res)
+
+    def close(self) -> None:
+        """Дожидается, пока всё принятое будет отправлено в пул."""
+        self._q.put(None)
+        self._thread.join()
+
+
+# ---------- metrics --------------------------------------------------
+class Metrics:
+    """Счётчики для /metrics; задержки — по последним 1000 документам."""
+
+    def __init__(self, workers: int):
+        self.started = time.time()
+        self.workers = workers
+        self._lock = threading.Lock()
+        self.requests = self.documents = self.errors = self.batches = 0
+        self.in_flight = 0
+        self._latencies: collections.deque[float] = collections.deque(maxlen=1000)
+
+    def received(self) -> None:
+        with self._lock:
+            self.requests += 1
+            self.in_flight += 1
+
+    def batch(self) -> None:
+        with self._lock:
+            self.batches += 1
+
+    def done(self, ok: bool, seconds: float) -> None:
+        with self._lock:
+            self.in_flight -= 1
+            self.documents += ok
+            self.errors += not ok
+            self._latencies.append(seconds)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            lat = sorted(self._latencies)
+            pct = lambda q: round(lat[min(len(lat) - 1, int(len(lat) * q))] * 1000, 2) if lat else None
+            uptime = time.time() - self.started
+            return {
+                "uptime_s": round(uptime, 1),
+                "workers": self.workers,
+                "requests": self.requests,
+                "documents": self.documents,
+                "errors": self.errors,
+                "in_flight": self.in_flight,
+                "batches": self.batches,
+                "avg_batch": round((self.documents + self.errors) / self.batches, 2) if self.batches else None,
+                "docs_per_s": round(self.documents / uptime, 2) if uptime > 0 else None,
+                "latency_ms": {"p50": pct(0.50), "p95": pct(0.95), "max": pct(1.0)},
+                "converter_version": conv.CONVERTER_VERSION,
+            }
+
+
+# ---------- stdio ----------------------------------------------------
+def serve_stdio(batcher: Batcher, stdin=sys.stdin, stdout=sys.stdout) -> None:
+    out_lock = threading.Lock()
+    pending: set[Future] = set()
+
+    def emit(res: dict) -> None:
+        line = json.dumps(res, ensure_ascii=False)
+        with out_lock:
+            stdout.write(line + "\n")
+            stdout.flush()
+
+    for line in stdin:
+        if not line.strip():
+            continue
+        try:
+            item = json.loads(line)
+            if not isinstance(item, dict):
+                raise ValueError("ожидается JSON-объект")
+        except ValueError as e:
+            emit({"id": None, "ok": False, "error": f"bad request: {e}"})
+            continue
+        fut = batcher.submit(item)
+        pending.add(fut)
+        fut.add_done_callback(lambda f: (pending.discard(f), emit(f.result())))
+    for fut in list(pending):                    # stdin закрыт — отдаём хвост
+        fut.result()
+
+
+# ---------- HTTP -----------------------------------------------------
+class _Handler(BaseHTTPRequestHandler):
+    server_version = "convert-service/" + conv.CONVERTER_VERSION
+    batcher: Batcher
+    metrics: Metrics
+
+    def _send(self, status: int, payload) -> None:
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        path = urllib.parse.urlsplit(self.path).path
+        if path == "/health":
+            self._send(200, {"status": "ok", "workers": self.metrics.workers,
+                             "in_flight": self.metrics.in_flight})
+        elif path == "/metrics":
+            self._send(200, self.metrics.snapshot())
+        else:
+            self._send(404, {"error": "not found"})
+
+    def do_POST(self):
+        url = urllib.parse.urlsplit(self.path)
+        if url.path != "/convert":
+            self._send(404, {"error": "not found"})
+            return
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        ctype = (self.headers.get("Content-Type") or "").split(";")[0].strip().lower()
+        if ctype == "application/json":
+            try:
+                payload = json.loads(body)
+            except ValueError as e:
+                self._send(400, {"error": f"bad JSON: {e}"})
+                return
+        else:                                    # сырые байты страницы
+            payload = {k: v[-1] for k, v in urllib.parse.parse_qs(url.query).items()}
+            payload["html"] = body
+        items = payload if isinstance(payload, list) else [payload]
+        if not all(isinstance(it, dict) for it in items):
+            self._send(400, {"error": "ожидается объект или массив объектов"})
+            return
+        results = [f.result() for f in [self.batcher.submit(it) for it in items]]
+        self._send(200, results if isinstance(payload, list) else results[0])
+
+    def log_message(self, fmt, *args):           # без строки в stderr на каждый запрос
+        pass
+
+
+def serve_http(batcher: Batcher, metrics: Metrics, host: str, port: int) -> None:
+    handler = type("Handler", (_Handler,), {"batcher": batcher, "metrics": metrics})
+    httpd = ThreadingHTTPServer((host, port), handler)
+    httpd.daemon_threads = True
+
+    def stop(signum, frame):
+        threading.Thread(target=httpd.shutdown, daemon=True).start()
+
+    signal.signal(signal.SIGTERM, stop)
+    print(f"🌐 http://{host}:{httpd.server_address[1]} (воркеров: {metrics.workers}); Ctrl-C — остановка",
+          file=sys.stderr)
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        httpd.server_close()
+
+
+# ---------- CLI ------------------------------------------------------
+def main(argv: list[str] | None = None) -> int:
+    p = argparse.ArgumentParser(description="Резидентный HTML → Markdown конвертер")
+    mode = p.add_mutually_exclusive_group(required=True)
+    mode.add_argument("--stdio", action="store_true", help="JSON-lines через stdin/stdout")
+    mode.add_argument("--http", metavar="HOST:PORT", help="локальный HTTP, например 127.0.0.1:8765")
+    p.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    p.add_argument("--batch-size", type=int, default=16, help="документов в одной задаче пула")
+    p.add_argument("--batch-wait", type=float, default=5.0,
+                   help="сколько мс ждать добора пачки после первого запроса")
+    p.add_argument("--category", default="misc", help="category по умолчанию")
+    p.add_argument("--section", default="", help="section_1c по умолчанию")
+    args = p.parse_args(argv)
+
+    workers = max(1, args.workers)
+    metrics = Metrics(workers)
+    # тот же прогретый воркер, что у --watch: импорты и таблицы загружены до первого запроса
+    pool = ProcessPoolExecutor(max_workers=workers, initializer=conv._init_watch_worker)
+    batcher = Batcher(pool, {"category": args.category, "section": args.section}, metrics,
+                      batch_size=args.batch_size, batch_wait=args.batch_wait / 1000,
+                      max_batches=workers * 2)
+    try:
+        if args.stdio:
+            serve_stdio(batcher)
+        else:
+            host, _, port = args.http.rpartition(":")
+            serve_http(batcher, metrics, host or "127.0.0.1", int(port))
+    finally:
+        batcher.close()
+        pool.shutdown(wait=True)
+    s = metrics.snapshot()
+    print(f"🏁 Сконвертировано {s['documents']}, ошибок {s['errors']}, пачек {s['batches']}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
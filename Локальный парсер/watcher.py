@@ -0,0 +1,219 @@
+#watcher.py
+
+"""
+Слежение за деревом папок для convert_html_to_md.py --watch.
+
+На Linux используется inotify (через ctypes, без сторонних пакетов),
+в остальных случаях — периодический опрос os.scandir.
+Оба наблюдателя отдают одинаковые события: ("changed" | "deleted", путь).
+Debouncer придерживает файл, пока его размер/mtime не перестанут меняться.
+"""
+from __future__ import annotations
+import ctypes, ctypes.util, errno, fnmatch, os, pathlib, select, struct, sys, time
+
+# ---------- inotify ---------------------------------------------------
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM  = 0x00000040
+IN_MOVED_TO    = 0x00000080
+IN_CREATE      = 0x00000100
+IN_DELETE      = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW  = 0x00004000
+IN_IGNORED     = 0x00008000
+IN_ISDIR       = 0x40000000
+
+_WATCH_MASK = (IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO
+               | IN_CREATE | IN_DELETE | IN_DELETE_SELF)
+_EVENT_HEADER = struct.Struct("iIII")          # wd, mask, cookie, len
+
+
+def _matches(name: str, name_pattern: str) -> bool:
+    return fnmatch.fnmatch(name, name_pattern)
+
+def _scan(root: pathlib.Path, name_pattern: str):
+    """(path, stat) всех подходящих файлов под root."""
+    stack = [root]
+    while stack:
+        d = stack.pop()
+        try:
+            it = os.scandir(d)
+        except OSError:
+            continue
+        with it:
+            for e in it:
+                try:
+                    if e.is_dir(follow_symlinks=False):
+                        stack.append(pathlib.Path(e.path))
+                    elif _matches(e.name, name_pattern):
+                        yield pathlib.Path(e.path), e.stat()
+                except OSError:
+                    continue
+
+
+class InotifyWatcher:
+    """Рекурсивный inotify: новые подпапки берутся под наблюдение на лету."""
+
+    def __init__(self, root: pathlib.Path, name_pattern: str):
+        libc_name = ctypes.util.find_library("c") or "libc.so.6"
+        self._libc = ctypes.CDLL(libc_name, use_errno=True)
+        self.fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err))
+        self.root = root
+        self.name_pattern = name_pattern
+        self._dirs: dict[int, pathlib.Path] = {}
+        self._backlog: list[tuple[str, pathlib.Path]] = []
+        self._add_tree(root, report_files=False)
+
+    def _add_dir(self, path: pathlib.Path) -> None:
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(path), _WATCH_MASK)
+        if wd < 0:
+            err = ctypes.get_errno()
+            if err == errno.ENOSPC:
+                raise OSError(err, "inotify: исчерпан fs.inotify.max_user_watches")
+            return                                   # папку успели удалить
+        self._dirs[wd] = path
+
+    def _add_tree(self, top: pathlib.Path, report_files: bool) -> None:
+        for dirpath, _dirnames, filenames in os.walk(top):
+            self._add_dir(pathlib.Path(dirpath))
+            if report_files:                         # файлы, появившиеся до add_watch
+                self._backlog.extend(("changed", pathlib.Path(dirpath, f))
+                                     for f in filenames if _matches(f, self.name_pattern))
+
+    def read(self, timeout: float | None) -> list[tuple[str, pathlib.Path]]:
+        events, self._backlog = self._backlog, []
+        if events:
+            timeout = 0
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return events
+        try:
+            buf = os.read(self.fd, 256 * 1024)
+        except BlockingIOError:
+            return events
+        pos = 0
+        while pos < len(buf):
+            wd, mask, _cookie, length = _EVENT_HEADER.unpack_from(buf, pos)
+            raw_name = buf[pos + _EVENT_HEADER.size: pos + _EVENT_HEADER.size + length]
+            pos += _EVENT_HEADER.size + length
+            if mask & IN_Q_OVERFLOW:                 # очередь переполнилась — полный пересмотр
+                events.extend(("changed", p) for p, _ in _scan(self.root, self.name_pattern))
+                continue
+            if mask & IN_IGNORED:
+                self._dirs.pop(wd, None)
+                continue
+            parent = self._dirs.get(wd)
+            if parent is None or mask & IN_DELETE_SELF:
+                continue
+            path = parent / os.fsdecode(raw_name.rstrip(b"\0"))
+            if mask & IN_ISDIR:
+                if mask & (IN_CREATE | IN_MOVED_TO):
+                    self._add_tree(path, report_files=True)
+                continue
+            if not _matches(path.name, self.name_pattern):
+                continue
+            if mask & (IN_CLOSE_WRITE | IN_MOVED_TO):
+                events.append(("changed", path))
+            elif mask & (IN_DELETE | IN_MOVED_FROM):
+                events.append(("deleted", path))
+        return events
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+
+class PollingWatcher:
+    """Запасной вариант: сравнение снимков (size, mtime) раз в interval секунд."""
+
+    def __init__(self, root: pathlib.Path, name_pattern: str, interval: float = 0.5):
+        self.root = root
+        self.name_pattern = name_pattern
+        self.interval = interval
+        self._snapshot = self._take()
+        self._next = time.monotonic() + interval
+
+    def _take(self) -> dict[pathlib.Path, tuple[int, int]]:
+        return {p: (st.st_size, st.st_mtime_ns) for p, st in _scan(self.root, self.name_pattern)}
+
+    def read(self, timeout: float | None) -> list[tuple[str, pathlib.Path]]:
+        wait = self._next - time.monotonic()
+        if timeout is not None:
+            wait = min(wait, timeout)
+        if wait > 0:
+            time.sleep(wait)
+        if time.monotonic() < self._next:
+            return []
+        self._next = time.monotonic() + self.interval
+        old, new = self._snapshot, self._take()
+        self._snapshot = new
+        events = [("changed", p) for p, sig in new.items() if old.get(p) != sig]
+        events += [("deleted", p) for p in old.keys() - new.keys()]
+        return events
+
+    def close(self) -> None:
+        pass
+
+
+def open_watcher(root: pathlib.Path, name_pattern: str,
+                 poll_interval: float = 0.5, force_polling: bool = False):
+    """inotify, если доступен, иначе опрос."""
+    if not force_polling and sys.platform.startswith("linux"):
+        try:
+            return InotifyWatcher(root, name_pattern)
+        except (OSError, AttributeError) as e:
+            print(f"⚠️ inotify недоступен ({e}), перехожу на опрос", file=sys.stderr)
+    return PollingWatcher(root, name_pattern, poll_interval)
+
+
+# ---------- debounce --------------------------------------------------
+class Debouncer:
+    """
+    Файл отдаётся на конвертацию, только если за settle секунд после
+    последнего события его размер и mtime не изменились — недописанные
+    файлы (несколько открытий/закрытий подряд) ждут.
+    """
+
+    def __init__(self, settle: float = 0.3):
+        self.settle = settle
+        self._pending: dict[pathlib.Path, tuple[float, float, tuple[int, int] | None]] = {}
+
+    @staticmethod
+    def _signature(path: pathlib.Path) -> tuple[int, int] | None:
+        try:
+            st = path.stat()
+        except OSError:
+            return None
+        return st.st_size, st.st_mtime_ns
+
+    def touch(self, path: pathlib.Path, now: float) -> None:
+        first_seen = self._pending.get(path, (now,))[0]
+        self._pending[path] = (first_seen, now + self.settle, self._signature(path))
+
+    def discard(self, path: pathlib.Path) -> None:
+        self._pending.pop(path, None)
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def timeout(self, now: float) -> float | None:
+        if not self._pending:
+            return None
+        return max(0.0, min(deadline for _, deadline, _ in self._pending.values()) - now)
+
+    def due(self, now: float) -> list[tuple[pathlib.Path, float]]:
+        """Устоявшиеся файлы и момент первого события по каждому."""
+        ready = []
+        for path, (first_seen, deadline, sig) in list(self._pending.items()):
+            if deadline > now:
+                continue
+            current = self._signature(path)
+            if current is None:                       # файл исчез, пока ждали
+                del self._pending[path]
+            elif current != sig:                      # ещё пишется
+                self._pending[path] = (first_seen, now + self.settle, current)
+            else:
+                del self._pending[path]
+                ready.append((path, first_seen))
+        return ready
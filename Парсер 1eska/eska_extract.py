@@ -0,0 +1,244 @@
+# eska_extract.py
+# Разбор страницы статьи 1eska.ru за один проход по дереву.  Поля описаны
+# декларативно (FIELDS: поле → запасные селекторы по порядку → атрибут),
+# compile_spec раскладывает селекторы по тегам и классам, а extract обходит
+# lxml-дерево один раз вместо дюжины find/select_one по дереву html.parser.
+# Чистые функции над строкой HTML — модуль годится и для процессного пула,
+# и для benchmarks/.
+
+from __future__ import annotations
+import logging
+import re
+import sys
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+
+import lxml.etree
+import lxml.html
+from markdownify import markdownify as md
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from common import profiling
+
+# ───────────────────────────  спецификация страницы
+# Селектор — подмножество CSS: тег, .классы, [атр=значение] и потомки через
+# пробел; «@атрибут» в конце — брать значение атрибута, иначе текст элемента.
+# Для поля побеждает первый по порядку селектор с непустым значением
+# (у каждого селектора берётся первый подходящий элемент, как у select_one).
+FIELDS = {
+    "title": ["meta[itemprop=headline]@content", "h1.publication__title", "h1",
+              "meta[property=og:title]@content"],
+    "date": ["meta[itemprop=datePublished]@datetime", "span.date"],
+    "image": ["meta[itemprop=image]@content", "div.detailimage img@src"],
+    "section": ["div.period-wrapper .section_name a"],
+    "author": [".publication__author-bold-text"],
+    "author_position": [".publication__position"],
+}
+# все совпадения по порядку документа
+LISTS = {"tags": "div.publication-tags__item"}
+# контейнер тела: из него убираются картинки, остальное — в Markdown
+CONTENT = ["div.detail.blog .content", "div.detail.blog"]
+
+
+@dataclass
+class Article:
+    title: str
+    date: str
+    image: str
+    tags: list[str] | None
+    section: str | None
+    author: str | None
+    author_position: str | None
+    body_md: str
+    title_fallback: bool = False     # заголовок не из meta itemprop=headline
+    extra: dict = field(default_factory=dict)   # поля и списки профиля сверх стандартных
+
+    def get(self, name: str, default=None):
+        """Стандартное поле или поле профиля из extra."""
+        if name != "extra" and name in self.__dataclass_fields__:
+            return getattr(self, name)
+        return self.extra.get(name, default)
+
+    def as_dict(self) -> dict:
+        return asdict(self)
+
+
+# ───────────────────────────  компиляция селекторов
+_COMPOUND = re.compile(r"^([\w-]+)?((?:\.[\w-]+)*)((?:\[[\w-]+=[^\]]+\])*)$")
+
+
+@dataclass(frozen=True)
+class _Compound:
+    tag: str | None
+    classes: frozenset
+    attrs: tuple
+
+    def matches(self, el) -> bool:
+        if self.tag is not None and el.tag != self.tag:
+            return False
+        if self.classes and not self.classes.issubset((el.get("class") or "").split()):
+            return False
+        return all(el.get(k) == v for k, v in self.attrs)
+
+
+@dataclass(frozen=True)
+class _Selector:
+    key: str              # поле, список или "content"
+    priority: int         # номер запасного варианта
+    chain: tuple          # _Compound от дальнего предка к самому элементу
+    take: str | None      # атрибут или None — текст
+    multi: bool = False   # собирать все совпадения, а не первое
+
+    def matches(self, el) -> bool:
+        if not self.chain[-1].matches(el):
+            return False
+        # потомок через пробел: предки подбираются жадно справа налево
+        node = el.getparent()
+        for comp in reversed(self.chain[:-1]):
+            while node is not None and not comp.matches(node):
+                node = node.getparent()
+            if node is None:
+                return False
+            node = node.getparent()
+        return True
+
+
+def _compile(key: str, priority: int, text: str, multi: bool = False) -> _Selector:
+    text, _, take = text.partition("@")
+    chain = []
+    for part in text.split():
+        m = _COMPOUND.match(part)
+        if not m:
+            raise ValueError(f"неподдерживаемый селектор {part!r} в {key}")
+        tag, classes, attrs = m.groups()
+        chain.append(_Compound(
+            tag,
+            frozenset(c for c in (classes or "").split(".") if c),
+            tuple(tuple(a.split("=", 1)) for a in re.findall(r"\[([^\]]+)\]", attrs or "")),
+        ))
+    return _Selector(key, priority, tuple(chain), take or None, multi)
+
+
+@dataclass(frozen=True)
+class Spec:
+    fields: dict
+    lists: dict
+    content: list
+    by_tag: dict          # тег последнего звена → селекторы
+    by_class: dict        # класс последнего звена (если тег не указан) → селекторы
+
+
+def compile_spec(fields: dict = FIELDS, lists: dict = LISTS, content: list = CONTENT) -> Spec:
+    """Селекторы, разложенные по тегу (или по классу, если тег не указан) последнего звена."""
+    by_tag: dict[str, list[_Selector]] = {}
+    by_class: dict[str, list[_Selector]] = {}
+    selectors = [_compile(k, i, s) for k, opts in fields.items() for i, s in enumerate(opts)]
+    selectors += [_compile(k, 0, s, multi=True) for k, s in lists.items()]
+    selectors += [_compile("content", i, s) for i, s in enumerate(content)]
+    for sel in selectors:
+        last = sel.chain[-1]
+        if last.tag is not None:
+            by_tag.setdefault(last.tag, []).append(sel)
+        elif last.classes:
+            by_class.setdefault(min(last.classes), []).append(sel)
+        else:
+            raise ValueError(f"селектору {sel.key} нужен тег или класс")
+    return Spec(dict(fields), dict(lists), list(content), by_tag, by_class)
+
+
+_SPEC = compile_spec()
+_UTF8_PARSER = lxml.html.HTMLParser(encoding="utf-8")
+_NO_TEXT = {"script", "style", "template"}
+
+
+def _text(el) -> str:
+    """get_text(strip=True) из bs4: куски текста без пробелов по краям, склеенные без разделителя."""
+    parts = [el.text] if el.tag not in _NO_TEXT else []
+    for node in el.iterdescendants():
+        if isinstance(node.tag, str) and node.tag not in _NO_TEXT:
+            parts.append(node.text)
+        parts.append(node.tail)
+    return "".join(p.strip() for p in parts if p)
+
+
+def _inner_html(el) -> str:
+    return (el.text or "") + "".join(lxml.html.tostring(ch, encoding="unicode") for ch in el)
+
+
+# ───────────────────────────  извлечение
+def extract_fields(html: str, spec: Spec = _SPEC) -> tuple[dict, dict, dict, str]:
+    """
+    Один обход дерева: (значения полей, номер сработавшего варианта каждого
+    поля — None, если ни один, списки, HTML контейнера тела без картинок).
+    """
+    first: dict[tuple[str, int], tuple] = {}         # (поле, вариант) → первый элемент
+    found: dict[str, list] = {}
+    with profiling.stage("parse.tree"):
+        try:
+            root = lxml.html.document_fromstring(html.encode("utf-8", "replace"), parser=_UTF8_PARSER)
+        except lxml.etree.ParserError:              # пустой документ
+            root = None
+    with profiling.stage("parse.fields"):
+        for el in (root.iter(lxml.etree.Element) if root is not None else ()):
+            candidates = spec.by_tag.get(el.tag, ())
+            cls = el.get("class")
+            if cls:
+                for c in cls.split():
+                    if c in spec.by_class:
+                        candidates = [*candidates, *spec.by_class[c]]
+            for sel in candidates:
+                if sel.multi:
+                    if sel.matches(el):
+                        found.setdefault(sel.key, []).append(el)
+                elif (sel.key, sel.priority) not in first and sel.matches(el):
+                    first[(sel.key, sel.priority)] = (el, sel)
+
+        values, used = {}, {}
+        for key, options in spec.fields.items():
+            values[key], used[key] = "", None
+            for i in range(len(options)):
+                if (key, i) not in first:
+                    continue
+                el, sel = first[(key, i)]
+                value = (el.get(sel.take) or "").strip() if sel.take else _text(el)
+                if value:
+                    values[key], used[key] = value, i
+                    break
+        lists = {key: [_text(el) for el in found.get(key, ())] for key in spec.lists}
+        content = next((first[("content", i)][0] for i in range(len(spec.content))
+                        if ("content", i) in first), None)
+        if content is not None:
+            for img in list(content.iter("img")):
+                img.drop_tree()
+        html_body = _inner_html(content) if content is not None else ""
+    return values, used, lists, html_body
+
+
+_STANDARD = {"title", "date", "image", "section", "author", "author_position", "tags"}
+
+
+def extract(html: str, url: str = "", spec: Spec = _SPEC) -> Article:
+    """
+    Статья 1eska: поля и тело в Markdown за один обход дерева. spec — свои
+    селекторы (профиль раздела); поля, которых нет у Article, попадают в extra.
+    """
+    values, used, lists, html_body = extract_fields(html, spec)
+    with profiling.stage("parse.markdown"):
+        markdown = md(html_body)
+    fallback = used.get("title") not in (0, None)
+    if fallback:
+        logging.warning(f"Fallback title used on {url}: {values.get('title', '')}")
+    extra = {k: v for k, v in values.items() if k not in _STANDARD}
+    extra.update((k, v) for k, v in lists.items() if k not in _STANDARD)
+    return Article(
+        title=values.get("title", ""),
+        date=values.get("date", ""),
+        image=values.get("image", ""),
+        tags=[t.lstrip("#") for t in lists.get("tags", ())] or None,
+        section=values.get("section") or None,
+        author=values.get("author") or None,
+        author_position=values.get("author_position") or None,
+        body_md=markdown,
+        title_fallback=fallback,
+        extra=extra,
+    )
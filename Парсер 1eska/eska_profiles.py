@@ -0,0 +1,123 @@
+# eska_profiles.py
+# Профили разделов для parser1eska.py: откуда начинать, как листать список,
+# какие ссылки считать статьями, какими селекторами разбирать статью и что
+# класть во front-matter.  Профиль — YAML-файл в profiles/ (образец и описание
+# полей — profiles/unf.yaml); один процесс краулера ведёт сразу несколько.
+
+from __future__ import annotations
+import re
+from dataclasses import dataclass
+from pathlib import Path
+
+import yaml
+
+import eska_extract
+
+PROFILES_DIR = Path(__file__).resolve().parent / "profiles"
+DEFAULT_PROFILE = PROFILES_DIR / "unf.yaml"
+
+_ITEM = re.compile(r"^([\w-]+)\[(\d+)\]$")       # tags[0] — элемент списка
+
+
+def normalize_url(u: str) -> str:
+    return u.split("#")[0].rstrip("/")
+
+
+@dataclass
+class Profile:
+    name: str
+    start_url: str
+    output_dir: Path
+    listing: str                     # CSS-селектор ссылок на статьи на странице списка
+    article_filter: str | None       # подстрока URL статьи; None — качать все ссылки
+    page_param: str | None           # start_url?PARAM=N; None — список из одной страницы
+    sitemap: str | None              # "auto" или URL sitemap.xml; None — только пагинация
+    spec: eska_extract.Spec
+    front_matter: dict               # ключ → имя поля статьи или {"value": константа}
+    source: Path | None = None
+
+    def page_url(self, page: int) -> str:
+        return self.start_url if page == 1 or not self.page_param else f"{self.start_url}?{self.page_param}={page}"
+
+    def is_article(self, url: str) -> bool:
+        return not self.article_filter or self.article_filter in normalize_url(url)
+
+    def front(self, article: eska_extract.Article, url: str) -> dict:
+        """Front-matter статьи по отображению из профиля, в его порядке."""
+        front = {}
+        for key, source in self.front_matter.items():
+            if isinstance(source, dict):
+                front[key] = source.get("value")
+            elif source == "url":
+                front[key] = normalize_url(url)
+            elif m := _ITEM.match(source):
+                items = article.get(m.group(1)) or []
+                index = int(m.group(2))
+                front[key] = items[index] if index < len(items) else ""
+            else:
+                value = article.get(source)
+                front[key] = "" if value is None else value
+        return front
+
+
+def resolve(name_or_path: str) -> Path:
+    """«unf» → profiles/unf.yaml; путь к файлу — как есть."""
+    path = Path(name_or_path)
+    if path.suffix not in (".yaml", ".yml") and not path.exists():
+        path = PROFILES_DIR / f"{name_or_path}.yaml"
+    return path
+
+
+def load_profile(path: Path) -> Profile:
+    path = Path(path)
+    data = yaml.safe_load(path.read_text(encoding="utf-8")) or {}
+    if not isinstance(data, dict):
+        raise ValueError(f"{path}: профиль должен быть YAML-словарём")
+    for key in ("start_url", "listing", "front_matter"):
+        if not data.get(key):
+            raise ValueError(f"{path}: не задан {key}")
+    name = str(data.get("name") or path.stem)
+    pagination = data.get("pagination") or {}
+    article = data.get("article") or {}
+    # селекторы профиля дополняют и переопределяют селекторы по умолчанию
+    fields = {**eska_extract.FIELDS, **(article.get("fields") or {})}
+    fields = {k: [v] if isinstance(v, str) else list(v) for k, v in fields.items()}
+    lists = {**eska_extract.LISTS, **(article.get("lists") or {})}
+    content = article.get("content") or eska_extract.CONTENT
+    content = [content] if isinstance(content, str) else list(content)
+    if "title" not in fields:
+        raise ValueError(f"{path}: без поля title не из чего строить имя файла")
+    front_matter = data["front_matter"]
+    if not isinstance(front_matter, dict):
+        raise ValueError(f"{path}: front_matter — словарь «ключ: поле»")
+    for key, source in front_matter.items():
+        if not (isinstance(source, str) or (isinstance(source, dict) and "value" in source)):
+            raise ValueError(f"{path}: front_matter.{key} — имя поля или {{value: …}}")
+    try:
+        spec = eska_extract.compile_spec(fields, lists, content)
+    except ValueError as e:
+        raise ValueError(f"{path}: {e}") from None
+    return Profile(
+        name=name,
+        start_url=data["start_url"],
+        output_dir=Path(data.get("output_dir") or f"{name}_md"),
+        listing=data["listing"],
+        article_filter=data.get("article_filter"),
+        page_param=pagination.get("param", "PAGEN_1"),
+        sitemap=pagination.get("sitemap"),
+        spec=spec,
+        front_matter=dict(front_matter),
+        source=path,
+    )
+
+
+def load_profiles(names: list[str]) -> list[Profile]:
+    profiles = [load_profile(resolve(n)) for n in names]
+    seen: dict = {}
+    for p in profiles:
+        for key in ("name", "output_dir"):
+            value = getattr(p, key)
+            if (key, value) in seen:
+                raise ValueError(f"у профилей {seen[(key, value)]} и {p.source} одинаковый {key}: {value}")
+            seen[(key, value)] = p.source
+    return profiles
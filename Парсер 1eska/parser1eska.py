@@ -1,151 +1,629 @@
 import requests
 from bs4 import BeautifulSoup
+import argparse
+import collections
+import dataclasses
+import functools
 import os
+import queue
 import re
+import sys
 import json
+import threading
+import time
+import urllib.parse
+import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from pathlib import Path
 from markdownify import markdownify as md
 
-import logging
-logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from common import profiling      # --profile: замеры по стадиям
+from common import metrics        # --metrics: счётчики и задержки для Prometheus / JSON
+from common import sinks          # --sink: .md / JSONL-шарды / SQLite
+from common.fetch import Fetcher, HostLimiter, make_session   # таймауты, повторы, предохранитель
+from common.url_index import UrlIndex   # URL → документ: известные статьи не качаем
+from common.crawl_state import CrawlState   # --resume / --retry-failed
+from common.http_archive import HttpArchive # --archive / --replay: сырые ответы
+import eska_extract                         # разбор статьи за один проход по lxml-дереву
+import eska_profiles                        # профили разделов: profiles/*.yaml
+from eska_profiles import Profile, normalize_url
 
-CATEGORY = "1eska"
-SECTION_1C = "УНФ"
+import logging
+# несколько профилей идут параллельно — в каждой строке имя профиля (= имя потока)
+logging.basicConfig(level=logging.INFO, format='%(levelname)s: [%(threadName)s] %(message)s')
 
 # Utility functions
 def sanitize(text: str) -> str:
     t = re.sub(r"[^\w\- ]", "", text.lower()).strip()
     return t.replace(" ", "-")[:100] or "untitled"
 
-def normalize_url(u: str) -> str:
-    return u.split("#")[0].rstrip("/")
-
-def save_md(out_dir: Path, file_slug: str, title: str, date: str, url: str, body_md: str, subcategory: str):
-    """Write Markdown file with YAML front-matter."""
-    out_dir.mkdir(parents=True, exist_ok=True)
-    fp = out_dir / f"{file_slug}.md"
-    if fp.exists():
-        logging.info(f"Skipping existing file: {fp.name}")
-        return
-    front = {
-        "date": date,
-        "category": CATEGORY,
-        "section_1c": SECTION_1C,
-        "subcategory": subcategory,
-        "question": title,
-        "url": url
-    }
+def save_md(sink, file_slug: str, front: dict, body_md: str, overwrite: bool = False) -> str:
+    """Write Markdown file with YAML front-matter (keys in profile order) into the sink; returns its name."""
+    name = f"{file_slug}.md"
+    if name in sink and not overwrite:
+        logging.info(f"Skipping existing file: {name}")
+        return name
     lines = ["---"]
-    for key in ["date","category","section_1c","subcategory","question","url"]:
-        lines.append(f'{key}: {json.dumps(front[key], ensure_ascii=False)}')
+    for key, value in front.items():
+        lines.append(f'{key}: {json.dumps(value, ensure_ascii=False)}')
     lines.append("---\n")
-    content = "\n".join(lines) + body_md.strip() + "\n"
-    fp.write_text(content, encoding="utf-8")
-    logging.info(f"Saved: {fp.name}")
-
-BASE_URL = "https://1eska.ru/projects/publications/upravlenie-nashey-firmoy-unf/"
-OUTPUT_DIR = "unf_articles_md"
-os.makedirs(OUTPUT_DIR, exist_ok=True)
-
-session = requests.Session()
-
-# Track processed pages and articles
-prev_posts = None
-processed_page_urls = set()
-processed_article_urls = set()
-
-# pretend to be a real browser to get full HTML including meta tags
-session.headers.update({
-    "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) "
-                  "AppleWebKit/537.36 (KHTML, like Gecko) "
-                  "Chrome/114.0.0.0 Safari/537.36"
-})
-
-# find total pages or iterate until no next
-page = 1
-while True:
-    # build and check pagination URL
-    page_url = BASE_URL if page == 1 else f"{BASE_URL}?PAGEN_1={page}"
-    logging.info(f"Processing page {page}: {page_url}")
-    if page_url in processed_page_urls:
-        logging.info("INFO: URL страницы повторяется — выходим")
-        break
-    processed_page_urls.add(page_url)
-    r = session.get(page_url)
-    soup = BeautifulSoup(r.text, 'html.parser')
-    posts = soup.select('div.item.shadow .inner-item .title > a')
-    logging.info(f"Found {len(posts)} articles on page {page}")
-    # detect if this page repeats the same articles
-    page_article_urls = [
-        normalize_url(requests.compat.urljoin(BASE_URL, a['href']))
-        for a in posts
-    ]
-    if prev_posts is not None and page_article_urls == prev_posts:
-        logging.info("INFO: Те же статьи, что на предыдущей странице — выходим")
-        break
-    prev_posts = page_article_urls
-    logging.info(f"INFO: Article URLs on page {page}: {page_article_urls}")
-    if not posts:
-        break
-    for a in posts:
+    body = body_md.strip() + "\n"
+    content = "\n".join(lines) + body
+    with profiling.stage("write"), metrics.stage("write"):
+        sink.write(name, front, body, content)
+    if profiling.enabled():
+        profiling.add_bytes(bytes_out=len(content.encode("utf-8")))
+    logging.info(f"Saved: {name}")
+    return name
+
+def parse_article(html: str, url: str) -> dict:
+    """
+    Extract metadata and Markdown body from a 1eska article page.
+    Прежний разбор через BeautifulSoup: краулер работает через eska_extract.extract,
+    а этот вариант остаётся эталоном для сверки и benchmarks/run_benchmarks.py.
+    """
+    with profiling.stage("parse.soup"):
+        ss = BeautifulSoup(html, 'html.parser')
+    # metadata
+    headline_meta = ss.find('meta', {'itemprop':'headline'})
+    if headline_meta and headline_meta.get('content'):
+        title = headline_meta['content'].strip()
+    else:
+        # fallback to visible headline
+        title_elem = ss.select_one('h1.publication__title') or ss.find('h1') or ss.find('meta', {'property':'og:title'})
+        title = (title_elem.get_text(strip=True) 
+                 if hasattr(title_elem, 'get_text') 
+                 else title_elem.get('content', '').strip())
+        logging.warning(f"Fallback title used on {url}: {title}")
+
+    date_meta = ss.find('meta', {'itemprop':'datePublished'})
+    date = date_meta.get('datetime', '').strip() if date_meta else ''
+    if not date:
+        date = ss.select_one('span.date').get_text(strip=True) if ss.select_one('span.date') else ""
+
+    img_meta = ss.find('meta', {'itemprop':'image'})
+    image = img_meta.get('content', '').strip() if img_meta else ''
+    if not image and ss.select_one('div.detailimage img'):
+        image = ss.select_one('div.detailimage img')['src']
+
+    # Extract additional metadata
+    tags = [t.get_text(strip=True).lstrip('#') for t in ss.select('div.publication-tags__item')] or None
+    section_elem = ss.select_one('div.period-wrapper .section_name a')
+    section = section_elem.get_text(strip=True) if section_elem else None
+    author_elem = ss.select_one('.publication__author-bold-text')
+    author = author_elem.get_text(strip=True) if author_elem else None
+    author_pos_elem = ss.select_one('.publication__position')
+    author_position = author_pos_elem.get_text(strip=True) if author_pos_elem else None
+
+    # content div
+    content_div = ss.select_one('div.detail.blog .content') or ss.select_one('div.detail.blog')
+    # remove image tags from content
+    if content_div:
+        for img in content_div.find_all('img'):
+            img.decompose()
+    html_body = content_div.decode_contents() if content_div else ''
+    with profiling.stage("parse.markdown"):
+        markdown = md(html_body)
+    return {
+        "title": title,
+        "date": date,
+        "image": image,
+        "tags": tags,
+        "section": section,
+        "author": author,
+        "author_position": author_position,
+        "body_md": markdown,
+    }
+
+def parse_response(content: bytes, encoding: str | None, url: str,
+                   spec: eska_extract.Spec = eska_extract._SPEC) -> eska_extract.Article:
+    """
+    Разбор статьи по сырому ответу (селекторы spec — из профиля раздела) —
+    задача процессного пула. Байты
+    раскодируются здесь, а не в главном потоке, так же, как это делает
+    Response.text (без charset в заголовке кодировка угадывается по содержимому).
+    """
+    with profiling.stage("parse.decode"):
+        encoding = encoding or requests.compat.chardet.detect(content)["encoding"] or "utf-8"
+        try:
+            html = str(content, encoding, errors="replace")
+        except LookupError:
+            html = str(content, "utf-8", errors="replace")
+    return eska_extract.extract(html, url, spec)
+
+def fetch_article(fetcher: Fetcher, url: str, headers: dict | None = None, kind: str = "article"):
+    """GET статьи (или страницы списка) в потоке пула; время с повторами возвращается для --profile."""
+    t0 = time.perf_counter()
+    rr = fetcher.get(url, headers, kind)
+    return rr, time.perf_counter() - t0
+
+def listing_pages(fetcher: Fetcher, profile: Profile, page: int = 1, prev_posts=None, prefetch: int = 2):
+    """
+    Страницы раздела по ?PAGEN_1=N (параметр — из профиля): (номер, URL, ссылки, нормализованные ссылки),
+    при ошибке — (номер, URL, None, текст ошибки). Следующие prefetch страниц
+    качаются заранее. Конец раздела — пустая страница или те же статьи, что на
+    предыдущей (так Bitrix отвечает на номер за последней страницей); лишние
+    запросы за концом — не больше prefetch.
+    """
+    prefetch = max(1, prefetch)
+    ahead = collections.deque()
+    next_page = page
+    lp = ThreadPoolExecutor(max_workers=prefetch, thread_name_prefix="listing")
+    try:
+        while True:
+            while len(ahead) < prefetch:
+                url = profile.page_url(next_page)
+                ahead.append((next_page, url, lp.submit(fetch_article, fetcher, url, None, "listing")))
+                next_page += 1
+            page, page_url, fut = ahead.popleft()
+            logging.info(f"Processing page {page}: {page_url}")
+            try:
+                r, elapsed = fut.result()
+                profiling.record("fetch.listing", elapsed)
+                metrics.observe("fetch", elapsed, kind="listing")
+                metrics.add_bytes(len(r.content))
+                r.raise_for_status()
+            except Exception as e:
+                metrics.failure(e, kind="listing")
+                yield page, page_url, None, f"{type(e).__name__}: {e}"
+                return
+            metrics.count("listing_pages")
+            with profiling.stage("parse.listing"):
+                soup = BeautifulSoup(r.text, 'html.parser')
+                posts = soup.select(profile.listing)
+            logging.info(f"Found {len(posts)} articles on page {page}")
+            # detect if this page repeats the same articles
+            links = [requests.compat.urljoin(profile.start_url, a['href']) for a in posts]
+            page_article_urls = [normalize_url(u) for u in links]
+            if prev_posts is not None and page_article_urls == prev_posts:
+                logging.info("INFO: Те же статьи, что на предыдущей странице — выходим")
+                return
+            prev_posts = page_article_urls
+            metrics.log_bulk(logging.info, f"{profile.name}.urls", f"Article URLs on page {page}", page_article_urls)
+            if not posts:
+                return
+            yield page, page_url, links, page_article_urls
+            if not profile.page_param:
+                return
+    finally:
+        for *_, fut in ahead:
+            fut.cancel()
+        lp.shutdown(wait=True)
+
+def read_sitemap(fetcher: Fetcher, sitemap_url: str, profile: Profile, skip=()) -> list:
+    """
+    Статьи раздела из sitemap.xml (индекс sitemap-файлов разворачивается):
+    «страница» на каждый sitemap-файл, в том же виде, что у listing_pages.
+    Файлы из skip (уже обработанные при --resume) пропускаются. Ошибка
+    корневого файла — исключение, ошибка вложенного — страница с ошибкой.
+    """
+    pages, todo, page = [], [sitemap_url], 0
+    section = normalize_url(profile.start_url)
+    while todo:
+        url = todo.pop(0)
         try:
-            href = a['href']
-            url = requests.compat.urljoin(BASE_URL, href)
-            if url in processed_article_urls:
-                logging.info(f"Already processed: {url}")
+            r, elapsed = fetch_article(fetcher, url, None, "sitemap")
+            profiling.record("fetch.listing", elapsed)
+            metrics.observe("fetch", elapsed, kind="sitemap")
+            metrics.add_bytes(len(r.content))
+            r.raise_for_status()
+            root = ET.fromstring(r.content)
+        except Exception as e:
+            metrics.failure(e, kind="sitemap")
+            if url == sitemap_url:
+                raise
+            page += 1
+            pages.append((page, url, None, f"{type(e).__name__}: {e}"))
+            continue
+        locs = [el.text.strip() for el in root.iter() if el.tag.rsplit('}', 1)[-1] == 'loc' and el.text]
+        if root.tag.rsplit('}', 1)[-1] == 'sitemapindex':
+            todo.extend(locs)
+            continue
+        page += 1
+        links = [u for u in locs if profile.is_article(u) and normalize_url(u) != section]
+        if links and url not in skip:
+            pages.append((page, url, links, [normalize_url(u) for u in links]))
+    return pages
+
+def _produce(pages, out: queue.Queue, stop: threading.Event) -> None:
+    """Поток-производитель: страницы списка в ограниченную очередь; None — конец."""
+    def put(item) -> bool:
+        while not stop.is_set():
+            try:
+                out.put(item, timeout=0.2)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    try:
+        for item in pages:
+            if not put(item):
+                return
+    except BaseException as e:
+        put(e)
+    finally:
+        pages.close()
+        put(None)
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Статьи разделов 1eska.ru → Markdown (по профилям profiles/*.yaml)")
+    ap.add_argument("profiles", nargs="*", default=["unf"], metavar="PROFILE",
+                    help="профили разделов: имя из profiles/ или путь к YAML; несколько — обходятся "
+                         "одновременно с общими соединениями и лимитами на хост (по умолчанию unf)")
+    ap.add_argument("--base-url",
+                    help="первая страница раздела вместо start_url профиля (например, локальная заглушка "
+                         "benchmarks/mock_1eska.py); только с одним профилем")
+    ap.add_argument("--concurrency", type=int, default=4,
+                    help="сколько статей качать одновременно (на хост, на все профили); 1 — последовательно")
+    ap.add_argument("--min-delay", type=float, default=0.2,
+                    help="минимум секунд между началами запросов к одному хосту")
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                    help="процессов для разбора статей (BeautifulSoup + markdownify); 0 — в главном потоке")
+    ap.add_argument("--prefetch", type=int, default=2,
+                    help="на сколько страниц списка забегать вперёд, пока разбираются статьи")
+    ap.add_argument("--connect-timeout", type=float, default=5.0, metavar="SEC",
+                    help="таймаут установки соединения на одну попытку")
+    ap.add_argument("--read-timeout", type=float, default=30.0, metavar="SEC",
+                    help="таймаут ожидания данных на одну попытку")
+    ap.add_argument("--retries", type=int, default=3,
+                    help="повторов при обрыве, таймауте, 429 и 5xx (пауза растёт вдвое, Retry-After соблюдается)")
+    ap.add_argument("--hedge-after", type=float, metavar="SEC",
+                    help="если ответа нет дольше SEC, отправить дубль запроса и взять первый ответ")
+    ap.add_argument("--sitemap", nargs="?", const="auto", metavar="URL",
+                    help="брать статьи из sitemap.xml (по умолчанию /sitemap.xml сайта; иначе — как в профиле); "
+                         "если его нет — обычная пагинация")
+    ap.add_argument("--refresh", action="store_true",
+                    help="перепроверять уже сохранённые статьи условным GET (ETag/Last-Modified)")
+    mode = ap.add_mutually_exclusive_group()
+    mode.add_argument("--resume", action="store_true",
+                      help="продолжить прерванный обход с места остановки (crawl_state.sqlite)")
+    mode.add_argument("--retry-failed", action="store_true",
+                      help="только перекачать статьи, упавшие в прошлых прогонах")
+    raw = ap.add_mutually_exclusive_group()
+    raw.add_argument("--archive", metavar="DIR", type=Path,
+                     help="сохранять сырые ответы сайта в архив (common/http_archive.py)")
+    raw.add_argument("--replay", metavar="DIR", type=Path,
+                     help="брать ответы из архива вместо сайта: переразбор корпуса без сети")
+    sinks.add_cli_arguments(ap)
+    profiling.add_cli_arguments(ap)
+    metrics.add_cli_arguments(ap)
+    args = ap.parse_args(argv)
+    try:
+        profiles = eska_profiles.load_profiles(args.profiles)
+    except (OSError, ValueError) as e:
+        ap.error(str(e))
+    if args.base_url:
+        if len(profiles) > 1:
+            ap.error("--base-url задаётся только для одного профиля")
+        profiles[0] = dataclasses.replace(profiles[0], start_url=args.base_url)
+    profiling.start(args.profile, args.profile_dump)
+    metrics.start("parser1eska", args.metrics, args.metrics_summary, args.metrics_interval)
+    shared = Shared(profiles, args.concurrency, args.min_delay, args.prefetch, args.workers,
+                    args.archive, args.replay, (args.connect_timeout, args.read_timeout),
+                    args.retries, args.hedge_after)
+    opened = {}
+    try:
+        for p in profiles:
+            opened[p.name] = sinks.open_sink(args.sink, p.output_dir, args.shard_mb)
+
+        def run(profile: Profile) -> None:
+            try:
+                crawl(profile, shared, opened[profile.name], args.refresh, args.resume,
+                      args.retry_failed, args.sitemap)
+            except KeyboardInterrupt:
+                logging.warning("Stopped")
+            except Exception:
+                logging.exception(f"Profile {profile.name} crashed")
+
+        # каждый профиль — свой поток с его именем; загрузка, разбор и лимиты хоста общие
+        threads = [threading.Thread(target=run, args=(p,), name=p.name) for p in profiles]
+        for t in threads:
+            t.start()
+        try:
+            for t in threads:
+                while t.is_alive():
+                    t.join(timeout=0.5)
+        except KeyboardInterrupt:
+            logging.warning("Interrupted: stopping profiles, rerun with --resume to continue")
+            shared.stop.set()
+            for t in threads:
+                t.join()
+            raise
+    finally:
+        shared.close()
+        for line in shared.fetcher.latency.log_lines():
+            logging.info(f"Fetch: {line}")
+        for sink in opened.values():
+            sink.close()
+        profiling.finish()
+        metrics.finish()
+
+class Shared:
+    """
+    Общее для всех профилей запуска: одна сессия (keep-alive соединения к хосту
+    не множатся по числу профилей), один HostLimiter и Fetcher (профили одного
+    сайта делят его лимиты и предохранитель, а не складывают), пулы загрузки и
+    разбора, архив ответов и флаг остановки.
+    """
+
+    def __init__(self, profiles: list[Profile], concurrency: int = 4, min_delay: float = 0.2,
+                 prefetch: int = 2, workers: int | None = None,
+                 archive_dir: Path | None = None, replay_dir: Path | None = None,
+                 timeout: tuple[float, float] = (5.0, 30.0), retries: int = 3,
+                 hedge_after: float | None = None):
+        self.concurrency = max(1, concurrency)
+        self.prefetch = max(1, prefetch)
+        hosts = {urllib.parse.urlsplit(p.start_url).netloc.lower() for p in profiles}
+        # pretend to be a real browser to get full HTML including meta tags
+        self.session = make_session(self.concurrency + self.prefetch * max(1, len(profiles)), {
+            "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) "
+                          "AppleWebKit/537.36 (KHTML, like Gecko) "
+                          "Chrome/114.0.0.0 Safari/537.36"
+        })
+        self.archive = HttpArchive(replay_dir or archive_dir) if (replay_dir or archive_dir) else None
+        if replay_dir:
+            self.archive.replay(self.session)
+            min_delay = 0.0                  # сайт не трогаем — щадить некого
+            # 504 «нет в архиве» от повтора не исчезнет
+            retries, hedge_after = 0, None
+            logging.info(f"Replaying {len(self.archive)} archived responses from {replay_dir}")
+        elif self.archive is not None:
+            self.archive.record(self.session)
+        self.limiter = HostLimiter(self.concurrency, min_delay)
+        # больше потоков, чем пропустит HostLimiter, не нужно
+        fetch_threads = self.concurrency * max(1, len(hosts))
+        self.pool = ThreadPoolExecutor(max_workers=fetch_threads, thread_name_prefix="fetch")
+        self.workers = (os.cpu_count() or 1) if workers is None else workers
+        self.ppool = ProcessPoolExecutor(max_workers=self.workers) if self.workers > 0 else None
+        self.stop = threading.Event()
+        self.fetcher = Fetcher(self.session, self.limiter, timeout, retries,
+                               breaker_threshold=0 if replay_dir else 5,
+                               hedge_after=hedge_after,
+                               hedge_workers=2 * (fetch_threads + self.prefetch * len(profiles)),
+                               stop=self.stop)
+
+    def close(self) -> None:
+        self.stop.set()
+        self.pool.shutdown(wait=True, cancel_futures=True)
+        self.fetcher.close()
+        if self.ppool is not None:
+            self.ppool.shutdown(wait=True, cancel_futures=True)
+        if self.archive is not None:
+            self.archive.close()
+
+def crawl(profile: Profile, shared: Shared, sink=None, refresh: bool = False, resume: bool = False,
+          retry_failed: bool = False, sitemap: str | None = None):
+    """Обход одного профиля; несколько профилей зовут crawl из своих потоков с одним shared."""
+    profile.output_dir.mkdir(parents=True, exist_ok=True)
+    sink = sink or sinks.MarkdownDirSink(profile.output_dir)
+    index = UrlIndex(profile.output_dir, sink, normalize_url)
+    state = CrawlState(profile.output_dir / CrawlState.FILE_NAME)
+    stats = {"saved": 0, "updated": 0, "not_modified": 0, "known": 0, "failed": 0}
+    fetcher, pool, ppool = shared.fetcher, shared.pool, shared.ppool
+    sitemap = sitemap or profile.sitemap
+    stop = threading.Event()
+
+    # Статья идёт загрузка (потоки) → разбор (процессы) → запись (поток профиля),
+    # всё в порядке списка — результат тот же, что у последовательного обхода.
+    # В разборе одновременно не больше window статей профиля: HTML не копится в
+    # памяти, а загрузка стоит, пока поток профиля не заберёт результаты.
+    window = 2 * max(1, shared.workers)
+    fetching = collections.deque()       # (ключ страницы, url, known, future загрузки)
+    parsing = collections.deque()        # (ключ страницы, url, known, ответ, исход)
+    open_pages = {}                      # ключ → [статей в работе, обработанные без ошибок]
+
+    def check_stop() -> None:
+        # Ctrl-C ловит главный поток; профиль прерывается так же, как прервался бы
+        # в одиночку, — незаконченные страницы останутся для --resume
+        if shared.stop.is_set():
+            raise KeyboardInterrupt
+
+    def submit(key, urls: list[str]) -> None:
+        """Ставит статьи страницы в загрузку; уже сохранённые (без --refresh) — сразу готовы."""
+        entry = open_pages[key] = [0, []]
+        for url in urls:
+            known = index.known(url)
+            if known and not refresh:
+                metrics.log_bulk(logging.info, f"{profile.name}.known", "Already saved, skipping", [url])
+                metrics.skip("known", profile=profile.name)
+                stats["known"] += 1
+                entry[1].append(url)
                 continue
-            processed_article_urls.add(url)
-            logging.info(f"Fetching article: {url}")
-            rr = session.get(url)
-            logging.info(f"GET {url} -> {rr.status_code}, {len(rr.text)} bytes")
-            ss = BeautifulSoup(rr.text, 'html.parser')
-            # metadata
-            headline_meta = ss.find('meta', {'itemprop':'headline'})
-            if headline_meta and headline_meta.get('content'):
-                title = headline_meta['content'].strip()
+            headers = index.validators(url) if known else None
+            logging.debug(f"Fetching article: {url}")
+            fetching.append((key, url, known, pool.submit(fetch_article, fetcher, url, headers)))
+            entry[0] += 1
+
+    def dispatch() -> None:
+        """Загруженные статьи по порядку уходят в разбор, пока есть место в окне."""
+        while fetching and len(parsing) < window:
+            key, url, known, fut = fetching.popleft()
+            rr = None
+            try:
+                rr, elapsed = fut.result()
+                profiling.record("fetch.article", elapsed)
+                profiling.add_bytes(bytes_in=len(rr.content))
+                metrics.observe("fetch", elapsed, kind="article")
+                metrics.add_bytes(len(rr.content))
+                logging.info(f"GET {url} -> {rr.status_code}, {len(rr.content)} bytes")
+                if known and rr.status_code == 304:
+                    outcome = None
+                else:
+                    rr.raise_for_status()
+                    # время разбора меряется там, где он идёт (metrics.timed), и
+                    # в метрики попадает уже здесь
+                    if ppool is not None:
+                        outcome = functools.partial(profiling.result, profiling.submit(
+                            ppool, url, metrics.timed, parse_response, rr.content, rr.encoding, url, profile.spec))
+                    else:
+                        outcome = functools.partial(metrics.timed, parse_response, rr.content, rr.encoding,
+                                                    url, profile.spec)
+            except Exception as e:
+                outcome = e
+            parsing.append((key, url, known, rr, outcome))
+
+    def complete() -> None:
+        """Забирает самую раннюю статью из разбора и сохраняет её."""
+        key, url, known, rr, outcome = parsing.popleft()
+        entry = open_pages[key]
+        entry[0] -= 1
+        try:
+            if isinstance(outcome, Exception):
+                raise outcome
+            if outcome is None:
+                index.touch(url)
+                stats["not_modified"] += 1
+                metrics.skip("not_modified", profile=profile.name)
             else:
-                # fallback to visible headline
-                title_elem = ss.select_one('h1.publication__title') or ss.find('h1') or ss.find('meta', {'property':'og:title'})
-                title = (title_elem.get_text(strip=True) 
-                         if hasattr(title_elem, 'get_text') 
-                         else title_elem.get('content', '').strip())
-                logging.warning(f"Fallback title used on {url}: {title}")
-
-            date_meta = ss.find('meta', {'itemprop':'datePublished'})
-            date = date_meta.get('datetime', '').strip() if date_meta else ''
-            if not date:
-                date = ss.select_one('span.date').get_text(strip=True) if ss.select_one('span.date') else ""
-
-            img_meta = ss.find('meta', {'itemprop':'image'})
-            image = img_meta.get('content', '').strip() if img_meta else ''
-            if not image and ss.select_one('div.detailimage img'):
-                image = ss.select_one('div.detailimage img')['src']
-
-            # Extract additional metadata
-            tags = [t.get_text(strip=True).lstrip('#') for t in ss.select('div.publication-tags__item')] or None
-            section_elem = ss.select_one('div.period-wrapper .section_name a')
-            section = section_elem.get_text(strip=True) if section_elem else None
-            author_elem = ss.select_one('.publication__author-bold-text')
-            author = author_elem.get_text(strip=True) if author_elem else None
-            author_pos_elem = ss.select_one('.publication__position')
-            author_position = author_pos_elem.get_text(strip=True) if author_pos_elem else None
-
-            # content div
-            content_div = ss.select_one('div.detail.blog .content') or ss.select_one('div.detail.blog')
-            # remove image tags from content
-            if content_div:
-                for img in content_div.find_all('img'):
-                    img.decompose()
-            html_body = content_div.decode_contents() if content_div else ''
-            markdown = md(html_body)
-            # normalize and sanitize
-            url = normalize_url(url)
-            if '/upravlenie-nashey-firmoy-unf/' not in url:
-                continue
-            body_md = markdown
-            safe_slug = sanitize(title)
-            subcat = tags[0] if tags else ""
-            save_md(Path(OUTPUT_DIR), safe_slug, title, date, url, body_md, subcat)
+                if ppool is None:
+                    with profiling.document(url):
+                        article, took = outcome()
+                else:
+                    article, took = outcome()
+                metrics.observe("parse", took)
+                name = save_md(sink, sanitize(article.title), profile.front(article, url),
+                               article.body_md, overwrite=bool(known))
+                # заголовок поменялся — старый документ больше не нужен
+                if known and known != name:
+                    sink.delete(known)
+                index.record(url, name, rr)
+                stats["updated" if known else "saved"] += 1
+                metrics.count("pages", profile=profile.name)
+            entry[1].append(url)
         except Exception as e:
             logging.error(f"Error processing {url}: {e}")
-    page += 1
+            metrics.failure(e, profile=profile.name)
+            state.article_failed(url, f"{type(e).__name__}: {e}")
+            stats["failed"] += 1
+
+    def finish(key) -> list[str]:
+        """Дорабатывает статьи страницы (и всех до неё); возвращает обработанные без ошибок."""
+        while open_pages[key][0] > 0:
+            check_stop()
+            dispatch()
+            complete()
+        # индекс и состояние не должны ссылаться на документы, которых ещё нет на диске
+        sink.flush()
+        index.save()
+        return open_pages.pop(key)[1]
+
+    try:
+        try:
+            resumed = state.begin(profile.start_url, resume=resume or retry_failed)
+        except ValueError as e:
+            logging.error(f"Cannot resume: {e}")
+            return
+        if retry_failed:
+            failed = state.articles("failed")
+            logging.info(f"Retrying {len(failed)} failed articles")
+            submit("retry", failed)
+            state.articles_done(finish("retry"))
+            return
+
+        # Track processed pages and articles
+        prev_posts = None
+        processed_page_urls = set()
+        processed_article_urls = set()
+        page = 1
+        leftover = []
+        if resumed:
+            last = state.last_page()
+            if last:
+                page, prev_posts = last[0] + 1, last[1]
+            processed_page_urls = state.pages("done")
+            processed_article_urls = set(state.articles("done")) | set(state.articles("failed"))
+            # статьи, найденные, но не дописанные до остановки
+            leftover = state.articles("pending")
+            logging.info(f"Resuming from page {page}: {len(processed_article_urls)} articles done, "
+                         f"{len(leftover)} pending")
+            processed_article_urls.update(leftover)
+
+        pages = None
+        if sitemap:
+            sitemap_url = (sitemap if sitemap != "auto"
+                           else requests.compat.urljoin(profile.start_url, "/sitemap.xml"))
+            try:
+                found = read_sitemap(fetcher, sitemap_url, profile, processed_page_urls)
+            except Exception as e:
+                found = []
+                logging.warning(f"Sitemap {sitemap_url} unavailable ({e}), falling back to pagination")
+            if found:
+                logging.info(f"Sitemap {sitemap_url}: {sum(len(p[2] or ()) for p in found)} articles")
+                pages = (p for p in found)
+        if pages is None:
+            pages = listing_pages(fetcher, profile, page, prev_posts, shared.prefetch)
+        # список страниц забегает вперёд в своём потоке, очередь не даёт ему убежать далеко
+        listing_queue = queue.Queue(maxsize=shared.prefetch)
+        threading.Thread(target=_produce, args=(pages, listing_queue, stop),
+                         name=f"{profile.name}.listing", daemon=True).start()
+
+        if leftover:
+            submit("leftover", leftover)
+            state.articles_done(finish("leftover"))
+        all_pages = True
+        current = None          # страница, чьи статьи ещё качаются
+        while True:
+            try:
+                item = listing_queue.get(timeout=0.5)
+            except queue.Empty:
+                check_stop()
+                continue
+            if item is None:
+                break
+            if isinstance(item, BaseException):
+                raise item
+            check_stop()
+            page, page_url, links, page_article_urls = item
+            if links is None:
+                # без списка этой страницы обход неполный: --resume начнёт с неё
+                logging.error(f"Error fetching page {page_url}: {page_article_urls}")
+                state.page_failed(page_url, page, page_article_urls)
+                all_pages = False
+                continue
+            if page_url in processed_page_urls:
+                logging.info("INFO: URL страницы повторяется — выходим")
+                break
+            processed_page_urls.add(page_url)
+            todo = []
+            for url in links:
+                if url in processed_article_urls:
+                    metrics.log_bulk(logging.info, f"{profile.name}.processed", "Already processed", [url])
+                    metrics.skip("processed", profile=profile.name)
+                    continue
+                processed_article_urls.add(url)
+                # чужие разделы не скачиваем вовсе
+                if not profile.is_article(url):
+                    continue
+                todo.append(url)
+            state.add_articles(todo)
+            # статьи следующей страницы встают в загрузку раньше, чем разбирается
+            # хвост предыдущей, — пулы не простаивают на границе страниц
+            submit(page_url, todo)
+            if current:
+                state.page_done(current[0], current[1], current[2], finish(current[0]))
+            current = (page_url, page, page_article_urls)
+        if current:
+            state.page_done(current[0], current[1], current[2], finish(current[0]))
+        if all_pages:
+            state.finish()
+    finally:
+        stop.set()
+        # пулы общие — отменяются только свои загрузки
+        for *_, fut in fetching:
+            fut.cancel()
+        sink.flush()
+        index.save()
+        failures = state.failures()
+        state.close()
+        logging.info(f"Done: saved {stats['saved']}, updated {stats['updated']}, "
+                     f"not modified {stats['not_modified']}, skipped known {stats['known']}, "
+                     f"failed {stats['failed']}")
+        if failures:
+            logging.info(f"Failed articles ({len(failures)}), rerun with --retry-failed:")
+            for url, error, attempts in failures:
+                logging.info(f"  {url} [{attempts}x] {error}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,277 @@
+# its_browser.py
+# Playwright-часть скриптов ИТС: запуск браузера с логином и ожидание
+# документа во фрейме w_metadata_doc_frame.  Разбор HTML — в its_extract.py.
+#
+# Быстрый режим (--fast): DDoS-защиту и логин человек проходит в видимом
+# браузере, после чего куки и localStorage (storage_state) переезжают в
+# headless-браузер без slow_mo.  Вместо пауз фиксированной длины страница
+# ждётся по событиям: фрейм в DOM и без loading="true" → load (или
+# networkidle) документа во фрейме → узел с текстом.  Время каждой фазы
+# возвращается в Waits — скрипты печатают его по странице, а common/metrics
+# собирает p50/p90/p99 по фазам (wait.frame, wait.load, wait.content).
+#
+# Сессия после ручного входа сохраняется в --state (куки, localStorage и
+# User-Agent) и в следующих прогонах поднимается без вопросов. Истёкшей она
+# считается, если в файле не осталось живых кук или стартовая страница
+# увела на вход / проверку браузера (needs_login) — только тогда нужен
+# человек; без терминала прогон в этом случае завершается с ошибкой.
+#
+# На контекстах обхода (не на ручном входе) включается its_routes: лишние
+# ресурсы страниц не грузятся.
+#
+# С --direct (its_direct) документы по возможности качаются без браузера —
+# с куками и User-Agent из session() и под тем же throttle-лимитом.
+#
+# Все переходы идут через throttle(url): при нескольких страницах
+# (its_pool, --workers) он держит общий на хост лимит стартов в секунду.
+
+from __future__ import annotations
+import contextlib
+import json
+import os
+import sys
+import time
+import urllib.parse
+from pathlib import Path
+
+from playwright.sync_api import TimeoutError as PlaywrightTimeout
+
+from common import metrics, profiling
+from common.fetch import HostLimiter
+import its_routes
+
+ITS_URL = "https://its.1c.ru/"
+FRAME_NAME = "w_metadata_doc_frame"
+FRAME_SEL = f'iframe[name="{FRAME_NAME}"]'
+CONTENT_SEL = "div.doc-content, div#content, h1, h2, h3, p"
+STATE_FILE = ".its_state.json"
+LOGIN_HOSTS = ("login.1c.ru", "login.1c.eu")
+LOGIN_TEXT = "ddos|captcha|checking your browser|проверка браузера"
+# форма входа или страница DDoS-защиты вместо ИТС
+_LOGIN_JS = """() => !!document.querySelector('input[type="password"]')
+    || /%s/i.test(
+           document.title + ' ' + (document.body ? document.body.innerText.slice(0, 500) : ''))""" % LOGIN_TEXT
+# фрейм в DOM сразу, но пока JS оболочки его грузит — loading="true" и hidden
+_FRAME_READY_JS = """sel => {
+    const e = document.querySelector(sel);
+    return !!e && !e.hidden && e.getAttribute('loading') !== 'true';
+}"""
+
+
+def add_cli_arguments(parser) -> None:
+    parser.add_argument("--fast", action="store_true",
+                        help="headless без slow_mo, ожидание по событиям вместо пауз "
+                             "(логин — в видимом окне, затем сессия переносится в headless)")
+    parser.add_argument("--ready", choices=("load", "networkidle"), default="load",
+                        help="чего ждать от документа во фрейме в --fast: load (по умолчанию) или "
+                             "networkidle (+0,5 с тишины в сети на страницу)")
+    parser.add_argument("--base-url", default=ITS_URL.rstrip("/"),
+                        help="адрес ИТС (локальная заглушка — benchmarks/mock_its.py)")
+    parser.add_argument("--no-login", action="store_true",
+                        help="не ждать ручного прохождения защиты/логина (заглушка, открытые базы)")
+    parser.add_argument("--state", default=STATE_FILE,
+                        help=f"файл сохранённой сессии ИТС (по умолчанию {STATE_FILE}); пока она жива, вход не нужен")
+    parser.add_argument("--relogin", action="store_true", help="не брать сохранённую сессию, войти заново")
+
+
+# ───────────────────────────  лимит переходов на хост
+_limiter: HostLimiter | None = None
+
+
+def set_rate_limit(rate: float, max_concurrent: int = 1) -> None:
+    """Не больше rate переходов в секунду и max_concurrent одновременно на хост; rate <= 0 — без паузы."""
+    global _limiter
+    _limiter = HostLimiter(max_concurrent, 1.0 / rate if rate > 0 else 0.0)
+
+
+def throttle(url: str):
+    return _limiter.slot(url) if _limiter is not None else contextlib.nullcontext()
+
+
+def limiter() -> HostLimiter | None:
+    """Тот же лимит для запросов мимо браузера (its_direct)."""
+    return _limiter
+
+
+class Waits:
+    """Сколько страница ждала, по фазам (секунды)."""
+    __slots__ = ("phases",)
+
+    def __init__(self):
+        self.phases: dict[str, float] = {}
+
+    def measure(self, phase: str):
+        return _Phase(self, phase)
+
+    @property
+    def total(self) -> float:
+        return sum(self.phases.values())
+
+    def __str__(self) -> str:
+        parts = ", ".join(f"{k} {v * 1000:.0f}" for k, v in self.phases.items())
+        return f"ожидание {self.total * 1000:.0f} мс ({parts})"
+
+
+class _Phase:
+    __slots__ = ("waits", "phase", "t0")
+
+    def __init__(self, waits: Waits, phase: str):
+        self.waits, self.phase = waits, phase
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        took = time.perf_counter() - self.t0
+        self.waits.phases[self.phase] = self.waits.phases.get(self.phase, 0.0) + took
+        metrics.observe(f"wait.{self.phase}", took)
+        profiling.record(f"wait.{self.phase}", took)
+        return False
+
+
+# ───────────────────────────  сохранённая сессия
+def load_session(path) -> dict | None:
+    """Аргументы new_context() из файла сессии; None — файла нет или все куки в нём истекли."""
+    try:
+        data = json.loads(Path(path).read_text(encoding="utf-8"))
+        cookies = data["storage_state"].get("cookies", [])
+    except (OSError, ValueError, KeyError, AttributeError):
+        return None
+    now = time.time()
+    # expires == -1 — сессионная кука, срок по ней не виден
+    if cookies and not any(c.get("expires", -1) < 0 or c["expires"] > now for c in cookies):
+        return None
+    return data
+
+
+def save_session(state: dict, path) -> None:
+    """Пишет session() атомарно и только для владельца: в файле — куки входа."""
+    if not path:
+        return
+    path = Path(path)
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(json.dumps(state, ensure_ascii=False), encoding="utf-8")
+    os.chmod(tmp, 0o600)
+    os.replace(tmp, path)
+
+
+def login_url(url: str) -> bool:
+    host = (urllib.parse.urlsplit(url).hostname or "").lower()
+    return any(host == h or host.endswith("." + h) for h in LOGIN_HOSTS)
+
+
+def needs_login(page) -> bool:
+    """Вместо ИТС открылся вход или проверка браузера — сессия не годится."""
+    if login_url(page.url):
+        return True
+    try:
+        return bool(page.evaluate(_LOGIN_JS))
+    except Exception:
+        return True
+
+
+# ───────────────────────────  запуск и логин
+def launch(p, fast: bool = False, slow_mo: int = 100, start_url: str = ITS_URL,
+           prompt: str = "⏳ Пройди защиту DDoS и нажми Enter...", login: bool = True,
+           state_path: str | None = None, relogin: bool = False):
+    """
+    (browser, context, page) с рабочей сессией ИТС. Сначала пробуется
+    сохранённая в state_path; если её нет или она истекла — ручное
+    прохождение DDoS-защиты/логина (relogin — сразу его), после которого
+    сессия сохраняется.
+    Обычный режим — как раньше: видимый браузер с slow_mo. В быстром окно
+    нужно только на время логина.
+    """
+    headless, slow = (True, 0) if fast else (False, slow_mo)
+    if login and state_path and not relogin and (saved := load_session(state_path)) is not None:
+        browser = p.chromium.launch(headless=headless, slow_mo=slow)
+        context = browser.new_context(**saved)
+        its_routes.install(context)
+        page = context.new_page()
+        page.goto(start_url, wait_until="domcontentloaded")
+        if not needs_login(page):
+            print(f"🔑 Сессия из {state_path}")
+            return browser, context, page
+        print(f"🔑 Сессия из {state_path} истекла — нужен вход заново")
+        browser.close()
+
+    if login and not sys.stdin.isatty():
+        raise SystemExit(f"❌ Нужен ручной вход на ИТС, а терминала нет: запустите скрипт один раз "
+                         f"в терминале — сессия сохранится в {state_path or STATE_FILE}")
+
+    if not fast or not login:
+        browser = p.chromium.launch(headless=headless, slow_mo=slow)
+        context = browser.new_context()
+        page = context.new_page()
+        page.goto(start_url)
+        if login:
+            input(prompt)
+            save_session(session(context, page), state_path)
+        its_routes.install(context)
+        return browser, context, page
+
+    login_browser = p.chromium.launch(headless=False)
+    login_context = login_browser.new_context()
+    login_page = login_context.new_page()
+    login_page.goto(start_url)
+    input(prompt)
+    # защита может смотреть на User-Agent: у headless в нём «HeadlessChrome»
+    state = session(login_context, login_page)
+    save_session(state, state_path)
+    login_browser.close()
+
+    browser = p.chromium.launch(headless=True)
+    context = browser.new_context(**state)
+    its_routes.install(context)
+    page = context.new_page()
+    return browser, context, page
+
+
+def session(context, page) -> dict:
+    """Аргументы new_context() для ещё одной страницы в той же сессии (its_pool, --state)."""
+    return {"storage_state": context.storage_state(),
+            "user_agent": page.evaluate("navigator.userAgent")}
+
+
+# ───────────────────────────  ожидание документа
+def wait_doc_frame(page, timeout: float = 15_000, waits: Waits | None = None):
+    """Фрейм документа, как только JS оболочки снял с него loading; None — не дождались."""
+    waits = waits or Waits()
+    with waits.measure("frame"):
+        try:
+            page.wait_for_selector(FRAME_SEL, state="attached", timeout=timeout)
+            # polling="mutation": проверка на каждое изменение DOM, а не по таймеру
+            page.wait_for_function(_FRAME_READY_JS, arg=FRAME_SEL, polling="mutation", timeout=timeout)
+        except PlaywrightTimeout:
+            return None
+    return page.frame(name=FRAME_NAME)
+
+
+def wait_content(frame, ready: str = "load", timeout: float = 10_000, waits: Waits | None = None) -> bool:
+    """Документ во фрейме загружен и в нём есть узел с текстом; False — не дождались (текст всё равно пробуют взять)."""
+    waits = waits or Waits()
+    try:
+        with waits.measure(ready):
+            frame.wait_for_load_state(ready, timeout=timeout)
+        with waits.measure("content"):
+            frame.wait_for_selector(CONTENT_SEL, state="attached", timeout=timeout)
+        return True
+    except PlaywrightTimeout:
+        return False
+
+
+def goto_doc(page, url: str, ready: str = "load", timeout: float = 30_000):
+    """
+    Быстрый переход к документу: goto до domcontentloaded, затем ожидание по
+    событиям. Возвращает (фрейм или None, Waits); при None вызывающий решает,
+    брать ли текст со страницы целиком.
+    """
+    waits = Waits()
+    with throttle(url), its_routes.document(page, url):
+        with profiling.stage("navigate"), metrics.stage("fetch"):
+            page.goto(url, timeout=timeout, wait_until="domcontentloaded")
+        frame = wait_doc_frame(page, timeout=min(timeout, 15_000), waits=waits)
+        if frame is not None:
+            wait_content(frame, ready, waits=waits)
+    return frame, waits
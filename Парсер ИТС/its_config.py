@@ -0,0 +1,70 @@
+# its_config.py
+# Параметры книги для скриптов ИТС: из командной строки или YAML-файла
+# (--config), чтобы прогон по расписанию шёл без вопросов в консоли.
+#
+#     # nightly/unfdoc.yaml — ключи те же, что у опций (out_dir или out-dir)
+#     book: unfdoc
+#     out_dir: data/unfdoc/md
+#     category: Книги
+#     section: УНФ
+#     fast: true
+#     workers: 4
+#
+# Опция в командной строке важнее файла. Если обязательного значения нет
+# нигде, в терминале оно спрашивается, как раньше; без терминала (cron,
+# systemd) — ошибка вместо зависшего input().
+
+from __future__ import annotations
+import argparse
+import sys
+from pathlib import Path
+
+import yaml
+
+
+def add_book_arguments(parser, root_nav_id: bool = False) -> None:
+    parser.add_argument("--config", help="YAML с параметрами прогона (ключи — имена опций)")
+    parser.add_argument("--book", help="код базы: unfdoc / pubchaos2order / metod81 / …")
+    parser.add_argument("--out-dir", help="куда сохранять документы")
+    parser.add_argument("--category", help="category во front-matter")
+    parser.add_argument("--section", help="section_1c во front-matter")
+    if root_nav_id:
+        parser.add_argument("--root-nav-id", default="2503",
+                            help="для metod81: ветка nav_<id> (по умолчанию «Рабочее место кассира…»)")
+
+
+def load_config(parser, path: str) -> dict:
+    try:
+        data = yaml.safe_load(Path(path).read_text(encoding="utf-8")) or {}
+    except (OSError, yaml.YAMLError) as e:
+        parser.error(f"--config {path}: {e}")
+    if not isinstance(data, dict):
+        parser.error(f"--config {path}: ожидается YAML-словарь «опция: значение»")
+    known = {a.dest for a in parser._actions}
+    values = {}
+    for key, value in data.items():
+        dest = str(key).replace("-", "_")
+        if dest not in known or dest in ("help", "config"):
+            parser.error(f"--config {path}: неизвестный ключ {key!r}")
+        values[dest] = value
+    return values
+
+
+def parse_args(parser, argv=None):
+    """parse_args() с умолчаниями из --config."""
+    pre = argparse.ArgumentParser(add_help=False)
+    pre.add_argument("--config")
+    known, _ = pre.parse_known_args(argv)
+    if known.config:
+        parser.set_defaults(**load_config(parser, known.config))
+    return parser.parse_args(argv)
+
+
+def require(parser, args, prompts: dict[str, str]) -> None:
+    """Недостающие обязательные значения: спросить в терминале или завершиться с ошибкой."""
+    for dest, prompt in prompts.items():
+        if getattr(args, dest, None) not in (None, ""):
+            continue
+        if not sys.stdin.isatty():
+            parser.error(f"не задан --{dest.replace('_', '-')} (или {dest}: в --config)")
+        setattr(args, dest, input(prompt).strip())
@@ -0,0 +1,266 @@
+# its_direct.py
+# Документы ИТС без отрисовки (--direct). Оболочка /db/<BOOK>/content/<id>/hdoc
+# только подставляет во фрейм w_metadata_doc_frame адрес документа, а сам он
+# отдаётся обычным GET с куками сессии. Как этот адрес строится из ссылки,
+# узнаётся по отрисованной странице: до обхода — по первой ссылке (probe),
+# а без шаблона — по первой странице книги, ушедшей в браузер. Заменяется
+# шаблон, только если по нему документ не нашёлся (404 или не HTML).
+#
+# Дальше документы качают потоки its_pool без браузера (--direct-workers)
+# через common.fetch: keep-alive, повторы, Referer оболочки, тот же лимит
+# --rate, что и у переходов (its_browser.limiter). Заодно качают и страницы —
+# браузер им нужен только на случай отказа.
+#
+# В браузер уходят: ссылки, для книги которых шаблона нет; ответы не 200 или
+# не HTML; вход или проверка браузера вместо документа; документ с
+# вложенным фреймом или без текста (его дорисовывает JS). Поток без браузера
+# отдаёт такую ссылку страницам (its_pool.NeedsBrowser).
+
+from __future__ import annotations
+import re
+import sys
+import threading
+import time
+import urllib.parse
+
+import requests
+from bs4 import BeautifulSoup
+
+from common import metrics, profiling
+from common.fetch import Fetcher, make_session
+import its_browser
+from its_pool import NeedsBrowser
+
+DIRECT_WORKERS = 8
+# /db/<BOOK>/content/<ключ>[/hdoc]
+_CONTENT_RE = re.compile(r"/db/([^/]+)/content/(.+?)(?:/hdoc)?/?$")
+_CHARSET_RE = re.compile(rb"""<meta[^>]+charset=["']?([\w-]+)""", re.I)
+_LOGIN_RE = re.compile(its_browser.LOGIN_TEXT, re.I)
+
+
+def add_cli_arguments(parser) -> None:
+    parser.add_argument("--direct", action="store_true",
+                        help="документы качать напрямую по адресу фрейма (GET с куками сессии), "
+                             "в браузере — только те, которым нужен JS")
+    parser.add_argument("--direct-workers", type=int, default=DIRECT_WORKERS,
+                        help=f"сколько документов в --direct качается параллельно (по умолчанию {DIRECT_WORKERS}); "
+                             "--rate у них общий с переходами страниц")
+
+
+def content_key(url: str) -> tuple[str, str] | None:
+    """(книга, ключ документа) ссылки /db/<BOOK>/content/…; None — ссылка не на документ."""
+    m = _CONTENT_RE.search(urllib.parse.urlsplit(url).path)
+    return (m.group(1), m.group(2)) if m else None
+
+
+def needs_browser(html: str) -> str | None:
+    """Почему скачанный документ нельзя взять как есть; None — можно."""
+    soup = BeautifulSoup(html, "html.parser")
+    head = (soup.title.get_text() if soup.title else "") + " " + (soup.body.get_text(" ")[:500] if soup.body else "")
+    if soup.find("input", attrs={"type": "password"}) or _LOGIN_RE.search(head):
+        return "вход или проверка браузера"
+    if soup.find(["iframe", "frame"]):
+        return "вложенный фрейм"
+    div = soup.select_one("div.doc-content, div#content") or soup.body
+    if div is None:
+        return "нет body"
+    for tag in div(["script", "noscript", "style", "template"]):
+        tag.decompose()
+    if not div.get_text(strip=True):
+        return "текст дорисовывает JS"
+    return None
+
+
+def _decode(response: requests.Response) -> str:
+    m = re.search(r"charset=([\w-]+)", response.headers.get("content-type", ""), re.I)
+    if m is None:
+        m = _CHARSET_RE.search(response.content[:2048])
+    charset = m.group(1) if m else "utf-8"
+    charset = charset.decode("ascii") if isinstance(charset, bytes) else charset
+    try:
+        return response.content.decode(charset, errors="replace")
+    except LookupError:
+        return response.content.decode("utf-8", errors="replace")
+
+
+class Doc:
+    """Скачанный документ вместо фрейма: url и content(), как у Frame."""
+    __slots__ = ("url", "html")
+
+    def __init__(self, url: str, html: str):
+        self.url, self.html = url, html
+
+    def content(self) -> str:
+        return self.html
+
+
+class Direct:
+    def __init__(self, session: dict, workers: int = DIRECT_WORKERS,
+                 timeout: tuple[float, float] = (5.0, 30.0), retries: int = 2):
+        self.workers = max(1, workers)
+        ua = session.get("user_agent")
+        self.http = make_session(self.workers * 2, {"User-Agent": ua} if ua else None)
+        for c in session.get("storage_state", {}).get("cookies", []):
+            self.http.cookies.set(c["name"], c["value"], domain=c.get("domain", ""), path=c.get("path", "/"))
+        self.fetcher = Fetcher(self.http, its_browser.limiter(), timeout=timeout, retries=retries)
+        self._lock = threading.Lock()
+        # книга → (схема://хост, путь до ключа документа, остаток пути с ?запросом)
+        self._templates: dict[str, tuple[str, str, str]] = {}
+        self._disagreed: set[str] = set()
+        # ушедшие в браузер ссылки → не нашёлся ли по шаблону сам документ
+        self._to_browser: dict[str, bool] = {}
+        self.fetched = 0
+        self.fallbacks: dict[str, int] = {}
+
+    # ----- шаблон адреса фрейма
+    def learn(self, url: str, src: str, replace: bool = False) -> bool:
+        """
+        Запомнить, как ссылка url превратилась в адрес фрейма src. Ключ
+        документа подставляется в одно место — последнее его вхождение в
+        путь, запрос остаётся как есть. Уже известный шаблон книги меняется
+        только с replace (по нему этот документ не нашёлся).
+        """
+        key = content_key(url)
+        parts = urllib.parse.urlsplit(src)
+        if key is None or not parts.scheme or content_key(src) == key:     # во фрейме сама оболочка
+            return False
+        book, doc = key
+        hits = list(re.finditer(rf"(?<![\w%]){re.escape(doc)}(?![\w%])", parts.path))
+        if not hits:
+            return False
+        at = hits[-1]
+        template = (f"{parts.scheme}://{parts.netloc}", parts.path[:at.start()],
+                    parts.path[at.end():] + (f"?{parts.query}" if parts.query else ""))
+        with self._lock:
+            old = self._templates.get(book)
+            if old == template:
+                return True
+            keep = old is not None and not replace
+            if keep:
+                first = book not in self._disagreed
+                self._disagreed.add(book)
+            else:
+                self._templates[book] = template
+        if keep:
+            if first:                            # разовый документ не должен увести всю книгу
+                print(f"🧩 Документы {book}: фрейм {src} не по шаблону — шаблон прежний")
+            return False
+        print(f"🧩 Документы {book} — напрямую: {template[1]}{{ключ}}{template[2]} "
+              f"({'шаблон изменился' if old else 'по ' + url})")
+        return True
+
+    def resolve(self, url: str) -> str | None:
+        key = content_key(url)
+        if key is None:
+            return None
+        with self._lock:
+            template = self._templates.get(key[0])
+        if template is None:
+            return None
+        origin, head, tail = template
+        return origin + head + key[1] + tail
+
+    def probe(self, page, url: str, ready: str = "load") -> bool:
+        """Шаблон по одной отрисованной ссылке, до обхода."""
+        frame, _ = its_browser.goto_doc(page, url, ready)
+        return frame is not None and self.learn(url, frame.url)
+
+    # ----- документ
+    def _fallback(self, url: str, why: str, stale: bool = False) -> None:
+        with self._lock:
+            self.fallbacks[why] = self.fallbacks.get(why, 0) + 1
+            self._to_browser[url] = stale
+        metrics.count("direct_fallbacks", reason=why)
+        print(f"      ↩️  в браузер ({why}): {url}")
+        return None
+
+    def fetch(self, url: str) -> Doc | None:
+        """Документ без браузера; None — ему нужна страница."""
+        src = self.resolve(url)
+        if src is None:
+            return self._fallback(url, "нет шаблона")
+        t0 = time.perf_counter()
+        try:
+            with profiling.stage("fetch.direct"), metrics.stage("fetch.direct"):
+                r = self.fetcher.get(src, headers={"Referer": url}, kind="doc")
+        except requests.RequestException as e:
+            metrics.failure(e)
+            return self._fallback(url, metrics.reason(e))
+        if its_browser.login_url(r.url):
+            return self._fallback(url, "вход или проверка браузера")
+        # 404 и не-HTML — шаблон для этого документа не годится
+        if r.status_code != 200:
+            return self._fallback(url, f"HTTP {r.status_code}", stale=r.status_code == 404)
+        if "html" not in r.headers.get("content-type", "html"):
+            return self._fallback(url, r.headers["content-type"].split(";")[0], stale=True)
+        html = _decode(r)
+        why = needs_browser(html)
+        if why is not None:
+            return self._fallback(url, why)
+        with self._lock:
+            self.fetched += 1
+        metrics.count("direct_docs")
+        print(f"      ⚡ напрямую за {time.perf_counter() - t0:.2f} с")
+        return Doc(r.url, html)
+
+    def document(self, page, url: str, goto):
+        """
+        Документ по ссылке обхода: Doc, а если нельзя — goto(page, url) в
+        браузере (по отрисованной странице уточняется шаблон). Без страницы
+        (поток its_pool без браузера) — NeedsBrowser.
+        """
+        with self._lock:
+            stale = self._to_browser.pop(url, None)
+        if stale is None:
+            if (doc := self.fetch(url)) is not None:
+                return doc
+            with self._lock:
+                stale = self._to_browser.pop(url)
+        if page is None:
+            with self._lock:                     # странице не качать его заново
+                self._to_browser[url] = stale
+            raise NeedsBrowser(url)
+        node = goto(page, url)
+        frame = page.frame(name=its_browser.FRAME_NAME)
+        if frame is not None:
+            self.learn(url, frame.url, replace=stale)
+        return node
+
+    def summary(self) -> list[str]:
+        with self._lock:
+            browser = sum(self.fallbacks.values())
+            why = ", ".join(f"{k} {v}" for k, v in sorted(self.fallbacks.items(), key=lambda kv: -kv[1]))
+            lines = [f"⚡ Напрямую: {self.fetched} документов, в браузер ушло {browser}" + (f" ({why})" if why else "")]
+        return lines + [f"   {line}" for line in self.fetcher.latency.log_lines()]
+
+
+# ───────────────────────────  один на процесс
+_direct: Direct | None = None
+
+
+def start(args, session: dict | None, page, first_url: str | None) -> Direct | None:
+    """--direct: клиент с сессией браузера и шаблон по first_url; не вышло — обход, как раньше, через браузер."""
+    global _direct
+    _direct = None
+    if not args.direct:
+        return None
+    direct = Direct(session or {}, args.direct_workers)
+    if first_url is None or not direct.probe(page, first_url, args.ready):
+        print("⚠️  Адрес документа во фрейме не вывести — --direct выключен, всё через браузер")
+        return None
+    _direct = direct
+    return _direct
+
+
+def fetchers() -> int:
+    """Сколько потоков без браузера дать its_pool.run."""
+    return _direct.workers if _direct is not None else 0
+
+
+def document(page, url: str, goto):
+    return _direct.document(page, url, goto) if _direct is not None else goto(page, url)
+
+
+def print_summary() -> None:
+    if _direct is not None:
+        print("\n".join(_direct.summary()), file=sys.stderr)
@@ -0,0 +1,100 @@
+# its_extract.py
+# Разбор HTML документов ITS без браузера — общий для parse_ITS_metod.py,
+# parse_unf_book.py и parse_unf_book ChaosBook.py.  Здесь только чистые
+# функции над строкой HTML (iframe.content()), поэтому модуль можно
+# импортировать без Playwright — например, из benchmarks/.
+
+import re
+import urllib.parse
+from bs4 import BeautifulSoup
+
+
+def plain_text(html: str) -> str:
+    """Текст документа (вариант parse_ITS_metod.py) без служебной «шапки» доступа."""
+    soup = BeautifulSoup(html, "html.parser")
+    div  = soup.select_one("div.doc-content,#content,body") or soup
+    txt  = div.get_text("\n", strip=True)
+    # убираем служебную строку‑«шапку» типа
+    # “Общий профиль Доступ ограничен … Доступ до 14.10.2025 …”
+    txt  = re.sub(r"^Общий профиль.*?Доступ до \d{2}\.\d{2}\.\d{4}\s+", "",
+                  txt, flags=re.S)
+    return txt
+
+
+def doc_text(html: str) -> str:
+    """Текст div.doc-content / div#content (или всего body) — вариант parse_unf_book*.py."""
+    soup = BeautifulSoup(html, "html.parser")
+    div = soup.select_one("div.doc-content, div#content") or soup.body
+    return div.get_text("\n", strip=True) if div else ""
+
+
+def doc_links(html: str, base_url: str, selector: str) -> list[dict]:
+    """[{title, url}] ссылок под selector — как a.textContent / a.href во фрейме с адресом base_url."""
+    soup = BeautifulSoup(html, "html.parser")
+    return [{"title": a.get_text().strip(), "url": urllib.parse.urljoin(base_url, a.get("href") or "")}
+            for a in soup.select(selector)]
+
+
+# ───────────────────────────  разделение на h2/h3-подблоки
+def split_sections(html: str):
+    soup = BeautifulSoup(html, "html.parser")
+    cur, buf, out = None, [], []
+    is_hdr = lambda n: n.name in ("h2","h3")
+    for n in soup.find_all(["h2","h3","p"]):
+        if is_hdr(n):
+            if cur and buf:
+                out.append((cur, "\n".join(buf).strip()))
+                buf=[]
+            cur = n.get_text(" ", strip=True)
+        else:
+            txt=n.get_text(" ", strip=True)
+            if txt: buf.append(txt)
+    if cur and buf: out.append((cur, "\n".join(buf).strip()))
+    return out
+
+
+def split_into_sections(html: str, verbose: bool = False) -> list[tuple[str, str]]:
+    """
+    Разбивает HTML главы на под‑блоки по заголовкам <h2>/<h3>
+    (а также <strong>/<b> и «жирным» абзацам).
+    Возвращает список кортежей (title, plain_text).
+    """
+    soup = BeautifulSoup(html, "html.parser")
+    if verbose:
+        print("      ↳ found headings:",
+              [h.get_text(" ", strip=True) for h in soup.find_all(['h2', 'h3', 'strong', 'b'])][:15])
+    sections: list[tuple[str, str]] = []
+
+    current_title = None
+    buffer: list[str] = []
+
+    heading_tags = ("h1", "h2", "h3", "h4", "h5", "h6", "strong", "b")
+
+    for node in soup.find_all(["h2", "h3", "strong", "b", "p"]):
+        is_heading = (
+            node.name in heading_tags
+            or (
+                node.name == "p"
+                and (
+                    "bold" in (node.get("class") or [])
+                    or "font-weight:bold" in node.get("style", "").replace(" ", "").lower()
+                    or (node.find("b") and len(node.get_text(strip=True)) <= 120)
+                )
+            )
+        )
+
+        if is_heading:
+            if current_title and buffer:
+                sections.append((current_title, "\n".join(buffer).strip()))
+                buffer = []
+            current_title = node.get_text(" ", strip=True)
+            continue
+
+        txt = node.get_text(" ", strip=True)
+        if txt:
+            buffer.append(txt)
+
+    # финальный буфер
+    if current_title and buffer:
+        sections.append((current_title, "\n".join(buffer).strip()))
+    return sections
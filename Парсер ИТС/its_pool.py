@@ -0,0 +1,162 @@
+# its_pool.py
+# Параллельный обход книги ИТС: общая очередь ссылок с дедупликацией и N
+# страниц, каждая сама делает goto → разбор → запись.
+#
+# Логин по-прежнему один: нулевой работник — страница, на которой он пройден
+# (главный поток), остальные — свои потоки со своим sync_playwright (API
+# Playwright не потокобезопасен) и контекстом из storage_state той же сессии.
+# Переходы на хост разносит its_browser.throttle — общий на все потоки лимит
+# (--rate стартов в секунду, не больше --workers одновременно).
+#
+# С --direct (its_direct) к ним добавляются потоки без браузера: документ
+# качается напрямую, а если ему нужен JS — handle бросает NeedsBrowser, и
+# ссылка уходит в отдельную очередь, которую разбирают только страницы.
+
+from __future__ import annotations
+import threading
+from collections import deque
+
+from playwright.sync_api import sync_playwright
+
+from common import metrics
+import its_routes
+
+
+def add_cli_arguments(parser) -> None:
+    parser.add_argument("--workers", type=int, default=1,
+                        help="сколько страниц обходят книгу параллельно (одна сессия на всех)")
+    parser.add_argument("--rate", type=float, default=2.0,
+                        help="не больше стольких переходов в секунду на хост, на все страницы вместе; 0 — без лимита")
+
+
+class NeedsBrowser(Exception):
+    """handle без страницы (page=None) не справился: ссылку обработает страница с браузером."""
+
+
+class Frontier:
+    """
+    Очередь обхода на все страницы. Ссылка с уже виденным ключом не ставится
+    второй раз; get() ждёт, пока очередь пуста, но кто-то ещё работает (может
+    добавить ссылок), и возвращает None, когда обход кончился или остановлен.
+    Отложенное через defer() получают только get(browser=True).
+    """
+
+    def __init__(self, items=(), key=lambda item: item["url"]):
+        self.key = key
+        self._cond = threading.Condition()
+        self._queue: deque = deque()
+        self._browser: deque = deque()
+        self._seen: set[str] = set()
+        self._active = 0
+        self._closed = False
+        for item in items:
+            self.put(item)
+
+    def put(self, item) -> bool:
+        k = self.key(item)
+        with self._cond:
+            if k in self._seen or self._closed:
+                return False
+            self._seen.add(k)
+            self._queue.append(item)
+            self._cond.notify()
+            return True
+
+    def __contains__(self, item) -> bool:
+        with self._cond:
+            return self.key(item) in self._seen
+
+    def defer(self, item) -> None:
+        """Уже взятую ссылку — в очередь страниц с браузером (вызывается до done())."""
+        with self._cond:
+            if not self._closed:
+                self._browser.append(item)
+                self._cond.notify_all()          # среди ждущих может не быть ни одной страницы
+
+    def get(self, browser: bool = True):
+        with self._cond:
+            # без браузера ждём и пока страницы разбирают отложенное: оно может дать новых ссылок
+            while (not self._ready(browser) and (self._active or (self._browser and not browser))
+                   and not self._closed):
+                self._cond.wait()
+            if self._closed or not self._ready(browser):
+                self._cond.notify_all()          # остальные тоже увидят конец
+                return None
+            self._active += 1
+            return (self._browser if browser and self._browser else self._queue).popleft()
+
+    def _ready(self, browser: bool) -> bool:
+        return bool(self._queue or (browser and self._browser))
+
+    def done(self) -> None:
+        with self._cond:
+            self._active -= 1
+            if not self._active and not self._queue and not self._browser:
+                self._cond.notify_all()
+
+    def close(self) -> None:
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def __len__(self) -> int:
+        with self._cond:
+            return len(self._queue) + len(self._browser)
+
+
+def _drain(frontier: Frontier, handle, page, name: str) -> None:
+    while (item := frontier.get(browser=page is not None)) is not None:
+        try:
+            for child in handle(page, item) or ():
+                frontier.put(child)
+        except NeedsBrowser:
+            frontier.defer(item)
+        except Exception as e:
+            metrics.failure(e)
+            print(f"⚠️  [{name}] {item.get('url')}: {e}")
+        finally:
+            frontier.done()
+
+
+def _worker(frontier: Frontier, handle, session: dict, headless: bool, slow_mo: int, name: str) -> None:
+    try:
+        with sync_playwright() as p:
+            browser = p.chromium.launch(headless=headless, slow_mo=slow_mo)
+            try:
+                context = browser.new_context(**session)
+                its_routes.install(context)
+                page = context.new_page()
+                _drain(frontier, handle, page, name)
+            finally:
+                browser.close()
+    except Exception as e:                       # браузер не поднялся — работают остальные
+        metrics.failure(e)
+        print(f"❌ [{name}] страница не запустилась: {e}")
+
+
+def run(frontier: Frontier, handle, page, workers: int = 1, session: dict | None = None,
+        headless: bool = True, slow_mo: int = 0, fetchers: int = 0) -> None:
+    """
+    Обходит frontier: handle(page, item) обрабатывает ссылку и возвращает
+    новые. page — уже залогиненная страница главного потока; для workers > 1
+    поднимается ещё workers-1 браузеров с session (its_browser.session).
+    fetchers — потоки без браузера, handle получает в них page=None.
+    Ctrl-C: очередь закрывается, страницы доделывают текущий документ.
+    """
+    threads = [threading.Thread(target=_worker, args=(frontier, handle, session or {}, headless, slow_mo, f"w{i}"),
+                                name=f"its-w{i}", daemon=True)
+               for i in range(1, max(1, workers))]
+    threads += [threading.Thread(target=_drain, args=(frontier, handle, None, f"d{i}"), name=f"its-d{i}", daemon=True)
+                for i in range(1, fetchers + 1)]
+    for t in threads:
+        t.start()
+    try:
+        _drain(frontier, handle, page, "w0")
+        for t in threads:
+            t.join()
+    except KeyboardInterrupt:
+        print("⏹ Останавливаюсь: страницы доделывают текущие документы …")
+        frontier.close()
+        for t in threads:
+            t.join()
+        raise
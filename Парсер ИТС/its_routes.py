@@ -0,0 +1,210 @@
+# its_routes.py
+# Перехват запросов страниц ИТС (context.route): скриптам нужен только HTML
+# оболочки с JS, который строит #w_metadata_toc и подставляет фрейм, и сам
+# документ во фрейме — картинки, шрифты, стили и счётчики не нужны.
+#
+# Пропускается всегда: навигация (оболочка, документы во фреймах) и всё, что
+# подходит под --allow-url. Отбрасывается: типы ресурсов из --block-types и
+# адреса под --block-url (счётчики и аналитика — даже если это скрипты).
+# Включено по умолчанию на страницах обхода; ручной вход идёт без перехвата.
+#
+# С перехватом Chromium отключает HTTP-кэш, поэтому разрешённые GET-скрипты
+# кэшируются здесь, в памяти (иначе JS оболочки качался бы на каждой странице).
+#
+# Каждый --block-sample-й документ грузится без блокировки: по нему видно,
+# сколько весят отбрасываемые адреса (Content-Length), и есть с чем сравнить
+# время загрузки. По документу печатается, сколько запросов отброшено и
+# сколько это байт; в конце — сводка и разница медиан времени загрузки.
+
+from __future__ import annotations
+import contextlib
+import re
+import sys
+import threading
+import time
+
+from common import metrics
+from common.metrics import LatencyHistogram
+
+BLOCK_TYPES = "image,media,font,stylesheet,manifest,texttrack"
+BLOCK_URLS = (r"mc\.yandex\.|yandex\.ru/(metrika|clck)|google-analytics\.com|googletagmanager\.com"
+              r"|doubleclick\.net|top-fwz1\.mail\.ru|counter\.yadro\.ru|/counters?/")
+SCRIPT_CACHE = 256                    # скриптов в памяти, на все страницы
+
+
+def add_cli_arguments(parser) -> None:
+    parser.add_argument("--no-block", action="store_true",
+                        help="грузить страницы целиком, без перехвата запросов")
+    parser.add_argument("--block-types", default=BLOCK_TYPES,
+                        help=f"какие типы ресурсов не грузить (по умолчанию {BLOCK_TYPES})")
+    parser.add_argument("--block-url", action="append", default=[], metavar="REGEX",
+                        help="не грузить и эти адреса (можно несколько; счётчики и аналитика — всегда)")
+    parser.add_argument("--allow-url", action="append", default=[], metavar="REGEX",
+                        help="эти адреса грузить всегда, даже если подходят под блокировку")
+    parser.add_argument("--block-sample", type=int, default=20, metavar="N",
+                        help="каждый N-й документ грузить целиком для сравнения (0 — никогда)")
+
+
+class _Tally:
+    """Перехват одного контекста: счётчики отброшенного по текущему документу."""
+
+    def __init__(self, blocker: "Blocker"):
+        self.blocker = blocker
+        self.active = True
+        self.blocked = 0
+        self.bytes = 0
+        self.unknown = 0
+
+    def reset(self, active: bool) -> None:
+        self.active, self.blocked, self.bytes, self.unknown = active, 0, 0, 0
+
+    def route(self, route, request) -> None:
+        b = self.blocker
+        if self.active and b.should_block(request):
+            route.abort("blockedbyclient")
+            size = b.size_of(request.url)
+            self.blocked += 1
+            if size is None:
+                self.unknown += 1
+            else:
+                self.bytes += size
+            metrics.count("blocked_requests", kind=request.resource_type)
+            return
+        if request.resource_type == "script" and request.method == "GET":
+            b.fulfill_script(route, request)
+            return
+        route.continue_()
+
+    def response(self, response) -> None:
+        try:
+            size = int(response.headers.get("content-length") or 0)
+        except ValueError:
+            return
+        if size:
+            self.blocker.learn(response.url, size)
+
+
+class Blocker:
+    def __init__(self, types: str = BLOCK_TYPES, block_url=(), allow_url=(), sample: int = 20):
+        self.types = {t.strip() for t in types.split(",") if t.strip()}
+        self.block_re = re.compile("|".join([BLOCK_URLS, *block_url]))
+        self.allow_re = re.compile("|".join(allow_url)) if allow_url else None
+        self.sample = max(0, sample)
+        self._lock = threading.Lock()
+        self._sizes: dict[str, int] = {}
+        self._scripts: dict[str, tuple[int, dict, bytes]] = {}
+        self._tallies: dict[int, _Tally] = {}
+        self.docs = 0
+        self.loads = {"blocked": LatencyHistogram(), "full": LatencyHistogram()}
+        self.total = {"requests": 0, "bytes": 0, "unknown": 0}
+
+    def should_block(self, request) -> bool:
+        if request.is_navigation_request():
+            return False
+        url = request.url
+        if self.allow_re is not None and self.allow_re.search(url):
+            return False
+        return request.resource_type in self.types or bool(self.block_re.search(url))
+
+    def size_of(self, url: str) -> int | None:
+        with self._lock:
+            return self._sizes.get(url)
+
+    def learn(self, url: str, size: int) -> None:
+        with self._lock:
+            self._sizes[url] = size
+
+    def fulfill_script(self, route, request) -> None:
+        with self._lock:
+            cached = self._scripts.get(request.url)
+        if cached is not None:
+            status, headers, body = cached
+            route.fulfill(status=status, headers=headers, body=body)
+            return
+        try:
+            response = route.fetch()
+        except Exception:                            # сеть — пусть браузер попробует сам
+            route.continue_()
+            return
+        headers = response.headers
+        body = response.body()
+        if response.status == 200 and "no-store" not in headers.get("cache-control", ""):
+            with self._lock:
+                if len(self._scripts) >= SCRIPT_CACHE:
+                    self._scripts.pop(next(iter(self._scripts)))
+                self._scripts[request.url] = (response.status, headers, body)
+        route.fulfill(response=response, body=body)
+
+    def install(self, context) -> None:
+        tally = _Tally(self)
+        context.route("**/*", tally.route)
+        context.on("response", tally.response)
+        with self._lock:
+            self._tallies[id(context)] = tally
+
+    @contextlib.contextmanager
+    def document(self, page, url: str):
+        """Загрузка одного документа: счётчики отброшенного, время и строка в консоль."""
+        tally = self._tallies.get(id(page.context))
+        if tally is None:
+            yield
+            return
+        with self._lock:
+            full = bool(self.sample) and self.docs % self.sample == 0
+            self.docs += 1
+        tally.reset(active=not full)
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            took = time.perf_counter() - t0
+            blocked, size, unknown = tally.blocked, tally.bytes, tally.unknown
+            tally.reset(active=True)
+        kind = "full" if full else "blocked"
+        metrics.observe(f"load.{kind}", took)
+        metrics.count("blocked_bytes", size)
+        with self._lock:
+            self.loads[kind].add(took * 1000)
+            self.total["requests"] += blocked
+            self.total["bytes"] += size
+            self.total["unknown"] += unknown
+        if full:
+            print(f"      🧪 без блокировки (для сравнения): {took:.2f} с")
+        elif blocked:
+            rest = f", ещё {unknown} неизвестного размера" if unknown else ""
+            print(f"      🚫 не загружено {blocked} запр., ≈{size / 1024:.0f} КБ{rest}; документ за {took:.2f} с")
+
+    def summary(self) -> str:
+        t, full, blocked = self.total, self.loads["full"], self.loads["blocked"]
+        line = (f"🚫 Перехват: не загружено {t['requests']} запросов, ≈{t['bytes'] / 1e6:.1f} МБ"
+                + (f" (+{t['unknown']} неизвестного размера)" if t["unknown"] else ""))
+        if full.count and blocked.count:
+            p_full, p_blocked = full.percentile(50), blocked.percentile(50)
+            line += (f"; медиана загрузки документа {p_blocked / 1000:.2f} с против {p_full / 1000:.2f} с "
+                     f"без блокировки ({(p_blocked - p_full) / 1000:+.2f} с, ×{full.count} для сравнения)")
+        return line
+
+
+# ───────────────────────────  один перехватчик на процесс
+_blocker: Blocker | None = None
+
+
+def configure(args) -> Blocker | None:
+    global _blocker
+    _blocker = None if args.no_block else Blocker(args.block_types, args.block_url, args.allow_url,
+                                                   args.block_sample)
+    return _blocker
+
+
+def install(context) -> None:
+    if _blocker is not None:
+        _blocker.install(context)
+
+
+def document(page, url: str):
+    return _blocker.document(page, url) if _blocker is not None else contextlib.nullcontext()
+
+
+def print_summary() -> None:
+    if _blocker is not None and _blocker.docs:
+        print(_blocker.summary(), file=sys.stderr)
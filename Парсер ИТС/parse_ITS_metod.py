@@ -6,31 +6,41 @@
   • обычные «книжные» базы   /db/<code>/content/…          (unfdoc, pub…)
   • справочник metod81       /db/metod81/browse/…|content/…
 
-После запуска скрипт спросит:
-  ➜ код базы  (пример: unfdoc | pubchaos2order | metod81)
-  ➜ базовую папку для Markdown
-  ➜ категорию / раздел  – уйдут в YAML.
+Параметры — опциями или YAML-файлом (its_config.py):
+  --book       код базы  (пример: unfdoc | pubchaos2order | metod81)
+  --out-dir    базовая папка для Markdown
+  --category / --section  – уйдут в YAML.
+    python parse_ITS_metod.py --config nightly/unfdoc.yaml --fast
+Чего не хватает, скрипт спросит в терминале; без терминала — ошибка.
+Вход на ИТС сохраняется в --state и повторяется, только когда сессия истекла.
+С --direct документы качаются напрямую (its_direct.py), браузер — для остального.
 
 Для *metod81* дополнительно парсится **только** ветка nav_2503
-(«Рабочее место кассира…»). Если нужна другая – поменяйте ROOT_NAV_ID.
+(«Рабочее место кассира…»). Другая – --root-nav-id.
 """
 from pathlib import Path
-import re, time
+import argparse, re, sys, threading, time
 import json
-from collections import deque
 from bs4 import BeautifulSoup
 from playwright.sync_api import sync_playwright, TimeoutError
+from its_extract import doc_links, plain_text
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from common import profiling      # --profile: замеры по стадиям
+from common import metrics        # --metrics: счётчики и задержки для Prometheus / JSON
+from common import sinks          # --sink: .md / JSONL-шарды / SQLite
+import its_browser                # --fast: headless и ожидание по событиям
+import its_routes                 # --block-*: не грузить картинки, стили, счётчики
+import its_pool                   # --workers: несколько страниц на одну сессию
+import its_direct                 # --direct: документы GET-ом по адресу фрейма, без отрисовки
+import its_config                 # --book/--out-dir/… или --config вместо input()
 DEBUG = True   # global flag, used for verbose logging
 
-# ───────────────────────────  пользовательские параметры
-BOOK      = input("📘 Код базы (unfdoc / metod81 / …): ").strip()
-OUT_DIR   = Path(input("📁 Куда сохранять md-файлы: ").strip())
-CATEGORY  = input("🏷 Категория (YAML): ").strip()
-SECTION   = input("📚 Раздел 1С (YAML): ").strip()
-
-OUT_DIR.mkdir(parents=True, exist_ok=True)
-START_URL      = f"https://its.1c.ru/db/{BOOK}"
-ROOT_NAV_ID    = "2503"          # для metod81: «Рабочее место кассира…»
+# ───────────────────────────  параметры прогона (опции или --config) — заполняет main()
+_args: argparse.Namespace | None = None
+BOOK = OUT_DIR = CATEGORY = SECTION = START_URL = ROOT_NAV_ID = None
+SINK = None                       # sinks.open_sink(...)
+_SAVE_LOCK = threading.Lock()     # страницы its_pool пишут в один приёмник
+FRONTIER: its_pool.Frontier | None = None
 
 # ───────────────────────────  мелкие утилиты
 def sanitize(t: str) -> str:
@@ -59,13 +69,13 @@ def save_md(title, url, text, subcat_slug, file_slug, date_str):
     q_str  = json.dumps(title, ensure_ascii=False)
     url_str = json.dumps(url,   ensure_ascii=False)
 
-    fp = OUT_DIR / f"{file_slug}.md"
-    fp.parent.mkdir(parents=True, exist_ok=True)     # ensure path
-    if fp.exists():          # duplicate – skip writing
-        return
+    name = f"{file_slug}.md"
+    with _SAVE_LOCK:             # страницы its_pool пишут в один приёмник
+        if name in SINK:         # duplicate – skip writing
+            metrics.skip("duplicate")
+            return
 
-    fp.write_text(
-        f"""---
+        content = f"""---
 date: "{date_str}"
 category: {CATEGORY}
 section_1c: {SECTION}
@@ -75,13 +85,19 @@ url: {url_str}
 ---
 
 {text.strip()}
-""",
-        "utf-8"
-    )
-    print("   ✅", fp.name)
+"""
+        front = {"date": date_str, "category": CATEGORY, "section_1c": SECTION,
+                 "subcategory": subcat_slug, "question": title, "url": url}
+        with profiling.stage("write"), metrics.stage("write"):
+            SINK.write(name, front, text.strip() + "\n", content)
+        metrics.count("pages")
+        if profiling.enabled():
+            profiling.add_bytes(bytes_out=len(content.encode("utf-8")))
+        print("   ✅", name)
 
 def log_snip(t, txt):
-    print("      ↳", (txt.strip().replace("\n", " ") or "<EMPTY>")[:80])
+    # фрагмент текста на каждую страницу — не чаще раза в 30 с
+    metrics.log_bulk(print, "snippet", "      ↳ " + ((txt.strip().replace("\n", " ") or "<EMPTY>")[:80]))
 
 # ───────────────────────────  Playwright helpers
 def wait_doc_frame(page, timeout=15_000):
@@ -98,149 +114,72 @@ def wait_doc_frame(page, timeout=15_000):
         return None
 
 def goto_and_get_node(page, url):
-    page.goto(url, timeout=30_000, wait_until="domcontentloaded")
-    time.sleep(.3)                                         # микропауза для JS
-    frame = wait_doc_frame(page) or page                   # fallback к самому page
-    try:
-        frame.wait_for_selector("h1,h2,h3,p", timeout=8_000)
-    except TimeoutError:
-        pass
+    if _args.fast:
+        frame, waits = its_browser.goto_doc(page, url, _args.ready)
+        print(f"      ⏱ {waits}")
+        return frame or page                               # fallback к самому page
+    with its_browser.throttle(url), its_routes.document(page, url):
+        with profiling.stage("navigate"), metrics.stage("fetch"):
+            page.goto(url, timeout=30_000, wait_until="domcontentloaded")
+            time.sleep(.3)                                 # микропауза для JS
+        with profiling.stage("wait.frame"), metrics.stage("wait.frame"):
+            frame = wait_doc_frame(page) or page           # fallback к самому page
+        with profiling.stage("wait.content"):
+            try:
+                frame.wait_for_selector("h1,h2,h3,p", timeout=8_000)
+            except TimeoutError:
+                pass
     return frame
 
 def node_html(node) -> str:      # page и frame имеют одинаковый .content()
-    return node.content()
+    with profiling.stage("content"):
+        return node.content()
 
 def extract_plain(node) -> str:
-    soup = BeautifulSoup(node_html(node), "html.parser")
-    div  = soup.select_one("div.doc-content,#content,body") or soup
-    txt  = div.get_text("\n", strip=True)
-    # убираем служебную строку‑«шапку» типа
-    # “Общий профиль Доступ ограничен … Доступ до 14.10.2025 …”
-    txt  = re.sub(r"^Общий профиль.*?Доступ до \d{2}\.\d{2}\.\d{4}\s+", "",
-                  txt, flags=re.S)
-    return txt
-
-# ───────────────────────────  разделение на h2/h3-подблоки
-def split_sections(html: str):
-    soup = BeautifulSoup(html, "html.parser")
-    cur, buf, out = None, [], []
-    is_hdr = lambda n: n.name in ("h2","h3")
-    for n in soup.find_all(["h2","h3","p"]):
-        if is_hdr(n):
-            if cur and buf:
-                out.append((cur, "\n".join(buf).strip()))
-                buf=[]
-            cur = n.get_text(" ", strip=True)
-        else:
-            txt=n.get_text(" ", strip=True)
-            if txt: buf.append(txt)
-    if cur and buf: out.append((cur, "\n".join(buf).strip()))
-    return out
-
-# ───────────────────────────  основной процесс
-with sync_playwright() as p:
-    br = p.chromium.launch(headless=False, slow_mo=80)
-    ctx, pg = br.new_context(), br.new_page()
-
-    pg.goto("https://its.1c.ru/")
-    input("⏳ Пройдите DDoS/логин и Enter… ")
-
-    # если metod81 – сразу в нужную ветку
-    if BOOK=="metod81":
-        START_URL = f"https://its.1c.ru/db/metod81/browse/13/-1/2115/{ROOT_NAV_ID}"
-    pg.goto(START_URL, wait_until="domcontentloaded")
-
-    # ─────────── собираем ссылки TOC
-    if BOOK=="metod81":
-        print("🔍 Собираю ссылки в ветке nav_"+ROOT_NAV_ID)
-        toc_links = pg.evaluate(f"""
-        (()=>{{
-          const root=document.querySelector('#nav_{ROOT_NAV_ID}');
-          if(!root) return [];
-          return Array.from(root.querySelectorAll('a[href]')).map(a=>{{
-            const href=a.getAttribute('href');
-            return {{
-              title:a.textContent.trim(),
-              url  :href.startsWith('http')?href:new URL(href,'https://its.1c.ru').href
-            }};
-          }});
-        }})()
-        """)
-        # ── оставляем ТОЛЬКО ссылки, относящиеся к выбранной ветке
-        toc_links = [l for l in toc_links
-                     if f"/{ROOT_NAV_ID}" in l["url"]          # сами browse‑узлы ветки
-                     or "/content/" in l["url"]]               # либо конечные hdoc‑страницы
-    else:   # прежняя книжная логика
-        pg.wait_for_selector(f'#w_metadata_toc a[href*="/db/{BOOK}/content/"]',
-                             timeout=15_000)
-        toc_links = pg.evaluate(f"""
-        Array.from(document.querySelectorAll(
-               '#w_metadata_toc a[href*="/db/{BOOK}/content/"]'))
-             .map(a=>({{title:a.textContent.trim(),
-                       url:new URL(a.getAttribute('href'),
-                                   'https://its.1c.ru').href}}));
+    html = node_html(node)
+    with profiling.stage("extract"), metrics.stage("parse"):
+        return plain_text(html)
+
+# ───────────────────────────  одна ссылка очереди (its_pool: на любой из страниц)
+def process(page, ln):
+    url=normalize(ln["url"])
+
+    # ---------- metod81: browse→список документов ----------
+    # Для справочника metod81 страницы /browse/… содержат только список hdoc‑ссылок.
+    # Их самих мы не сохраняем – вместо этого ставим найденные /content/… в очередь.
+    if BOOK == "metod81" and "/content/" not in url:
+        if page is None:                         # список строит JS — нужен браузер
+            raise its_pool.NeedsBrowser(url)
+        node = goto_and_get_node(page, url)      # отрисованный browse‑узел
+        docs = node.evaluate("""
+            Array.from(
+                document.querySelectorAll(
+                    '#w_metadata_navlist a[href*="/content/"]'
+                )
+            ).map(a => {
+                const href = a.getAttribute('href') || '';
+                return {
+                    title: (a.textContent || '').trim(),
+                    url  : href.startsWith('http') ? href
+                           : new URL(href, location.origin).href
+                };
+            });
         """)
+        added = 0
+        for d in docs:
+            d["fname_base"] = sanitize(d["title"])
+            d["subcategory"] = sanitize(ln["title"])
+            added += FRONTIER.put(d)               # уже виденные очередь не примет
+        if DEBUG:
+            print(f"   ➕ из списка документов: {added}")
+        return
 
-    links = [l for l in toc_links if l["title"] and l["url"]]
-    print(f"📋 Найдено ссылок: {len(links)}")
-
-    # ─────────── подготавливаем base-имена
-    chap, sub_idx = None, 0
-    for ln in links:
-        t=ln["title"]
-        m=re.match(r"Глава\s+(\d+)\.", t, flags=re.I)
-        if m:
-            chap=int(m.group(1)); sub_idx=0
-            ln["fname_base"]=f"глава-{chap}-{sanitize(t[m.end():])}"
-        elif chap:
-            sub_idx+=1
-            ln["fname_base"]=f"глава-{chap}-{sub_idx}-{sanitize(t)}"
-        else:
-            ln["fname_base"]=sanitize(t)
-
-    queue = deque(links)          # ссылки к обработке
-    done_urls: set[str] = set()   # уже сохранённые URL
-
-    while queue:
-        ln = queue.popleft()
-        url=normalize(ln["url"])
-
-        # ---------- metod81: browse→список документов ----------
-        # Для справочника metod81 страницы /browse/… содержат только список hdoc‑ссылок.
-        # Их самих мы не сохраняем – вместо этого ставим найденные /content/… в очередь.
-        if BOOK == "metod81" and "/content/" not in url:
-            node = goto_and_get_node(pg, url)        # отрисованный browse‑узел
-            docs = node.evaluate("""
-                Array.from(
-                    document.querySelectorAll(
-                        '#w_metadata_navlist a[href*="/content/"]'
-                    )
-                ).map(a => {
-                    const href = a.getAttribute('href') || '';
-                    return {
-                        title: (a.textContent || '').trim(),
-                        url  : href.startsWith('http') ? href
-                               : new URL(href, 'https://its.1c.ru').href
-                    };
-                });
-            """)
-            added = 0
-            for d in docs:
-                nurl = normalize(d["url"])
-                if nurl in done_urls:
-                    continue
-                d["fname_base"] = sanitize(d["title"])
-                d["subcategory"] = sanitize(ln["title"])
-                queue.append(d)
-                added += 1
-            if DEBUG:
-                print(f"   ➕ из списка документов: {added}")
-            done_urls.add(url)     # сам browse‑url помечаем обработанным
-            continue               # переходим к следующему элементу очереди
-
-        if url in done_urls: continue
-        node = goto_and_get_node(pg, url)
+    with profiling.document(url):
+        node = its_direct.document(page, url, goto_and_get_node)
         html = node_html(node)
+        metrics.add_bytes(len(html.encode("utf-8")))
+        if profiling.enabled():
+            profiling.add_bytes(bytes_in=len(html.encode("utf-8")))
         soup = BeautifulSoup(html, "html.parser")
         date_elem = soup.select_one("span.date")
         date_str = date_elem.get_text(strip=True) if date_elem else ""
@@ -251,46 +190,154 @@ with sync_playwright() as p:
             # otherwise fall back to the file slug
             subcat = ln.get("subcategory", ln["fname_base"])
             save_md(ln["title"], url, text, subcat, ln["fname_base"], date_str)
-        # под-заголовки
-        done_urls.add(url)
+        else:
+            metrics.skip("empty")
 
-        # ─────────── рекурсивные ссылки той же базы
-        if BOOK != "metod81":
-            try:
-                # Для «книжных» баз берём любые ссылки внутри той‑же db/<BOOK>/ …
-                # Для metod81 — берём ТОЛЬКО конечные документы /content/ внутри справочника.
-                if BOOK == "metod81":
-                    sel = 'a[href*="/db/metod81/content/"]'
-                else:
-                    sel = f'a[href*="/db/{BOOK}/"]'
-
-                raw = node.evaluate(f"""
-                    Array.from(document.querySelectorAll("{sel}")).map(a => {{
-                        const href = a.getAttribute("href") || "";
-                        return {{
-                            title : (a.textContent || "").trim(),
-                            url   : href.startsWith("http") ? href
-                                    : new URL(href, "https://its.1c.ru").href
-                        }};
-                    }});
-                """)
-
-                added = 0
-                for r in raw:
-                    nurl = normalize(r["url"], keep_hash=True)
-                    if nurl in done_urls:
-                        continue
-
-                    # формируем базу имени: наследуем имя родителя + собственный заголовок
-                    parent_base = ln.get("fname_base", sanitize(ln["title"]))
-                    r["fname_base"] = f"{parent_base}-{sanitize(r['title'])}"
-                    queue.append(r)
-                    added += 1
-
-                if added and DEBUG:
-                    print(f"   ➕ дочерних ссылок: {added}")
-            except Exception:
-                pass
+    # ─────────── рекурсивные ссылки той же базы
+    if BOOK != "metod81":
+        try:
+            # Для «книжных» баз берём любые ссылки внутри той‑же db/<BOOK>/ …
+            # Для metod81 — берём ТОЛЬКО конечные документы /content/ внутри справочника.
+            if BOOK == "metod81":
+                sel = 'a[href*="/db/metod81/content/"]'
+            else:
+                sel = f'a[href*="/db/{BOOK}/"]'
+
+            # по уже полученному HTML — и для фрейма, и для скачанного напрямую документа
+            raw = doc_links(html, node.url, sel)
+
+            added = 0
+            for r in raw:
+                # формируем базу имени: наследуем имя родителя + собственный заголовок
+                parent_base = ln.get("fname_base", sanitize(ln["title"]))
+                r["fname_base"] = f"{parent_base}-{sanitize(r['title'])}"
+                added += FRONTIER.put(r)
+            if added and DEBUG:
+                print(f"   ➕ дочерних ссылок: {added}")
+        except Exception as e:
+            metrics.failure(e)
+
+# ───────────────────────────  запуск
+def parse_args(argv=None) -> argparse.Namespace:
+    cli = argparse.ArgumentParser(description="Книга/справочник its.1c.ru → Markdown")
+    sinks.add_cli_arguments(cli)
+    profiling.add_cli_arguments(cli)
+    metrics.add_cli_arguments(cli)
+    its_browser.add_cli_arguments(cli)
+    its_pool.add_cli_arguments(cli)
+    its_routes.add_cli_arguments(cli)
+    its_direct.add_cli_arguments(cli)
+    its_config.add_book_arguments(cli, root_nav_id=True)
+    args = its_config.parse_args(cli, argv)
+    its_config.require(cli, args, {
+        "book":     "📘 Код базы (unfdoc / metod81 / …): ",
+        "out_dir":  "📁 Куда сохранять md-файлы: ",
+        "category": "🏷 Категория (YAML): ",
+        "section":  "📚 Раздел 1С (YAML): ",
+    })
+    return args
+
+
+def main(argv=None):
+    global _args, BOOK, OUT_DIR, CATEGORY, SECTION, START_URL, ROOT_NAV_ID, SINK
+    _args = parse_args(argv)
+    its_browser.set_rate_limit(_args.rate, max(1, _args.workers) + (_args.direct_workers if _args.direct else 0))
+    its_routes.configure(_args)
+
+    BOOK, CATEGORY, SECTION = _args.book, _args.category, _args.section
+    OUT_DIR = Path(_args.out_dir)
+    START_URL = f"{_args.base_url}/db/{BOOK}"
+    ROOT_NAV_ID = str(_args.root_nav_id)      # для metod81: по умолчанию «Рабочее место кассира…»
+    OUT_DIR.mkdir(parents=True, exist_ok=True)
+    SINK = sinks.open_sink(_args.sink, OUT_DIR, _args.shard_mb)
+
+    profiling.start(_args.profile, _args.profile_dump)
+    metrics.start("parse_ITS_metod", _args.metrics, _args.metrics_summary, _args.metrics_interval)
+    try:
+        crawl()
+    finally:                                   # отчёты и буфер шардов/SQLite — и при падении
+        SINK.close()
+        its_routes.print_summary()
+        its_direct.print_summary()
+        profiling.finish()
+        metrics.finish()
+
+
+# ───────────────────────────  основной процесс
+def crawl():
+    with sync_playwright() as p:
+        br, ctx, pg = its_browser.launch(p, _args.fast, slow_mo=80, start_url=_args.base_url + "/",
+                                         prompt="⏳ Пройдите DDoS/логин и Enter… ", login=not _args.no_login,
+                                         state_path=_args.state, relogin=_args.relogin)
+
+        # если metod81 – сразу в нужную ветку
+        if BOOK=="metod81":
+            start_url = f"{_args.base_url}/db/metod81/browse/13/-1/2115/{ROOT_NAV_ID}"
+        else:
+            start_url = START_URL
+        pg.goto(start_url, wait_until="domcontentloaded")
+
+        # ─────────── собираем ссылки TOC
+        if BOOK=="metod81":
+            print("🔍 Собираю ссылки в ветке nav_"+ROOT_NAV_ID)
+            toc_links = pg.evaluate(f"""
+            (()=>{{
+              const root=document.querySelector('#nav_{ROOT_NAV_ID}');
+              if(!root) return [];
+              return Array.from(root.querySelectorAll('a[href]')).map(a=>{{
+                const href=a.getAttribute('href');
+                return {{
+                  title:a.textContent.trim(),
+                  url  :href.startsWith('http')?href:new URL(href,location.origin).href
+                }};
+              }});
+            }})()
+            """)
+            # ── оставляем ТОЛЬКО ссылки, относящиеся к выбранной ветке
+            toc_links = [l for l in toc_links
+                         if f"/{ROOT_NAV_ID}" in l["url"]          # сами browse‑узлы ветки
+                         or "/content/" in l["url"]]               # либо конечные hdoc‑страницы
+        else:   # прежняя книжная логика
+            pg.wait_for_selector(f'#w_metadata_toc a[href*="/db/{BOOK}/content/"]',
+                                 timeout=15_000)
+            toc_links = pg.evaluate(f"""
+            Array.from(document.querySelectorAll(
+                   '#w_metadata_toc a[href*="/db/{BOOK}/content/"]'))
+                 .map(a=>({{title:a.textContent.trim(),
+                           url:new URL(a.getAttribute('href'),
+                                       location.origin).href}}));
+            """)
 
-    print("🏁 Готово")
-    br.close()
\ No newline at end of file
+        links = [l for l in toc_links if l["title"] and l["url"]]
+        print(f"📋 Найдено ссылок: {len(links)}")
+
+        # ─────────── подготавливаем base-имена
+        chap, sub_idx = None, 0
+        for ln in links:
+            t=ln["title"]
+            m=re.match(r"Глава\s+(\d+)\.", t, flags=re.I)
+            if m:
+                chap=int(m.group(1)); sub_idx=0
+                ln["fname_base"]=f"глава-{chap}-{sanitize(t[m.end():])}"
+            elif chap:
+                sub_idx+=1
+                ln["fname_base"]=f"глава-{chap}-{sub_idx}-{sanitize(t)}"
+            else:
+                ln["fname_base"]=sanitize(t)
+
+        global FRONTIER
+        FRONTIER = its_pool.Frontier(links, key=lambda ln: normalize(ln["url"]))
+        state = its_browser.session(ctx, pg) if _args.workers > 1 or _args.direct else None
+        # --direct: шаблон адреса фрейма — по первой ссылке на документ
+        its_direct.start(_args, state, pg, next((l["url"] for l in links if its_direct.content_key(l["url"])), None))
+        its_pool.run(FRONTIER, process, pg, _args.workers, state,
+                     headless=_args.fast, slow_mo=0 if _args.fast else 80, fetchers=its_direct.fetchers())
+
+        print("🏁 Готово")
+        if not _args.no_login:                                 # продлённые за прогон куки — на следующий раз
+            its_browser.save_session(its_browser.session(ctx, pg), _args.state)
+        br.close()
+
+
+if __name__ == "__main__":
+    main()
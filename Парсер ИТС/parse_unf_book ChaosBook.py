@@ -2,25 +2,33 @@
 # Цель: спарсить книгу с https://its.1c.ru/db/unfdoc и сохранить в формате Markdown для RAG
 
 from pathlib import Path
+import argparse
 import re
+import sys
+import threading
 from bs4 import BeautifulSoup
 from playwright.sync_api import sync_playwright
-from collections import deque
+from its_extract import doc_links, doc_text, split_into_sections
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from common import profiling      # --profile: замеры по стадиям
+from common import metrics        # --metrics: счётчики и задержки для Prometheus / JSON
+from common import sinks          # --sink: .md / JSONL-шарды / SQLite
+import its_browser                # --fast: headless и ожидание по событиям
+import its_routes                 # --block-*: не грузить картинки, стили, счётчики
+import its_pool                   # --workers: несколько страниц на одну сессию
+import its_direct                 # --direct: документы GET-ом по адресу фрейма, без отрисовки
+import its_config                 # --book/--out-dir/… или --config вместо input()
 
 DEBUG = True
 
-
-# 🔽 Запрашиваем параметры у пользователя
-book_code = input("📘 Введите код книги (например, unfdoc или pubchaos2order): ").strip()
-out_dir = input("📁 Путь к папке для сохранения (например, data/ChaosBook/md): ").strip()
-category = input("🏷 Категория (например, Книги): ").strip()
-section = input("📚 Раздел 1С (например, УНФ или Chaos → Order): ").strip()
-
-# 🔽 Применяем введённые параметры
-BOOK = book_code
-START_URL = f"https://its.1c.ru/db/{BOOK}"
-OUTPUT_DIR = Path(out_dir)
-OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+# параметры прогона — из опций / --config, заполняет main()
+_args: argparse.Namespace | None = None
+BOOK = category = section = START_URL = None
+SINK = None                        # sinks.open_sink(...)
+_SAVE_LOCK = threading.Lock()      # страницы its_pool пишут в один приёмник
+FRONTIER: its_pool.Frontier | None = None
+saved_urls: set[str] = set()
 
 BASE_URL = "https://its.1c.ru"
 # START_URL = f"{BASE_URL}/db/unfdoc"
@@ -89,12 +97,12 @@ def save_as_md(title: str, url: str, content: str, filename_base: str) -> None:
     filename = f"{filename_base}.md"
     subcat   = filename_base      # поле subcategory в YAML‑фронт‑маттере
 
-    out_path = OUTPUT_DIR / filename
-    if out_path.exists():         # файл уже есть – ничего не делаем
-        return
+    with _SAVE_LOCK:
+        if filename in SINK:          # файл уже есть – ничего не делаем
+            metrics.skip("duplicate")
+            return
 
-    with open(out_path, "w", encoding="utf-8") as f:
-        f.write(f"""---
+        text = f"""---
 category: {category}
 section_1c: {section}
 subcategory: {subcat}
@@ -103,65 +111,38 @@ url: {url}
 ---
 
 {content.strip()}
-""")
-    print("✅", filename)
-
-
-def extract_content_from_iframe(iframe):
-    html = iframe.content()
-    soup = BeautifulSoup(html, "html.parser")
-    div = soup.select_one("div.doc-content, div#content") or soup.body
-    return div.get_text("\n", strip=True) if div else ""
-
-
-def split_into_sections(html: str) -> list[tuple[str, str]]:
-    """
-    Разбивает HTML главы на под‑блоки по заголовкам <h2>/<h3>.
-    Возвращает список кортежей (title, plain_text).
-    """
-    soup = BeautifulSoup(html, "html.parser")
-    print("      ↳ found headings:",
-          [h.get_text(" ", strip=True) for h in soup.find_all(['h2', 'h3', 'strong', 'b'])][:15])
-    sections: list[tuple[str, str]] = []
-
-    current_title = None
-    buffer: list[str] = []
-
-    heading_tags = ("h1", "h2", "h3", "h4", "h5", "h6", "strong", "b")
-
-    for node in soup.find_all(["h2", "h3", "strong", "b", "p"]):
-        is_heading = (
-            node.name in heading_tags
-            or (
-                node.name == "p"
-                and (
-                    "bold" in (node.get("class") or [])
-                    or "font-weight:bold" in node.get("style", "").replace(" ", "").lower()
-                    or (node.find("b") and len(node.get_text(strip=True)) <= 120)
-                )
-            )
-        )
-
-        if is_heading:
-            if current_title and buffer:
-                sections.append((current_title, "\n".join(buffer).strip()))
-                buffer = []
-            current_title = node.get_text(" ", strip=True)
-            continue
-
-        txt = node.get_text(" ", strip=True)
-        if txt:
-            buffer.append(txt)
-
-    # финальный буфер
-    if current_title and buffer:
-        sections.append((current_title, "\n".join(buffer).strip()))
-    return sections
+"""
+        front = {"category": category, "section_1c": section, "subcategory": subcat,
+                 "question": title, "url": url}
+        with profiling.stage("write"), metrics.stage("write"):
+            SINK.write(filename, front, content.strip() + "\n", text)
+        metrics.count("pages")
+        if profiling.enabled():
+            profiling.add_bytes(bytes_out=len(text.encode("utf-8")))
+        print("✅", filename)
+
+
+def claim_url(url: str) -> bool:
+    """Отметить url сохранённым; False — его уже взяла другая страница its_pool."""
+    with _SAVE_LOCK:
+        if url in saved_urls:
+            return False
+        saved_urls.add(url)
+        return True
+
+
+def extract_content_from_iframe(iframe, html: str | None = None):
+    if html is None:
+        with profiling.stage("content"):
+            html = iframe.content()
+    with profiling.stage("extract"), metrics.stage("parse"):
+        return doc_text(html)
 
 
 def log_snippet(title: str, content: str):
+    # фрагмент текста на каждую страницу — не чаще раза в 30 с
     snippet = content.strip().replace("\n", " ")[:80]
-    print(f"    ↳ snippet: {snippet or '<EMPTY>'}")
+    metrics.log_bulk(print, "snippet", f"    ↳ snippet: {snippet or '<EMPTY>'}")
 
 
 def get_doc_iframe(page, timeout=15_000):
@@ -188,38 +169,59 @@ def get_doc_iframe(page, timeout=15_000):
     return page.frame(name="w_metadata_doc_frame")
 
 
-def safe_goto(page, url: str):
-    """
-    Переходит на url, ждёт domcontentloaded и возвращает iframe с текстом.
-    Если основной iframe пустой, пытается найти непустой дочерний.
-    """
-    page.goto(url, timeout=30_000, wait_until="domcontentloaded")
-    page.wait_for_timeout(300)        # небольшая пауза для скриптов
-    try:
-        iframe = get_doc_iframe(page)
-    except Exception:
-        print("⚠️  iframe не прогрузился, пробую ещё раз …")
-        page.wait_for_timeout(1000)
-        iframe = get_doc_iframe(page)
-
-    # ⏳ Ждём, пока во фрейме появится «живой» текст – хотя бы один
-    # заголовок или абзац.  Без этого .content() может вернуть
-    # практически пустую разметку <script>…</script>.
-    try:
-        iframe.wait_for_selector("h1, h2, h3, p", timeout=10_000)
-    except Exception:
-        # если по‑какому‑то поводу не дождались – продолжим; дальше
-        # всё‑равно попытаемся извлечь текст.
-        pass
-
+def child_with_text(iframe):
+    """Если основной iframe пустой — первый непустой дочерний."""
     try:
         if iframe and not iframe.content().strip():
             for child in iframe.child_frames:
                 if child.content().strip():
-                    iframe = child
-                    break
+                    return child
     except Exception:
         pass
+    return iframe
+
+
+def fast_goto(page, url: str):
+    """safe_goto для --fast: без пауз, каждая фаза ждёт своего события."""
+    iframe, waits = its_browser.goto_doc(page, url, _args.ready)
+    if iframe is None:
+        print("⚠️  iframe не прогрузился, жду ещё раз …")
+        iframe = its_browser.wait_doc_frame(page, waits=waits) or get_doc_iframe(page)
+        its_browser.wait_content(iframe, _args.ready, waits=waits)
+    print(f"    ⏱ {waits}")
+    return child_with_text(iframe)
+
+
+def safe_goto(page, url: str):
+    """
+    Переходит на url, ждёт domcontentloaded и возвращает iframe с текстом.
+    Если основной iframe пустой, пытается найти непустой дочерний.
+    """
+    if _args.fast:
+        return fast_goto(page, url)
+    with its_browser.throttle(url), its_routes.document(page, url):
+        with profiling.stage("navigate"), metrics.stage("fetch"):
+            page.goto(url, timeout=30_000, wait_until="domcontentloaded")
+            page.wait_for_timeout(300)        # небольшая пауза для скриптов
+        with profiling.stage("wait.frame"), metrics.stage("wait.frame"):
+            try:
+                iframe = get_doc_iframe(page)
+            except Exception:
+                print("⚠️  iframe не прогрузился, пробую ещё раз …")
+                page.wait_for_timeout(1000)
+                iframe = get_doc_iframe(page)
+
+        # ⏳ Ждём, пока во фрейме появится «живой» текст – хотя бы один
+        # заголовок или абзац.  Без этого .content() может вернуть
+        # практически пустую разметку <script>…</script>.
+        try:
+            iframe.wait_for_selector("h1, h2, h3, p", timeout=10_000)
+        except Exception:
+            # если по‑какому‑то поводу не дождались – продолжим; дальше
+            # всё‑равно попытаемся извлечь текст.
+            pass
+
+    iframe = child_with_text(iframe)
 
     try:
         iframe.wait_for_selector("h1, h2, h3, p", timeout=5_000)
@@ -229,31 +231,126 @@ def safe_goto(page, url: str):
     return iframe
 
 
-def main():
-    with sync_playwright() as p:
-        browser = p.chromium.launch(headless=False, slow_mo=100)
-        context = browser.new_context()
-        page = context.new_page()
+def process(page, link):
+    """Одна страница очереди: глава, её подразделы и ссылки на другие разделы книги."""
+    if not link.get("url"):
+        return
 
-        # 1. Защита + логин
-        page.goto("https://its.1c.ru/")
-        input("⏳ Пройди защиту DDoS и нажми Enter...")
+    norm_url = normalize_url(link["url"])
+    file_base = link.get("fname_base") or sanitize_filename(link["title"])
+
+    with profiling.document(link["url"]):
+        print(f"🔹 {link['title']} — {link['url']}")
+        iframe = its_direct.document(page, link["url"], safe_goto)
+        with profiling.stage("content"):
+            html = iframe.content()
+        metrics.add_bytes(len(html.encode("utf-8")))
+        if profiling.enabled():
+            profiling.add_bytes(bytes_in=len(html.encode("utf-8")))
+        content = extract_content_from_iframe(iframe, html)
+        log_snippet(link["title"], content)
+
+        # --- сохраняем саму главу ---
+        if content:
+            save_as_md(link["title"], link["url"], content, file_base)
+
+        current_page_title = link["title"].strip()
+
+        # --- разбиваем на под‑разделы внутри страницы ---
+        with profiling.stage("extract.sections"):
+            sections = split_into_sections(html, verbose=DEBUG)
+        for idx, (sub_title, sub_text) in enumerate(sections, start=1):
+            sub_url = f"{link['url']}#{sanitize_filename(sub_title)}"
+            if sub_title == current_page_title or not claim_url(sub_url):
+                continue
+            save_as_md(sub_title, sub_url, sub_text, f"{file_base}-{idx:02d}")
+
+        claim_url(norm_url)
+
+    # ищем все вложенные ссылки на другие разделы той же книги (по уже полученному HTML)
+    try:
+        raw_links = doc_links(html, iframe.url, f'a[href*="/db/{BOOK}/content/"]')
+        queued = 0
+        for nl in raw_links:
+            nl["url"] = normalize_url(nl["url"], keep_fragment=True)
+            queued += FRONTIER.put(nl)           # уже виденные страницы очередь не примет
+        print(f"🔖 В очередь добавлено: {queued}")
+    except Exception as e:
+        metrics.failure(e)
+        print(f"⚠️ Ошибка при поиске вложенных ссылок: {e}")
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    cli = argparse.ArgumentParser(description="Книга its.1c.ru → Markdown с разбиением на подразделы")
+    sinks.add_cli_arguments(cli)
+    profiling.add_cli_arguments(cli)
+    metrics.add_cli_arguments(cli)
+    its_browser.add_cli_arguments(cli)
+    its_pool.add_cli_arguments(cli)
+    its_routes.add_cli_arguments(cli)
+    its_direct.add_cli_arguments(cli)
+    its_config.add_book_arguments(cli)
+    args = its_config.parse_args(cli, argv)
+    # 🔽 Чего нет ни в опциях, ни в --config — спрашиваем (только в терминале)
+    its_config.require(cli, args, {
+        "book":     "📘 Введите код книги (например, unfdoc или pubchaos2order): ",
+        "out_dir":  "📁 Путь к папке для сохранения (например, data/ChaosBook/md): ",
+        "category": "🏷 Категория (например, Книги): ",
+        "section":  "📚 Раздел 1С (например, УНФ или Chaos → Order): ",
+    })
+    return args
+
+
+def main(argv=None):
+    global _args, BOOK, category, section, START_URL, SINK
+    _args = parse_args(argv)
+    its_browser.set_rate_limit(_args.rate, max(1, _args.workers) + (_args.direct_workers if _args.direct else 0))
+    its_routes.configure(_args)
+
+    # 🔽 Применяем параметры
+    BOOK, category, section = _args.book, _args.category, _args.section
+    START_URL = f"{_args.base_url}/db/{BOOK}"
+    output_dir = Path(_args.out_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    # подразделы ChaosBook — это много мелких документов; --sink jsonl/sqlite складывает их в шарды/базу
+    SINK = sinks.open_sink(_args.sink, output_dir, _args.shard_mb)
+
+    profiling.start(_args.profile, _args.profile_dump)
+    metrics.start("parse_unf_book_chaos", _args.metrics, _args.metrics_summary, _args.metrics_interval)
+    try:
+        crawl()
+    finally:
+        SINK.close()
+        its_routes.print_summary()
+        its_direct.print_summary()
+        profiling.finish()
+        metrics.finish()
+
+
+def crawl():
+    with sync_playwright() as p:
+        # 1. Защита + логин (в --fast дальше работает headless-браузер с той же сессией)
+        browser, context, page = its_browser.launch(p, _args.fast, slow_mo=100, start_url=_args.base_url + "/",
+                                                    login=not _args.no_login, state_path=_args.state,
+                                                    relogin=_args.relogin)
         print("🧭 Текущий URL:", page.url)
         with open("debug_page_content.html", "w", encoding="utf-8") as f:
             f.write(page.content())
 
         # 2. Переход в документацию УНФ
-        page.goto(START_URL)
-        page.wait_for_timeout(3000)  # дать время на прогрузку авторизации
+        if _args.fast:
+            # готовность — дальше по появлению фрейма, без паузы вслепую
+            page.goto(START_URL, wait_until="domcontentloaded")
+        else:
+            page.goto(START_URL)
+            page.wait_for_timeout(3000)  # дать время на прогрузку авторизации
         print("🧭 После логина:", page.url)
 
         # DEBUG: сохраняем HTML
         with open("debug_after_login.html", "w", encoding="utf-8") as f:
             f.write(page.content())
 
-        print("📦 Доступные фреймы:")
-        for f in page.frames:
-            print("  →", f.name, f.url)
+        metrics.log_bulk(print, "frames", "📦 Доступные фреймы", [f"{f.name} {f.url}" for f in page.frames])
         try:
             page.wait_for_selector("iframe[name=w_metadata_doc_frame]", timeout=10000)
             iframe = page.frame(name="w_metadata_doc_frame")
@@ -297,7 +394,7 @@ def main():
                     return {{
                         title : (a.textContent || '').trim(),
                         url   : href.startsWith('http') ? href
-                               : new URL(href, 'https://its.1c.ru').href
+                               : new URL(href, location.origin).href
                     }};
                 }});
             ''')
@@ -340,68 +437,19 @@ def main():
             else:
                 ln["fname_base"] = sanitize_filename(title)
 
-        # --- обход всех страниц книги в ширину ---
-        queue = deque(links)           # начинаем с оглавления
-        saved_urls = set()
-        saved_titles: set[str] = set()
-
-        while queue:
-            link = queue.popleft()
-
-            if not link.get("url"):
-                continue
-
-            norm_url = normalize_url(link["url"])
-            file_base = link.get("fname_base") or sanitize_filename(link["title"])
-
-            print(f"🔹 {link['title']} — {link['url']}")
-            iframe = safe_goto(page, link["url"])
-            html = iframe.content()
-            content = extract_content_from_iframe(iframe)
-            log_snippet(link["title"], content)
-
-            # --- сохраняем саму главу ---
-            if content:
-                save_as_md(link["title"], link["url"], content, file_base)
-                saved_titles.add(link["title"].strip())
-
-            current_page_title = link["title"].strip()
-
-            # --- разбиваем на под‑разделы внутри страницы ---
-            for idx, (sub_title, sub_text) in enumerate(split_into_sections(html), start=1):
-                sub_url = f"{link['url']}#{sanitize_filename(sub_title)}"
-                if sub_title == current_page_title or sub_url in saved_urls:
-                    continue
-                save_as_md(sub_title, sub_url, sub_text, f"{file_base}-{idx:02d}")
-                saved_urls.add(sub_url)
-                saved_titles.add(sub_title.strip())
-
-            saved_urls.add(norm_url)
-
-            # ищем все вложенные ссылки на другие разделы той же книги
-            try:
-                raw_links = iframe.evaluate(
-                    f'''
-                    Array.from(document.querySelectorAll('a[href*="/db/{BOOK}/content/"]'))
-                          .map(a => ({{
-                              title: (a.textContent || '').trim(),
-                              url: new URL(a.getAttribute('href'), "https://its.1c.ru").href
-                          }}))
-                    '''
-                )
-                queued = 0
-                for nl in raw_links:
-                    nurl = normalize_url(nl["url"], keep_fragment=True)
-                    if nurl not in saved_urls:
-                        nl["url"] = nurl
-                        queue.append(nl)
-                        queued += 1
-                print(f"🔖 В очередь добавлено: {queued}")
-            except Exception as e:
-                print(f"⚠️ Ошибка при поиске вложенных ссылок: {e}")
+        # --- обход всех страниц книги в ширину (--workers страниц на одну очередь) ---
+        global FRONTIER
+        FRONTIER = its_pool.Frontier(links, key=lambda ln: normalize_url(ln["url"]))
+        state = its_browser.session(context, page) if _args.workers > 1 or _args.direct else None
+        # --direct: шаблон адреса фрейма — по первой ссылке оглавления
+        its_direct.start(_args, state, page, links[0]["url"] if links else None)
+        its_pool.run(FRONTIER, process, page, _args.workers, state,
+                     headless=_args.fast, slow_mo=0 if _args.fast else 100, fetchers=its_direct.fetchers())
 
         print("🏁 Парсинг завершён. Закрываем браузер.")
-        browser.close()unfdoc
+        if not _args.no_login:         # продлённые за прогон куки — на следующий раз
+            its_browser.save_session(its_browser.session(context, page), _args.state)
+        browser.close()
 
 
 if __name__ == "__main__":
@@ -1,17 +1,24 @@
 # Скрипт: parse_unf_book.py
-# Цель: спарсить книгу с https://its.1c.ru/db/unfdoc и сохранить в формате Markdown для RAG
+# Цель: спарсить книгу с https://its.1c.ru (по умолчанию /db/unfdoc) и сохранить в формате Markdown для RAG
 
+import argparse
 import re
+import sys
 from pathlib import Path
 from bs4 import BeautifulSoup
 from playwright.sync_api import sync_playwright
+from its_extract import doc_text
 
-BASE_URL = "https://its.1c.ru"
-START_URL = f"{BASE_URL}/db/unfdoc"
-USERNAME = "mors"
-PASSWORD = "morser"
-OUTPUT_DIR = Path("data/unfdoc/md")
-OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from common import profiling      # --profile: замеры по стадиям
+from common import metrics        # --metrics: счётчики и задержки для Prometheus / JSON
+from common import sinks          # --sink: .md / JSONL-шарды / SQLite
+import its_browser                # --fast: headless и ожидание по событиям
+import its_routes                 # --block-*: не грузить картинки, стили, счётчики
+import its_config                 # --book/--out-dir/… или --config
+
+# параметры книги по умолчанию — опциями или --config можно взять другую
+DEFAULTS = {"book": "unfdoc", "out_dir": "data/unfdoc/md", "category": "SD", "section": "УНФ"}
 
 
 def extract_content(page, url):
@@ -47,7 +54,7 @@ def sanitize_filename(text):
     return text[:100]
 
 
-def save_as_md(title, url, content):
+def save_as_md(title, url, content, sink, category, section):
     # Преобразуем название в структуру "глава-<номер>-<подномер>-название"
     chapter_match = re.match(r"^(\d+)(?:\.(\d+))?\.\s*(.+)$", title)
     if chapter_match:
@@ -61,63 +68,102 @@ def save_as_md(title, url, content):
     else:
         filename = f"{sanitize_filename(title)}.md"
 
-    out_path = OUTPUT_DIR / filename
-    with open(out_path, "w", encoding="utf-8") as f:
-        f.write(f"""---
-category: SD
-section_1c: УНФ
+    text = f"""---
+category: {category}
+section_1c: {section}
 question: {title}
 url: {url}
 ---
 
 {content.strip()}
-""")
+"""
+    front = {"category": category, "section_1c": section, "question": title, "url": url}
+    with profiling.stage("write"), metrics.stage("write"):
+        sink.write(filename, front, content.strip() + "\n", text)
+    metrics.count("pages")
+    if profiling.enabled():
+        profiling.add_bytes(bytes_out=len(text.encode("utf-8")))
     print("✅", filename)
 
 
 def extract_content_from_iframe(iframe):
-    html = iframe.content()
-    soup = BeautifulSoup(html, "html.parser")
-    div = soup.select_one("div.doc-content, div#content") or soup.body
-    return div.get_text("\n", strip=True) if div else ""
+    with profiling.stage("content"):
+        html = iframe.content()
+    metrics.add_bytes(len(html.encode("utf-8")))
+    if profiling.enabled():
+        profiling.add_bytes(bytes_in=len(html.encode("utf-8")))
+    with profiling.stage("extract"), metrics.stage("parse"):
+        return doc_text(html)
 
 
 def get_doc_iframe(page):
-    page.wait_for_selector("iframe[name=w_metadata_doc_frame]", timeout=10000)
-    return page.frame(name="w_metadata_doc_frame")
+    with profiling.stage("wait.frame"), metrics.stage("wait.frame"):
+        page.wait_for_selector("iframe[name=w_metadata_doc_frame]", timeout=10000)
+        return page.frame(name="w_metadata_doc_frame")
 
 
-def safe_goto(page, url):
+def safe_goto(page, url, fast=False, ready="load"):
     """Переходит по url и возвращает актуальный iframe с документом."""
-    page.goto(url, timeout=20000)
-    return get_doc_iframe(page)
+    if fast:
+        iframe, waits = its_browser.goto_doc(page, url, ready, timeout=20000)
+        print(f"   ⏱ {waits}")
+        return iframe or get_doc_iframe(page)
+    with its_routes.document(page, url):
+        with profiling.stage("navigate"), metrics.stage("fetch"):
+            page.goto(url, timeout=20000)
+        return get_doc_iframe(page)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Книга its.1c.ru (по умолчанию unfdoc) → Markdown")
+    sinks.add_cli_arguments(ap)
+    profiling.add_cli_arguments(ap)
+    metrics.add_cli_arguments(ap)
+    its_browser.add_cli_arguments(ap)
+    its_routes.add_cli_arguments(ap)
+    its_config.add_book_arguments(ap)
+    ap.set_defaults(**DEFAULTS)
+    args = its_config.parse_args(ap, argv)
+    its_routes.configure(args)
+    profiling.start(args.profile, args.profile_dump)
+    metrics.start("parse_unf_book", args.metrics, args.metrics_summary, args.metrics_interval)
+    out_dir = Path(args.out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    sink = sinks.open_sink(args.sink, out_dir, args.shard_mb)
+    try:
+        crawl(sink, args)
+    finally:
+        sink.close()
+        its_routes.print_summary()
+        profiling.finish()
+        metrics.finish()
 
 
-def main():
+def crawl(sink, args):
+    fast, ready, base_url, book = args.fast, args.ready, args.base_url, args.book
     with sync_playwright() as p:
-        browser = p.chromium.launch(headless=False, slow_mo=100)
-        context = browser.new_context()
-        page = context.new_page()
-
-        # 1. Защита + логин
-        page.goto("https://its.1c.ru/")
-        input("⏳ Пройди защиту DDoS и нажми Enter...")
+        # 1. Защита + логин (в --fast дальше работает headless-браузер с той же сессией)
+        browser, context, page = its_browser.launch(p, fast, slow_mo=100, start_url=base_url + "/",
+                                                    login=not args.no_login, state_path=args.state,
+                                                    relogin=args.relogin)
         print("🧭 Текущий URL:", page.url)
         with open("debug_page_content.html", "w", encoding="utf-8") as f:
             f.write(page.content())
 
-        # 2. Переход в документацию УНФ
-        page.goto(START_URL)
-        page.wait_for_timeout(3000)  # дать время на прогрузку авторизации
+        # 2. Переход в книгу (по умолчанию — документация УНФ)
+        if fast:
+            # готовность — дальше по появлению фрейма, без паузы вслепую
+            page.goto(f"{base_url}/db/{book}", wait_until="domcontentloaded")
+        else:
+            page.goto(f"{base_url}/db/{book}")
+            page.wait_for_timeout(3000)  # дать время на прогрузку авторизации
         print("🧭 После логина:", page.url)
 
         # DEBUG: сохраняем HTML
         with open("debug_after_login.html", "w", encoding="utf-8") as f:
             f.write(page.content())
 
-        print("📦 Доступные фреймы:")
-        for f in page.frames:
-            print("  →", f.name, f.url)
+        metrics.log_bulk(print, "frames", "📦 Доступные фреймы", [f"{f.name} {f.url}" for f in page.frames])
         try:
             page.wait_for_selector("iframe[name=w_metadata_doc_frame]", timeout=10000)
             iframe = page.frame(name="w_metadata_doc_frame")
@@ -139,10 +185,10 @@ def main():
 
             iframe.wait_for_selector("a[href*='content']", timeout=10000)
             print("🔍 Ищем все ссылки с 'content'...")
-            toc_links = iframe.evaluate("""
-                Array.from(document.querySelectorAll('a[href*="/db/unfdoc/content/"]'))
+            toc_links = iframe.evaluate("""book =>
+                Array.from(document.querySelectorAll(`a[href*="/db/${book}/content/"]`))
                      .map(a => ({title: a.textContent.trim(), url: a.href}))
-            """)
+            """, book)
 
             links = [link for link in toc_links if link["title"] and link["url"] and not link["url"].startswith("#")]
 
@@ -150,7 +196,7 @@ def main():
                 f.write(iframe.content())
         except Exception as e:
             print(f"❌ Ошибка ожидания ссылок в оглавлении: {e}")
-            with open("debug_unfdoc_page.html", "w", encoding="utf-8") as f:
+            with open(f"debug_{book}_page.html", "w", encoding="utf-8") as f:
                 f.write(page.content())
             return
 
@@ -162,36 +208,46 @@ def main():
 
         for i, link in enumerate(links):
             print(f"🔹 [{i+1}/{len(links)}] {link['title']} — {link['url']}")
-            iframe = safe_goto(page, link["url"])
-            content = extract_content_from_iframe(iframe)
-            if content:
-                save_as_md(link["title"], link["url"], content)
-                saved_urls.add(link["url"])
+            with profiling.document(link["url"]):
+                iframe = safe_goto(page, link["url"], fast, ready)
+                content = extract_content_from_iframe(iframe)
+                if content:
+                    save_as_md(link["title"], link["url"], content, sink, args.category, args.section)
+                    saved_urls.add(link["url"])
+                else:
+                    metrics.skip("empty")
 
             # --- ищем подглавы (все ссылки content/ внутри iframe) ---
             try:
-                sub_links = iframe.evaluate("""
-                    Array.from(document.querySelectorAll('a[href*="/db/unfdoc/content/"]'))
-                         .map(a => ({ title: a.textContent.trim(), url: a.href }));
-                """)
+                sub_links = iframe.evaluate("""book =>
+                    Array.from(document.querySelectorAll(`a[href*="/db/${book}/content/"]`))
+                         .map(a => ({ title: a.textContent.trim(), url: a.href }))
+                """, book)
                 print(f"🔖 Под-ссылок найдено: {len(sub_links)}")
 
                 for sub in sub_links:
                     if (not sub["title"] or not sub["url"]
                         or sub["url"] == link["url"]
                         or sub["url"] in saved_urls):
+                        metrics.skip("duplicate")
                         continue
 
                     print(f"📁 Подглава: {sub['title']} — {sub['url']}")
-                    iframe = safe_goto(page, sub["url"])
-                    sub_content = extract_content_from_iframe(iframe)
-                    if sub_content:
-                        save_as_md(sub["title"], sub["url"], sub_content)
-                        saved_urls.add(sub["url"])
+                    with profiling.document(sub["url"]):
+                        iframe = safe_goto(page, sub["url"], fast, ready)
+                        sub_content = extract_content_from_iframe(iframe)
+                        if sub_content:
+                            save_as_md(sub["title"], sub["url"], sub_content, sink, args.category, args.section)
+                            saved_urls.add(sub["url"])
+                        else:
+                            metrics.skip("empty")
             except Exception as e:
+                metrics.failure(e)
                 print(f"⚠️ Ошибка при поиске подглав: {e}")
 
         print("🏁 Парсинг завершён. Закрываем браузер.")
+        if not args.no_login:          # продлённые за прогон куки — на следующий раз
+            its_browser.save_session(its_browser.session(context, page), args.state)
         browser.close()
 
 